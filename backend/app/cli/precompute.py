@@ -0,0 +1,195 @@
+"""Offline precompute jobs that warm caches before live traffic needs them.
+
+Jobs:
+    verdicts   verify_word_exists verdicts -> word_verdicts
+    meanings   idiom meanings             -> idiom_meanings
+    moves      AI candidate words per starting syllable -> wordchain_moves
+
+Keys come from --input (one word per line, `#` comments allowed) or, by default, from the words
+already seen in games. Keys are processed in batches of --batch-size with at most --concurrency
+model calls at a time; each finished batch is COPY-loaded into Postgres and then appended to a
+checkpoint file, so an interrupted run resumes where it stopped (--fresh starts over).
+
+Run from the backend directory, against the stub LLM for testing:
+    python -m app.cli.stub_llm --port 8001 &
+    OPENAI_BASE_URL=http://localhost:8001/v1 python -m app.cli.precompute verdicts --game wordchain
+    python -m app.cli.precompute meanings --concurrency 4
+    python -m app.cli.precompute moves --input syllables.txt
+"""
+import argparse
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from ..core.database import storage_client
+from ..core.idiom_corpus import idiom_corpus
+from ..core.precomputed import copy_meanings, copy_move_pools, copy_verdicts
+from ..core.serialization import dumps, loads
+from ..core.utils import get_last_char
+from ..services import idiom_service, wordchain_service
+
+# Candidates requested per syllable for a move pool (the live path asks for AI_CANDIDATE_COUNT)
+MOVE_POOL_SIZE = 20
+
+
+def read_input(path: str) -> list[str]:
+    keys = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            keys.append(line)
+    return keys
+
+
+async def seen_words(game: str) -> list[str]:
+    """Words from past games and games in progress"""
+    pool = await storage_client.get_pool()
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT jsonb_array_elements_text(words) AS word FROM {game}_history
+            UNION
+            SELECT w.word
+            FROM {game}_state s
+            CROSS JOIN LATERAL unnest(s.used_word_ids) AS u(id)
+            JOIN words w ON w.id = u.id
+            """
+        )
+
+    return [row["word"] for row in rows]
+
+
+def _read_checkpoint(path: Path) -> set[str]:
+    if not path.exists():
+        return set()
+    with path.open(encoding="utf-8") as f:
+        return {loads(line)["key"] for line in f if line.strip()}
+
+
+def _append_checkpoint(path: Path, results: list[tuple[str, object]]):
+    with path.open("a", encoding="utf-8") as f:
+        for key, value in results:
+            f.write(dumps({"key": key, "value": value}) + "\n")
+
+
+async def run_batches(
+    name: str,
+    keys: list[str],
+    compute: Callable[[str], Awaitable[object | None]],
+    load: Callable[[object, list[tuple[str, object]]], Awaitable[None]],
+    args: argparse.Namespace,
+) -> int:
+    """Compute every key not in the checkpoint yet and bulk-load the results batch by batch.
+
+    `compute` returns None for keys that produced nothing; those (and failures) are retried next run.
+    """
+    checkpoint = Path(args.checkpoint_dir) / f"{name}.jsonl"
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    if args.fresh:
+        checkpoint.unlink(missing_ok=True)
+
+    keys = set(keys)
+    todo = sorted(keys - _read_checkpoint(checkpoint))
+    print(f"{name}: {len(keys)} keys, {len(keys) - len(todo)} already in checkpoint, {len(todo)} to compute")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(key: str):
+        async with semaphore:
+            try:
+                return key, await compute(key)
+            except Exception as e:
+                print(f"{name}: {key} failed: {e}")
+                return key, None
+
+    pool = await storage_client.get_pool()
+    stored = 0
+    for start in range(0, len(todo), args.batch_size):
+        batch = todo[start:start + args.batch_size]
+        results = [(key, value) for key, value in await asyncio.gather(*(one(key) for key in batch)) if value is not None]
+
+        # DB에 적재된 뒤에만 체크포인트에 기록한다 (중간에 죽으면 해당 배치만 다시 계산)
+        if results:
+            async with pool.acquire() as conn:
+                await load(conn, results)
+            _append_checkpoint(checkpoint, results)
+
+        stored += len(results)
+        print(f"{name}: {start + len(batch)}/{len(todo)} computed, {stored} stored")
+
+    return stored
+
+
+async def precompute_verdicts(args: argparse.Namespace) -> int:
+    if args.game == "wordchain":
+        ask = wordchain_service.ask_word_verdict
+    else:
+        ask = idiom_service.ask_idiom_verdict
+
+    keys = read_input(args.input) if args.input else await seen_words(args.game)
+    if args.game == "idiom":
+        # 번들 사자성어는 항상 유효하므로 모델에 묻지 않는다
+        keys = [key for key in keys if key not in idiom_corpus]
+
+    async def load(conn, results):
+        await copy_verdicts(conn, [(args.game, word, is_valid, reason) for word, (is_valid, reason) in results])
+
+    return await run_batches(f"verdicts-{args.game}", keys, ask, load, args)
+
+
+async def precompute_meanings(args: argparse.Namespace) -> int:
+    if args.input:
+        keys = [key for key in read_input(args.input) if key not in idiom_corpus]
+    else:
+        keys = await idiom_service.list_idioms_without_meaning()
+
+    async def generate(idiom: str) -> str | None:
+        return await idiom_service.generate_idiom_meaning(idiom) or None
+
+    return await run_batches("meanings", keys, generate, copy_meanings, args)
+
+
+async def precompute_moves(args: argparse.Namespace) -> int:
+    # 입력이 한 글자면 그 음절, 단어면 그 단어에 이어 AI가 답해야 하는 음절
+    words = read_input(args.input) if args.input else await seen_words("wordchain")
+    keys = [word if len(word) == 1 else get_last_char(word) for word in words]
+
+    async def generate(syllable: str) -> list[str] | None:
+        candidates = await wordchain_service.get_ai_candidates([], syllable, 3, count=args.pool_size)
+        legal = list(dict.fromkeys(c for c in candidates if wordchain_service.validate_ai_word(c, [], syllable)[0]))
+        return legal or None
+
+    return await run_batches("moves", keys, generate, copy_move_pools, args)
+
+
+JOBS = {
+    "verdicts": precompute_verdicts,
+    "meanings": precompute_meanings,
+    "moves": precompute_moves,
+}
+
+
+async def main(args: argparse.Namespace):
+    if storage_client.dialect != "postgres":
+        # 결과를 COPY와 DISTINCT ON upsert로 적재하므로 Postgres가 필요하다
+        raise SystemExit("precompute needs STORAGE_BACKEND=postgres")
+
+    await storage_client.connect()
+    try:
+        await JOBS[args.job](args)
+    finally:
+        await storage_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute cached LLM results")
+    parser.add_argument("job", choices=list(JOBS))
+    parser.add_argument("--game", choices=["wordchain", "idiom"], default="wordchain", help="verdicts only")
+    parser.add_argument("--input", help="word list to use instead of the words seen in games")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=MOVE_POOL_SIZE, help="moves only")
+    parser.add_argument("--checkpoint-dir", default=".precompute")
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoint and start over")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,39 @@
+"""Backfill chat_search for sessions saved before search existed (hot and archived).
+
+New messages are indexed when a session is saved, so this only needs to run once after the
+upgrade; already indexed messages are skipped, so it is safe to run again.
+
+Run from the backend directory:
+    python -m app.cli.reindex_chat
+"""
+import asyncio
+
+from ..core.database import storage_client
+from ..services.chat_service import _index_messages, _unpack_session
+
+
+async def main():
+    await storage_client.connect()
+    try:
+        pool = await storage_client.get_pool()
+        async with pool.acquire() as conn:
+            hot = await conn.fetch("SELECT username, session_id, messages FROM chat_history")
+            archived = await conn.fetch("SELECT username, session_id, codec, payload FROM chat_archive")
+
+            sessions = [(row["username"], row["session_id"], row["messages"]) for row in hot]
+            sessions += [
+                (row["username"], row["session_id"], _unpack_session(row["codec"], row["payload"])["messages"])
+                for row in archived
+            ]
+
+            for username, session_id, messages in sessions:
+                await _index_messages(conn, username, session_id, messages or [])
+            indexed = await conn.fetchval("SELECT COUNT(*) FROM chat_search")
+
+        print(f"reindex_chat: {len(sessions)} sessions scanned, {indexed} messages indexed")
+    finally:
+        await storage_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""Deterministic OpenAI-compatible stub for local runs and load tests (no API key, no cost).
+
+Serves POST /v1/chat/completions (plain and stream=True) with canned answers shaped like the
+prompts this app sends: YES verdicts, one-line meanings, candidate word lists and the combined
+wordchain JSON turn, plus GET /v1/models for the app's connection warm-up.
+
+Run from the backend directory and point the app at it:
+    python -m app.cli.stub_llm --port 8001 --latency 0.2
+    OPENAI_BASE_URL=http://localhost:8001/v1
+"""
+import argparse
+import asyncio
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from ..core.serialization import FastJSONResponse, dumps
+
+SUFFIXES = ["구", "리", "비", "정", "수", "도", "마", "소", "기", "라", "주", "모", "자", "바", "누", "시", "우", "로", "미", "부"]
+IDIOM_SUFFIXES = ["일생", "만사", "동락", "상통", "천지", "무궁", "대길", "여일", "불변", "자재"]
+
+app = FastAPI(title="Stub LLM")
+app.state.latency = 0.0
+
+
+def _candidates(syllable: str, count: int, idiom: bool) -> list[str]:
+    if idiom:
+        return [f"{syllable}{SUFFIXES[i % len(SUFFIXES)]}{IDIOM_SUFFIXES[i % len(IDIOM_SUFFIXES)]}" for i in range(count)]
+    return [f"{syllable}{SUFFIXES[i % len(SUFFIXES)]}" for i in range(count)]
+
+
+def reply_for(messages: list[dict], json_mode: bool) -> str:
+    prompt = "\n".join(str(m.get("content") or "") for m in messages)
+    start = re.search(r"'(.)'\(으\)로 시작", prompt)
+    syllable = start.group(1) if start else "가"
+
+    if json_mode:
+        candidates = _candidates(syllable, 3, idiom=False)
+        return dumps({"user_word_valid": True, "reason": "", "ai_word": candidates[0], "ai_candidates": candidates[1:]})
+
+    if "YES 또는 NO" in prompt:
+        return "YES"
+
+    meaning = re.search(r"(\S+)의 뜻을", prompt)
+    if meaning:
+        return f"{meaning.group(1)}: 스텁 해설입니다."
+
+    count = re.search(r"후보를 (\d+)개", prompt)
+    if count:
+        return "\n".join(_candidates(syllable, int(count.group(1)), idiom="사자성어" in prompt))
+
+    return "스텁 응답입니다."
+
+
+def _usage(messages: list[dict], content: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": len(content), "total_tokens": prompt_tokens + len(content)}
+
+
+@app.get("/v1/models")
+async def list_models():
+    # 앱이 시작할 때 연결을 미리 열기 위해 호출한다
+    return FastJSONResponse({"object": "list", "data": [{"id": "stub", "object": "model", "created": 0, "owned_by": "stub"}]})
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages") or []
+    model = body.get("model", "stub")
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    content = reply_for(messages, json_mode)
+    created = int(time.time())
+
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+
+    if not body.get("stream"):
+        return FastJSONResponse({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": _usage(messages, content),
+        })
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    def chunk(delta: dict, finish_reason: str | None = None, usage: dict | None = None) -> str:
+        payload = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if usage:
+            payload["usage"] = usage
+        return f"data: {dumps(payload)}\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        # 줄 단위로 나눠 보내 후보 목록을 스트리밍으로 읽는 코드도 시험할 수 있게 한다
+        for piece in re.split(r"(?<=\n)", content):
+            yield chunk({"content": piece})
+        yield chunk({}, "stop")
+        if include_usage:
+            yield chunk({}, usage=_usage(messages, content))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every completion")
+    args = parser.parse_args()
+
+    app.state.latency = args.latency
+    uvicorn.run(app, host=args.host, port=args.port)
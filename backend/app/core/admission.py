@@ -0,0 +1,175 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncContextManager, AsyncIterator
+from fastapi import HTTPException
+from .config import (
+    ADMISSION_BACKEND,
+    ADMISSION_MAX_INFLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_USER_BURST,
+    ADMISSION_USER_RATE,
+)
+from .database import storage_client
+
+# Idle full buckets are dropped once this many users are tracked
+MAX_TRACKED_USERS = 10_000
+
+
+class AdmissionRejected(HTTPException):
+    """429 (user over their rate) or 503 (server shedding load), with Retry-After in seconds"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code, detail, headers={"Retry-After": str(self.retry_after)})
+
+
+class AdmissionController:
+    """Gatekeeper for requests that call the model.
+
+    Each user spends one token per request from a bucket refilled at `user_rate` per second.
+    Admitted requests then take one of `max_inflight` slots; when all are busy they wait in a
+    queue, and requests beyond `max_queue` waiters or `queue_timeout` seconds are shed.
+    """
+
+    def __init__(
+        self,
+        user_rate: float = ADMISSION_USER_RATE,
+        user_burst: float = ADMISSION_USER_BURST,
+        max_inflight: int = ADMISSION_MAX_INFLIGHT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        backend: str = ADMISSION_BACKEND,
+    ):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backend = backend
+        if backend == "postgres" and storage_client.dialect != "postgres":
+            raise ValueError("ADMISSION_BACKEND=postgres needs STORAGE_BACKEND=postgres")
+
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._inflight = 0
+        self._queued = 0
+        # 최근 요청 처리 시간의 이동 평균 (Retry-After 추정용)
+        self._avg_seconds = 1.0
+        self.counters = {
+            "admitted": 0,
+            "rate_limited": 0,
+            "shed_queue_full": 0,
+            "shed_timeout": 0,
+        }
+
+    def _take_token_memory(self, username: str) -> float:
+        """Spend a token; returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(username, (self.user_burst, now))
+        tokens = min(self.user_burst, tokens + (now - updated) * self.user_rate)
+
+        if tokens < 1:
+            self._buckets[username] = (tokens, now)
+            return (1 - tokens) / self.user_rate
+
+        if username not in self._buckets and len(self._buckets) >= MAX_TRACKED_USERS:
+            self._prune(now)
+        self._buckets[username] = (tokens - 1, now)
+        return 0
+
+    def _prune(self, now: float):
+        refill = self.user_burst / self.user_rate
+        self._buckets = {
+            username: (tokens, updated)
+            for username, (tokens, updated) in self._buckets.items()
+            if now - updated < refill
+        }
+
+    async def _take_token_postgres(self, username: str) -> float:
+        pool = await storage_client.get_pool()
+
+        async with pool.acquire() as conn:
+            tokens = await conn.fetchval(
+                """
+                INSERT INTO rate_limits AS r (username, tokens, updated_at)
+                VALUES ($1, $2 - 1, NOW())
+                ON CONFLICT (username) DO UPDATE SET
+                    tokens = LEAST($2, r.tokens + EXTRACT(EPOCH FROM NOW() - r.updated_at) * $3) - 1,
+                    updated_at = NOW()
+                WHERE LEAST($2, r.tokens + EXTRACT(EPOCH FROM NOW() - r.updated_at) * $3) >= 1
+                RETURNING tokens
+                """,
+                username,
+                float(self.user_burst),
+                float(self.user_rate),
+            )
+
+        # 조건을 만족하지 못해 갱신되지 않았으면 토큰이 없는 것
+        return 0 if tokens is not None else 1 / self.user_rate
+
+    async def _take_token(self, username: str) -> float:
+        if self.backend == "postgres":
+            return await self._take_token_postgres(username)
+        return self._take_token_memory(username)
+
+    def _estimated_wait(self) -> float:
+        return (self._queued + 1) * self._avg_seconds / self.max_inflight
+
+    @asynccontextmanager
+    async def admit(self, username: str, hold: AsyncContextManager | None = None) -> AsyncIterator[None]:
+        """Hold an in-flight slot for the body, or raise AdmissionRejected.
+
+        `hold` (the user's turn lock) is entered after the rate check and before a slot is
+        taken, so a user's own queued requests wait on their lock instead of on global slots.
+        """
+        wait = await self._take_token(username)
+        if wait > 0:
+            self.counters["rate_limited"] += 1
+            raise AdmissionRejected(429, "요청이 너무 많습니다. 잠시 후 다시 시도해주세요.", wait)
+
+        async with hold or nullcontext():
+            async with self._slot():
+                yield
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        if self._inflight + self._queued >= self.max_inflight + self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            raise AdmissionRejected(503, "서버가 혼잡합니다. 잠시 후 다시 시도해주세요.", self._estimated_wait())
+
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["shed_timeout"] += 1
+            raise AdmissionRejected(503, "서버가 혼잡합니다. 잠시 후 다시 시도해주세요.", self._estimated_wait())
+        finally:
+            self._queued -= 1
+
+        self.counters["admitted"] += 1
+        self._inflight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            self._slots.release()
+            self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * (time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": self.backend,
+            "inflight": self._inflight,
+            "queued": self._queued,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "tracked_users": len(self._buckets),
+            "avg_request_seconds": round(self._avg_seconds, 3),
+            **self.counters,
+        }
+
+
+admission = AdmissionController()
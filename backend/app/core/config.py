@@ -5,6 +5,17 @@ load_dotenv()
 
 # OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point at an OpenAI-compatible server instead, e.g. the stub: python -m app.cli.stub_llm
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# OpenAI HTTP connection pool (httpx); idle connections are kept for KEEPALIVE_EXPIRY seconds
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 100))
+LLM_HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_KEEPALIVE_CONNECTIONS", 20))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", 90))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() in ("1", "true", "yes")     # needs the h2 package
+# Connections opened at startup, and how often to re-warm them while idle (0 = never)
+LLM_WARMUP_CONNECTIONS = int(os.getenv("LLM_WARMUP_CONNECTIONS", 4))
+LLM_WARMUP_INTERVAL = float(os.getenv("LLM_WARMUP_INTERVAL", 0))
 
 # PostgreSQL
 POSTGRES_URL = os.getenv("POSTGRES_URL")
@@ -14,6 +25,83 @@ POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "ai_playground")
 
+# postgres, or sqlite for an embedded database file (single box, local runs; see sqlite_storage.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgres").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "ai_playground.db")     # ":memory:" for a throwaway database
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 4))
+
+# Wordchain: judge the user's word and pick the AI's reply in a single completion (one round
+# trip less; the verdict is then sampled at a low temperature rather than at 0)
+WORDCHAIN_COMBINED_CALL = os.getenv("WORDCHAIN_COMBINED_CALL", "false").lower() in ("1", "true", "yes")
+
+# AI moves: candidates requested per completion, and which legal candidate each difficulty plays
+# (candidates are ranked from most common to rarest, 0-based rank, clamped to the last legal one)
+AI_CANDIDATE_COUNT = int(os.getenv("AI_CANDIDATE_COUNT", 5))
+AI_PICK_RANK = {1: 0, 2: 0, 3: 1, 4: 2, 5: 3}
+# Stream the candidate list and stop reading as soon as the candidate to play is known
+AI_STREAM_MOVES = os.getenv("AI_STREAM_MOVES", "true").lower() in ("1", "true", "yes")
+
+# Model registry: model, max output tokens and latency SLO (seconds) per kind of LLM call.
+# The model can be overridden per call type with LLM_MODEL_<CALL_TYPE>, e.g. LLM_MODEL_CHAT=gpt-4o.
+# Hedged calls fire a duplicate request when the first is slower than the recent p95
+# (capped at the SLO) and use whichever answers first; only idempotent short calls are hedged.
+LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "gpt-4o-mini")
+LLM_HEDGING = os.getenv("LLM_HEDGING", "true").lower() in ("1", "true", "yes")
+
+
+def _route(call_type: str, max_tokens: int, slo: float, hedge: bool) -> dict:
+    return {
+        "model": os.getenv(f"LLM_MODEL_{call_type.upper()}", LLM_DEFAULT_MODEL),
+        "max_tokens": max_tokens,
+        "slo": slo,
+        "hedge": hedge,
+    }
+
+
+MODEL_REGISTRY = {
+    "judge": _route("judge", max_tokens=50, slo=1.5, hedge=True),
+    "wordchain_move": _route("wordchain_move", max_tokens=200, slo=3.0, hedge=False),
+    "idiom_move": _route("idiom_move", max_tokens=100, slo=3.0, hedge=False),
+    "idiom_meaning": _route("idiom_meaning", max_tokens=80, slo=2.0, hedge=True),
+    "chat": _route("chat", max_tokens=1000, slo=10.0, hedge=False),
+}
+
+# LLM usage ledger: USD per 1M (prompt, completion) tokens, and days of llm_usage partitions kept
+LLM_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+LLM_USAGE_RETENTION_DAYS = int(os.getenv("LLM_USAGE_RETENTION_DAYS", 30))
+
+# Chat sessions untouched for this many days move to chat_archive (compressed) until opened again;
+# the archiver runs every CHAT_ARCHIVE_INTERVAL seconds (0 disables it)
+CHAT_ARCHIVE_AFTER_DAYS = float(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", 14))
+CHAT_ARCHIVE_INTERVAL = float(os.getenv("CHAT_ARCHIVE_INTERVAL", 3600))
+
+# Admission control for LLM-backed endpoints
+# memory: per-process state; postgres: per-user buckets shared by every worker (rate_limits table)
+ADMISSION_BACKEND = os.getenv("ADMISSION_BACKEND", "memory").lower()
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", 1.0))       # tokens refilled per second
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", 5))       # bucket size
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", 16))    # concurrent LLM-backed requests
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 32))          # waiters before shedding
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 10))
+
+# Idempotency-Key results for the send endpoints: how long they are kept and where
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 300))
+
+# Where the ETag write counters live: memory (one worker) or database (user_versions table,
+# shared by every worker on the same storage)
+VERSIONS_BACKEND = os.getenv("VERSIONS_BACKEND", "memory").lower()
+
+# Seconds between SIGTERM (/readyz turns 503) and the server closing its listener, so the load
+# balancer can take the worker out of rotation first (0 = shut down at once)
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", 0))
+
+# Admin endpoints (/api/admin/*) require this in the X-Admin-Token header when set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # Prompts
 SYSTEM_PROMPT = "You are a helpful assistant. Respond in the same language the user uses. Keep responses concise and friendly."
 
@@ -77,5 +165,27 @@ WORDCHAIN_BASE = """Rules:
 IMPORTANT: Respond ONLY with a single Korean word. No explanations, no punctuation, no extra text."""
 
 
+WORDCHAIN_COMBINED_FORMAT = """You are also the referee for the user's word.
+Ignore the single-word output rule above and respond ONLY with a JSON object of this exact shape:
+{"user_word_valid": true or false, "reason": "why the user's word is rejected (empty when valid)", "ai_word": "your word", "ai_candidates": ["alternative words", "..."]}
+
+- user_word_valid: judge leniently; reject only made-up words or single characters
+- ai_word: your reply following the rules above, or 패배 if you cannot find one
+- ai_candidates: up to 5 other valid replies in order of preference"""
+
+
+WORDCHAIN_CANDIDATES_FORMAT = """Ignore the single-word output rule above for this turn.
+List several candidate words instead, one per line, ordered from the most common word to the rarest.
+No numbering, no explanations. If you cannot find any word, respond with exactly: 패배"""
+
+
 def get_difficulty_prompt(difficulty: int) -> str:
     return DIFFICULTY_PROMPTS.get(difficulty, DIFFICULTY_PROMPTS[3]) + "\n\n" + WORDCHAIN_BASE
+
+
+def get_candidates_prompt(difficulty: int) -> str:
+    return get_difficulty_prompt(difficulty) + "\n\n" + WORDCHAIN_CANDIDATES_FORMAT
+
+
+def get_combined_turn_prompt(difficulty: int) -> str:
+    return get_difficulty_prompt(difficulty) + "\n\n" + WORDCHAIN_COMBINED_FORMAT
@@ -1,7 +1,15 @@
 import asyncpg
 from openai import AsyncOpenAI
+from .llm_transport import llm_http_client
+from .serialization import register_json_codecs
+from .sqlite_storage import SQLiteClient
+from .storage import StorageClient
 from .config import (
     OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    STORAGE_BACKEND,
+    SQLITE_PATH,
+    SQLITE_POOL_SIZE,
     POSTGRES_URL,
     POSTGRES_HOST,
     POSTGRES_PORT,
@@ -11,14 +19,17 @@ from .config import (
 )
 
 
-class PostgresClient:
+class PostgresClient(StorageClient):
+    dialect = "postgres"
+
     def __init__(self):
         self.pool: asyncpg.Pool | None = None
 
     @staticmethod
     def _pool_kwargs() -> dict:
         # Supabase pooler(pgbouncer transaction mode)와의 prepared statement 충돌 방지
-        return {"statement_cache_size": 0}
+        # JSONB 컬럼은 Python 객체로 바로 읽고 쓴다 (json.dumps/json.loads 불필요)
+        return {"statement_cache_size": 0, "init": register_json_codecs}
 
     async def connect(self):
         if self.pool is not None:
@@ -61,7 +72,6 @@ class PostgresClient:
                     id BIGSERIAL PRIMARY KEY,
                     username TEXT NOT NULL,
                     session_id VARCHAR(8) NOT NULL,
-                    conversation JSONB NOT NULL DEFAULT '[]'::jsonb,
                     messages JSONB NOT NULL DEFAULT '[]'::jsonb,
                     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
                     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
@@ -71,6 +81,11 @@ class PostgresClient:
                 """
             )
 
+            # messages is the only copy of a chat; the OpenAI conversation is derived from it.
+            # Tables created before that still have a conversation column (NOT NULL DEFAULT '[]'):
+            # it is no longer read or written and is left for a later migration to drop, once no
+            # running worker of the previous version still reads it.
+
             await conn.execute(
                 """
                 CREATE INDEX IF NOT EXISTS idx_chat_history_username_updated
@@ -86,6 +101,55 @@ class PostgresClient:
                 """
             )
 
+            # One row per chat message for search; words are indexed as character bigrams
+            # (kept for archived sessions too, removed with the session)
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_search (
+                    username TEXT NOT NULL,
+                    session_id VARCHAR(8) NOT NULL,
+                    seq INTEGER NOT NULL,
+                    author TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    ngrams TSVECTOR NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (username, session_id, seq)
+                )
+                """
+            )
+
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_chat_search_ngrams
+                ON chat_search USING GIN (ngrams)
+                """
+            )
+
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_chat_search_user_created
+                ON chat_search (username, created_at DESC)
+                """
+            )
+
+            # Chat sessions idle for CHAT_ARCHIVE_AFTER_DAYS, compressed; moved back on access
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_archive (
+                    username TEXT NOT NULL,
+                    session_id VARCHAR(8) NOT NULL,
+                    codec TEXT NOT NULL,
+                    payload BYTEA NOT NULL,
+                    preview TEXT NOT NULL DEFAULT '',
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMPTZ NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL,
+                    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (username, session_id)
+                )
+                """
+            )
+
             # Wordchain current game state per user
             await conn.execute(
                 """
@@ -164,6 +228,13 @@ class PostgresClient:
                 """
             )
 
+            await conn.execute(
+                """
+                ALTER TABLE idiom_state
+                ADD COLUMN IF NOT EXISTS upcoming_idioms JSONB NOT NULL DEFAULT '[]'::jsonb
+                """
+            )
+
             # Idiom history list per user
             await conn.execute(
                 """
@@ -187,6 +258,153 @@ class PostgresClient:
                 """
             )
 
+            # Interned words; game state stores used words as ids into this table
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS words (
+                    id SERIAL PRIMARY KEY,
+                    word TEXT NOT NULL UNIQUE
+                )
+                """
+            )
+
+            for state_table in ("wordchain_state", "idiom_state"):
+                await conn.execute(
+                    f"""
+                    ALTER TABLE {state_table}
+                    ADD COLUMN IF NOT EXISTS used_word_ids INTEGER[] NOT NULL DEFAULT '{{}}'
+                    """
+                )
+
+                # Changes on every flush so a live WebSocket game can tell the row was written elsewhere
+                await conn.execute(f"ALTER TABLE {state_table} ADD COLUMN IF NOT EXISTS revision TEXT")
+
+                # Move words left in the legacy JSONB used_words column over to ids
+                await conn.execute(
+                    f"""
+                    INSERT INTO words (word)
+                    SELECT DISTINCT jsonb_array_elements_text(used_words)
+                    FROM {state_table}
+                    WHERE jsonb_array_length(used_words) > 0
+                    ON CONFLICT (word) DO NOTHING
+                    """
+                )
+                await conn.execute(
+                    f"""
+                    UPDATE {state_table} s
+                    SET used_word_ids = s.used_word_ids || ARRAY(
+                            SELECT w.id
+                            FROM jsonb_array_elements_text(s.used_words) WITH ORDINALITY AS u(word, seq)
+                            JOIN words w ON w.word = u.word
+                            ORDER BY u.seq
+                        ),
+                        used_words = '[]'::jsonb
+                    WHERE jsonb_array_length(s.used_words) > 0
+                    """
+                )
+
+            # Cached idiom meanings (filled on demand and by `python -m app.cli.precompute meanings`)
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS idiom_meanings (
+                    idiom TEXT PRIMARY KEY,
+                    meaning TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+
+            # Word verdicts and AI move pools filled by `python -m app.cli.precompute`
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS word_verdicts (
+                    game TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    is_valid BOOLEAN NOT NULL,
+                    reason TEXT NOT NULL DEFAULT '',
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (game, word)
+                )
+                """
+            )
+
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS wordchain_moves (
+                    syllable TEXT PRIMARY KEY,
+                    candidates JSONB NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+
+            # One row per LLM call, partitioned by day (partitions are created by the usage ledger)
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_usage (
+                    created_at TIMESTAMPTZ NOT NULL,
+                    username TEXT NOT NULL,
+                    call_type TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    cost_usd DOUBLE PRECISION NOT NULL,
+                    ttft_ms INTEGER,
+                    duration_ms INTEGER NOT NULL,
+                    ok BOOLEAN NOT NULL
+                ) PARTITION BY RANGE (created_at)
+                """
+            )
+
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_llm_usage_user_created
+                ON llm_usage (username, created_at)
+                """
+            )
+
+            # Per-user token buckets for ADMISSION_BACKEND=postgres
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    username TEXT PRIMARY KEY,
+                    tokens DOUBLE PRECISION NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+
+            # Idempotency-Key results for IDEMPOTENCY_BACKEND=postgres (response is NULL while running)
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    response JSONB,
+                    expires_at TIMESTAMPTZ NOT NULL
+                )
+                """
+            )
+
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires
+                ON idempotency_keys (expires_at)
+                """
+            )
+
+            # ETag write counters for VERSIONS_BACKEND=database
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS user_versions (
+                    scope TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    version BIGINT NOT NULL,
+                    PRIMARY KEY (scope, username)
+                )
+                """
+            )
+
     async def close(self):
         if self.pool is not None:
             await self.pool.close()
@@ -198,5 +416,11 @@ class PostgresClient:
         return self.pool
 
 
-storage_client = PostgresClient()
-openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+def create_storage_client() -> StorageClient:
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteClient(SQLITE_PATH, SQLITE_POOL_SIZE)
+    return PostgresClient()
+
+
+storage_client = create_storage_client()
+openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, http_client=llm_http_client)
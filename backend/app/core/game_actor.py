@@ -0,0 +1,129 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator
+from fastapi import WebSocket
+from .game_state import GameState, GameStateRepository
+from .serialization import dumps, loads
+
+# The live actor for each (state table, username); a new connection takes over from the old one
+_actors: dict[tuple[str, str], "GameActor"] = {}
+
+
+class GameActor:
+    """Owns one user's game for the lifetime of a WebSocket connection.
+
+    The row is loaded once on connect and kept in memory. After every turn it is checkpointed
+    to the DB in the background, and the next turn waits for that write before touching the
+    state. The user's lock is held from the start of a turn until its checkpoint is written, so
+    REST requests for the same game interleave between turns only; each turn first compares the
+    row's revision and reloads when something else (a REST send, /init, a restart) wrote it.
+    When the same user connects again, the old connection is closed after its current turn and
+    final checkpoint, and the new one rehydrates from the DB.
+    """
+
+    def __init__(self, repository: GameStateRepository, username: str, websocket: WebSocket):
+        self.repository = repository
+        self.username = username
+        self.websocket = websocket
+        self.game: GameState | None = None
+        # Set when a turn had to reload the game because the row changed elsewhere
+        self._reloaded = False
+        self._key = (repository.state_table, username)
+        self._turn_lock = asyncio.Lock()
+        self._checkpoint: asyncio.Task | None = None
+        self._connected = True
+
+    async def start(self, since: int = 0) -> GameState:
+        previous = _actors.get(self._key)
+        _actors[self._key] = self
+        if previous is not None:
+            await previous.hand_over()
+        return await self.reload(since)
+
+    async def reload(self, since: int = 0) -> GameState:
+        self.game = await self.repository.load(self.username, since)
+        self._reloaded = False
+        return self.game
+
+    def changed_elsewhere(self) -> bool:
+        """Whether a turn reloaded the game since the client last got the whole log (clears it)"""
+        changed, self._reloaded = self._reloaded, False
+        return changed
+
+    @asynccontextmanager
+    async def turn(self) -> AsyncIterator[GameState]:
+        """Serialize access to the state; a checkpoint is scheduled once the turn is done"""
+        async with self._turn_lock:
+            await self.settle()
+            held = AsyncExitStack()
+            await held.enter_async_context(self.repository.lock(self.username))
+            try:
+                if await self.repository.stored_revision(self.username) != self.game.revision:
+                    await self.reload()
+                    self._reloaded = True
+                yield self.game
+            except BaseException:
+                await held.aclose()
+                raise
+            # 체크포인트가 저장될 때까지 잠금을 유지한다 (그 사이 REST 요청이 끼어들지 않게)
+            self._checkpoint = asyncio.create_task(self._flush(self.game, held))
+
+    async def _flush(self, game: GameState, held: AsyncExitStack):
+        try:
+            await self.repository.flush(game)
+        except Exception as e:
+            # 실패한 변경은 dirty로 남아 다음 체크포인트에서 다시 저장된다
+            print(f"Game checkpoint failed: {e}")
+        finally:
+            await held.aclose()
+
+    async def settle(self):
+        """Wait for the checkpoint in flight, if any"""
+        if self._checkpoint is not None:
+            # Shielded so a cancelled connection does not cancel the write it is waiting on
+            await asyncio.shield(self._checkpoint)
+            self._checkpoint = None
+
+    async def receive(self) -> dict | None:
+        """Next frame as a JSON object; a malformed one is answered with an error frame (None)"""
+        text = await self.websocket.receive_text()
+        try:
+            data = loads(text)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await self.send({"type": "error", "status": 400, "message": "잘못된 요청 형식입니다."})
+            return None
+        return data
+
+    async def send(self, payload: dict):
+        """Send to the client; a dropped connection must not abort the turn being played"""
+        if not self._connected:
+            return
+        try:
+            await self.websocket.send_text(dumps(payload))
+        except Exception:
+            self._connected = False
+
+    async def hand_over(self):
+        self._connected = False
+        try:
+            await self.websocket.close(code=4000, reason="다른 연결에서 게임을 이어갑니다.")
+        except Exception:
+            pass
+        await self.stop()
+
+    async def stop(self):
+        """Finish the current turn and write whatever is still unsaved"""
+        async with self._turn_lock:
+            await self.settle()
+            if self.game is not None and self.game.is_dirty:
+                # 이전 체크포인트가 실패해 남은 변경: 그 사이 다른 곳에서 행을 바꿨다면 버린다
+                async with self.repository.lock(self.username):
+                    if await self.repository.stored_revision(self.username) == self.game.revision:
+                        try:
+                            await self.repository.flush(self.game)
+                        except Exception as e:
+                            print(f"Game checkpoint failed: {e}")
+        if _actors.get(self._key) is self:
+            del _actors[self._key]
@@ -0,0 +1,326 @@
+import uuid
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime
+from typing import AsyncIterator
+from .database import storage_client
+from .lexicon import UsedWords, lexicon
+from .locks import user_locks
+from .versions import user_versions
+
+
+class GameState:
+    """In-memory view of one user's game row, tracked for the duration of a request"""
+
+    def __init__(self, username: str, row=None, used_words: list[str] | None = None):
+        self.username = username
+        # Stored as word ids (used_word_ids) and resolved through the lexicon on load
+        self.used_words = UsedWords(used_words or [])
+        self._stored_word_count = len(self.used_words)
+        self.score: int = row["score"] if row else 0
+        self.is_game_over: bool = row["is_game_over"] if row else False
+        self.difficulty: int = row["difficulty"] if row else 3
+        self.current_idiom: str | None = row["current_idiom"] if row else None
+        # Token written with every flush; a different stored value means someone else wrote the row
+        self.revision: str | None = row["revision"] if row else None
+
+        # messages holds only the log tail after seq `since` plus messages added during this
+        # request; new ones are appended to the stored log on flush instead of rewriting it
+        self.messages: list[dict] = (row["messages"] or []) if row else []
+        self._stored_count: int = row["message_count"] if row else 0
+        self._tail_count = len(self.messages)
+
+        # Prepared next questions (idiom game only); the background refill appends to it under
+        # the user's lock and the flush stores whatever was not popped
+        self.upcoming: list[str] = (row.get("upcoming") or []) if row else []
+        self.popped_upcoming = 0
+
+        # Finished games waiting to be written to the history table on flush
+        self.pending_history: list[dict] = []
+        # ETag version returned by this request's own flush (None until it writes)
+        self.etag_version: int | None = None
+        self._loaded = self._snapshot()
+
+    def _snapshot(self) -> tuple:
+        return (
+            len(self.used_words),
+            self.score,
+            self.is_game_over,
+            self.difficulty,
+            self.current_idiom,
+            len(self.messages),
+            len(self.upcoming),
+            self.popped_upcoming,
+        )
+
+    @property
+    def new_messages(self) -> list[dict]:
+        return self.messages[self._tail_count:]
+
+    @property
+    def new_words(self) -> list[str]:
+        return self.used_words[self._stored_word_count:]
+
+    @property
+    def message_count(self) -> int:
+        """Sequence number of the last message in the log (0 when empty)"""
+        return self._stored_count + len(self.new_messages)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.pending_history) or self._snapshot() != self._loaded
+
+    def pop_upcoming(self) -> str | None:
+        """Take the next prepared question, skipping any that were used in the meantime"""
+        while self.popped_upcoming < len(self.upcoming):
+            idiom = self.upcoming[self.popped_upcoming]
+            self.popped_upcoming += 1
+            if idiom not in self.used_words and idiom != self.current_idiom:
+                return idiom
+        return None
+
+    def drop_upcoming(self):
+        self.popped_upcoming = len(self.upcoming)
+
+    def finish(self, result: str, timestamp: str):
+        """Mark the game as over and queue it for the history table"""
+        self.is_game_over = True
+        self.pending_history.append({
+            "score": self.score,
+            "difficulty": self.difficulty,
+            "words_count": len(self.used_words),
+            "words": list(self.used_words),
+            "result": result,
+            "timestamp": timestamp,
+        })
+
+    def mark_clean(self):
+        self._stored_word_count = len(self.used_words)
+        self.upcoming = self.upcoming[self.popped_upcoming:]
+        self.popped_upcoming = 0
+        self.pending_history = []
+        self._stored_count = self.message_count
+        self._tail_count = len(self.messages)
+        self._loaded = self._snapshot()
+
+
+class GameStateRepository:
+    """Loads a game row in one query and writes every change back in one transaction"""
+
+    def __init__(self, state_table: str, history_table: str, max_history: int, has_upcoming: bool = False):
+        self.state_table = state_table
+        self.history_table = history_table
+        self.max_history = max_history
+        # Whether the state table has an upcoming_idioms queue column
+        self.has_upcoming = has_upcoming
+
+    async def load(self, username: str, since: int | None = None) -> GameState:
+        """Load the game row. Messages after seq `since` are included only when it is given"""
+        pool = await storage_client.get_pool()
+
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                self._load_sql(),
+                username,
+                since,
+            )
+            used_words = await lexicon.resolve(conn, row["used_word_ids"]) if row else []
+
+        return GameState(username, row, used_words)
+
+    def _load_sql(self) -> str:
+        if storage_client.dialect == "sqlite":
+            # json_slice is the SQLite client's stand-in for the WITH ORDINALITY tail below
+            return f"""
+            SELECT used_word_ids,
+                   score,
+                   is_game_over,
+                   difficulty,
+                   current_idiom,
+                   revision,
+                   json_array_length(messages) AS message_count,
+                   {"upcoming_idioms" if self.has_upcoming else "'[]'"} AS "upcoming [JSON]",
+                   CASE WHEN $2 IS NULL THEN '[]' ELSE json_slice(messages, $2) END AS "messages [JSON]"
+            FROM {self.state_table}
+            WHERE username = $1
+            """
+
+        return f"""
+            SELECT used_word_ids,
+                   score,
+                   is_game_over,
+                   difficulty,
+                   current_idiom,
+                   revision,
+                   jsonb_array_length(messages) AS message_count,
+                   {"upcoming_idioms" if self.has_upcoming else "'[]'::jsonb"} AS upcoming,
+                   CASE
+                       WHEN $2::int IS NULL THEN '[]'::jsonb
+                       ELSE (
+                           SELECT COALESCE(jsonb_agg(m.value ORDER BY m.seq), '[]'::jsonb)
+                           FROM jsonb_array_elements(messages) WITH ORDINALITY AS m(value, seq)
+                           WHERE m.seq > $2
+                       )
+                   END AS messages
+            FROM {self.state_table}
+            WHERE username = $1
+            """
+
+    async def flush(self, game: GameState):
+        if not game.is_dirty:
+            return
+
+        pool = await storage_client.get_pool()
+        revision = uuid.uuid4().hex
+
+        async with pool.acquire() as conn:
+            # Interned outside the transaction so cached ids never point at rolled-back rows
+            new_word_ids = await lexicon.intern(conn, game.new_words)
+            async with conn.transaction():
+                await conn.execute(
+                    f"""
+                    INSERT INTO {self.state_table} (
+                        username,
+                        used_word_ids,
+                        score,
+                        is_game_over,
+                        difficulty,
+                        current_idiom,
+                        messages,
+                        revision{", upcoming_idioms" if self.has_upcoming else ""}
+                    ) VALUES (
+                        $1,
+                        $2::int[],
+                        $3,
+                        $4,
+                        $5,
+                        $6,
+                        $7::jsonb,
+                        $8{", $9::jsonb" if self.has_upcoming else ""}
+                    )
+                    ON CONFLICT (username)
+                    DO UPDATE SET
+                        used_word_ids = {self._append_sql("used_word_ids")},
+                        score = EXCLUDED.score,
+                        is_game_over = EXCLUDED.is_game_over,
+                        difficulty = EXCLUDED.difficulty,
+                        current_idiom = EXCLUDED.current_idiom,
+                        messages = {self._append_sql("messages")},{" upcoming_idioms = EXCLUDED.upcoming_idioms," if self.has_upcoming else ""}
+                        revision = EXCLUDED.revision,
+                        updated_at = NOW()
+                    """,
+                    game.username,
+                    new_word_ids,
+                    int(game.score),
+                    bool(game.is_game_over),
+                    int(game.difficulty),
+                    game.current_idiom,
+                    game.new_messages,
+                    revision,
+                    *([game.upcoming[game.popped_upcoming:]] if self.has_upcoming else []),
+                )
+
+                for game_result in game.pending_history:
+                    await self.insert_history(conn, game.username, game_result)
+
+        game.revision = revision
+        game.mark_clean()
+        game.etag_version = await self.touch(game.username)
+
+    async def touch(self, username: str) -> int:
+        """Record a write to the user's game or history so cached ETags stop matching"""
+        return await user_versions.bump(self.state_table, username)
+
+    async def etag(self, username: str, *variant) -> str:
+        return await user_versions.etag(self.state_table, username, *variant)
+
+    def tag(self, version: int, *variant) -> str:
+        return user_versions.tag(self.state_table, version, *variant)
+
+    def _append_sql(self, column: str) -> str:
+        """Stored array followed by the new elements (SQLite stores arrays as JSON text)"""
+        if storage_client.dialect == "sqlite":
+            return f"json_concat({self.state_table}.{column}, EXCLUDED.{column})"
+        return f"{self.state_table}.{column} || EXCLUDED.{column}"
+
+    async def stored_revision(self, username: str) -> str | None:
+        """Revision of the stored row (None when there is no row)"""
+        pool = await storage_client.get_pool()
+
+        async with pool.acquire() as conn:
+            return await conn.fetchval(
+                f"SELECT revision FROM {self.state_table} WHERE username = $1",
+                username,
+            )
+
+    @asynccontextmanager
+    async def session(self, username: str, since: int | None = None, held: bool = False) -> AsyncIterator[GameState]:
+        """Request-scoped unit of work: load once, mutate in memory, flush once on success.
+
+        Holds the user's lock throughout, so overlapping requests cannot interleave their
+        read-modify-write of the same row. Pass held=True when the caller already holds it.
+        """
+        async with nullcontext() if held else self.lock(username):
+            game = await self.load(username, since)
+            yield game
+            await self.flush(game)
+
+    def lock(self, username: str):
+        return user_locks.hold(f"{self.state_table}:{username}")
+
+    async def insert_history(self, conn, username: str, game_result: dict):
+        """Insert a finished game and trim the user's history to max_history rows"""
+        words = game_result.get("words", [])
+        timestamp = game_result.get("timestamp")
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+
+        await conn.execute(
+            f"""
+            INSERT INTO {self.history_table} (
+                username,
+                score,
+                difficulty,
+                words_count,
+                words,
+                result,
+                played_at
+            ) VALUES (
+                $1,
+                $2,
+                $3,
+                $4,
+                $5::jsonb,
+                $6,
+                COALESCE($7::timestamptz, NOW())
+            )
+            """,
+            username,
+            int(game_result.get("score", 0)),
+            int(game_result.get("difficulty", 3)),
+            int(game_result.get("words_count", len(words))),
+            words,
+            str(game_result.get("result", "lose")),
+            timestamp,
+        )
+
+        await conn.execute(
+            f"""
+            DELETE FROM {self.history_table}
+            WHERE username = $1
+              AND id IN (
+                  SELECT id
+                  FROM (
+                      SELECT id,
+                             ROW_NUMBER() OVER (
+                                 PARTITION BY username
+                                 ORDER BY played_at DESC, id DESC
+                             ) AS rn
+                      FROM {self.history_table}
+                      WHERE username = $1
+                  ) ranked
+                  WHERE rn > $2
+              )
+            """,
+            username,
+            self.max_history,
+        )
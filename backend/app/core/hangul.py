@@ -0,0 +1,81 @@
+"""Hangul syllable decomposition and a precomputed 두음법칙 table.
+
+Every precomposed syllable (가..힣, 11,172 of them) is resolved once at import time,
+so looking up the 두음법칙 form of a word's last syllable is a single list index.
+"""
+
+SYLLABLE_BASE = 0xAC00
+SYLLABLE_COUNT = 11172
+MEDIAL_COUNT = 21
+FINAL_COUNT = 28
+
+# 초성 index
+INITIAL_NIEUN = 2   # ㄴ
+INITIAL_RIEUL = 5   # ㄹ
+INITIAL_IEUNG = 11  # ㅇ
+
+# 중성 index
+# 제11항: 랴, 려, 례, 료, 류, 리 -> 야, 여, 예, 요, 유, 이
+RIEUL_TO_IEUNG_MEDIALS = frozenset({2, 6, 7, 12, 17, 20})   # ㅑ ㅕ ㅖ ㅛ ㅠ ㅣ
+# 제12항: 라, 래, 로, 뢰, 루, 르 -> 나, 내, 노, 뇌, 누, 느
+RIEUL_TO_NIEUN_MEDIALS = frozenset({0, 1, 8, 11, 13, 18})   # ㅏ ㅐ ㅗ ㅚ ㅜ ㅡ
+# 제10항: 녀, 뇨, 뉴, 니 -> 여, 요, 유, 이
+NIEUN_TO_IEUNG_MEDIALS = frozenset({6, 12, 17, 20})         # ㅕ ㅛ ㅠ ㅣ
+
+
+def is_syllable(char: str) -> bool:
+    return len(char) == 1 and 0 <= ord(char) - SYLLABLE_BASE < SYLLABLE_COUNT
+
+
+def decompose(char: str) -> tuple[int, int, int] | None:
+    """Split a syllable into (initial, medial, final) jamo indexes. None for non-syllables"""
+    if not is_syllable(char):
+        return None
+    index = ord(char) - SYLLABLE_BASE
+    return index // (MEDIAL_COUNT * FINAL_COUNT), (index // FINAL_COUNT) % MEDIAL_COUNT, index % FINAL_COUNT
+
+
+def compose(initial: int, medial: int, final: int = 0) -> str:
+    return chr(SYLLABLE_BASE + (initial * MEDIAL_COUNT + medial) * FINAL_COUNT + final)
+
+
+def _dueum_initial(initial: int, medial: int) -> int:
+    if initial == INITIAL_RIEUL:
+        if medial in RIEUL_TO_IEUNG_MEDIALS:
+            return INITIAL_IEUNG
+        if medial in RIEUL_TO_NIEUN_MEDIALS:
+            return INITIAL_NIEUN
+    elif initial == INITIAL_NIEUN and medial in NIEUN_TO_IEUNG_MEDIALS:
+        return INITIAL_IEUNG
+    return initial
+
+
+def _build_tables() -> tuple[list[str], list[frozenset[str]]]:
+    dueum_table = []
+    starts_table = []
+    for index in range(SYLLABLE_COUNT):
+        char = chr(SYLLABLE_BASE + index)
+        initial, medial, final = decompose(char)
+        converted = compose(_dueum_initial(initial, medial), medial, final)
+        dueum_table.append(converted)
+        starts_table.append(frozenset({char, converted}))
+    return dueum_table, starts_table
+
+
+_DUEUM_TABLE, _ALLOWED_STARTS = _build_tables()
+
+
+def apply_dueum(char: str) -> str:
+    """Return the 두음법칙 form of a syllable (렷 -> 엿, 룡 -> 용, 뉵 -> 육); other characters are returned as is"""
+    index = ord(char) - SYLLABLE_BASE if len(char) == 1 else -1
+    if 0 <= index < SYLLABLE_COUNT:
+        return _DUEUM_TABLE[index]
+    return char
+
+
+def allowed_starts(char: str) -> frozenset[str]:
+    """Syllables the next word may start with when the previous word ends in `char`"""
+    index = ord(char) - SYLLABLE_BASE if len(char) == 1 else -1
+    if 0 <= index < SYLLABLE_COUNT:
+        return _ALLOWED_STARTS[index]
+    return frozenset({char})
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from fastapi import HTTPException
+from .config import IDEMPOTENCY_BACKEND, IDEMPOTENCY_TTL
+from .database import storage_client
+from .serialization import dumps
+
+# How often a duplicate polls Postgres while the first request is still running
+POLL_INTERVAL = 0.2
+
+
+class IdempotencyStore:
+    """Short-lived results of requests sent with an Idempotency-Key header.
+
+    The first request with a key runs; a repeat with the same key gets the stored response,
+    or waits for the first one while it is still running. Failures are not stored, so a retry
+    after an error runs again. With backend="postgres" the results are shared by all workers.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, backend: str = IDEMPOTENCY_BACKEND):
+        self.ttl = ttl
+        self.backend = backend
+        if backend == "postgres" and storage_client.dialect != "postgres":
+            raise ValueError("IDEMPOTENCY_BACKEND=postgres needs STORAGE_BACKEND=postgres")
+        self._entries: OrderedDict[str, tuple[float, str, asyncio.Future]] = OrderedDict()
+
+    async def run(
+        self,
+        scope: str,
+        username: str,
+        key: str | None,
+        request: dict,
+        compute: Callable[[], Awaitable[dict]],
+    ) -> dict:
+        """Run `compute` once per (scope, username, key); without a key it always runs"""
+        if not key:
+            return await compute()
+
+        store_key = f"{scope}:{username}:{key}"
+        fingerprint = hashlib.sha256(dumps(request).encode("utf-8")).hexdigest()
+
+        if self.backend == "postgres":
+            return await self._run_postgres(store_key, fingerprint, compute)
+        return await self._run_memory(store_key, fingerprint, compute)
+
+    def _expire(self):
+        # TTL이 모두 같으므로 오래된 항목은 항상 앞쪽에 있다
+        now = time.monotonic()
+        while self._entries:
+            store_key, (expires, _, _) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            del self._entries[store_key]
+
+    async def _run_memory(self, store_key: str, fingerprint: str, compute) -> dict:
+        self._expire()
+
+        entry = self._entries.get(store_key)
+        if entry is not None:
+            _, stored_fingerprint, future = entry
+            _check_fingerprint(stored_fingerprint, fingerprint)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # 첫 요청이 중간에 끊겼으면 이번 요청이 다시 실행한다
+            return await self._run_memory(store_key, fingerprint, compute)
+
+        future = asyncio.get_running_loop().create_future()
+        self._entries[store_key] = (time.monotonic() + self.ttl, fingerprint, future)
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            self._entries.pop(store_key, None)
+            future.cancel()
+            raise
+        except Exception as e:
+            self._entries.pop(store_key, None)
+            future.set_exception(e)
+            # 대기 중인 중복 요청이 없으면 "exception was never retrieved" 경고를 막는다
+            future.exception()
+            raise
+
+        future.set_result(result)
+        return result
+
+    async def _run_postgres(self, store_key: str, fingerprint: str, compute) -> dict:
+        pool = await storage_client.get_pool()
+
+        async with pool.acquire() as conn:
+            claimed = await conn.fetchval(
+                """
+                WITH expired AS (
+                    DELETE FROM idempotency_keys WHERE expires_at < NOW()
+                )
+                INSERT INTO idempotency_keys (key, fingerprint, expires_at)
+                VALUES ($1, $2, NOW() + make_interval(secs => $3))
+                ON CONFLICT (key) DO NOTHING
+                RETURNING TRUE
+                """,
+                store_key,
+                fingerprint,
+                float(self.ttl),
+            )
+
+        if claimed:
+            try:
+                result = await compute()
+            except BaseException:
+                async with pool.acquire() as conn:
+                    await conn.execute("DELETE FROM idempotency_keys WHERE key = $1", store_key)
+                raise
+
+            async with pool.acquire() as conn:
+                await conn.execute(
+                    "UPDATE idempotency_keys SET response = $2::jsonb WHERE key = $1",
+                    store_key,
+                    result,
+                )
+            return result
+
+        deadline = time.monotonic() + self.ttl
+        while time.monotonic() < deadline:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    "SELECT fingerprint, response FROM idempotency_keys WHERE key = $1",
+                    store_key,
+                )
+
+            if row is None:
+                # 첫 요청이 실패해서 키가 지워졌으면 이번 요청이 다시 실행한다
+                return await self._run_postgres(store_key, fingerprint, compute)
+            _check_fingerprint(row["fingerprint"], fingerprint)
+            if row["response"] is not None:
+                return row["response"]
+            await asyncio.sleep(POLL_INTERVAL)
+
+        raise HTTPException(status_code=409, detail="같은 요청이 아직 처리 중입니다.")
+
+
+def _check_fingerprint(stored: str, fingerprint: str):
+    if stored != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key가 다른 요청에 이미 사용되었습니다.")
+
+
+idempotency = IdempotencyStore()
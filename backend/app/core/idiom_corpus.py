@@ -0,0 +1,73 @@
+import random
+from pathlib import Path
+from typing import Collection
+
+IDIOM_CORPUS_PATH = Path(__file__).resolve().parent.parent / "data" / "idioms.tsv"
+TIER_COUNT = 5
+
+
+class IdiomCorpus:
+    """Bundled 사자성어 list held in parallel arrays with a shuffled index per difficulty tier"""
+
+    def __init__(self, entries: list[tuple[str, int, str]], seed: int | None = None):
+        # 흔한 표현일수록 앞에 오도록 정렬한 뒤 같은 크기의 난이도 구간으로 나눈다
+        entries = sorted(entries, key=lambda entry: -entry[1])
+
+        self.idioms: list[str] = [idiom for idiom, _, _ in entries]
+        self.frequencies: list[int] = [frequency for _, frequency, _ in entries]
+        self.meanings: list[str] = [meaning for _, _, meaning in entries]
+        self.tiers: list[int] = [
+            1 + (position * TIER_COUNT) // len(entries) for position in range(len(entries))
+        ]
+        self.index: dict[str, int] = {idiom: i for i, idiom in enumerate(self.idioms)}
+
+        self._random = random.Random(seed)
+        self._tier_order: dict[int, list[int]] = {tier: [] for tier in range(1, TIER_COUNT + 1)}
+        for i, tier in enumerate(self.tiers):
+            self._tier_order[tier].append(i)
+        for order in self._tier_order.values():
+            self._random.shuffle(order)
+
+    @classmethod
+    def load(cls, path: Path = IDIOM_CORPUS_PATH) -> "IdiomCorpus":
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                idiom, frequency, meaning = line.rstrip("\n").split("\t")
+                entries.append((idiom, int(frequency), meaning))
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self.idioms)
+
+    def __contains__(self, idiom: str) -> bool:
+        return idiom in self.index
+
+    def meaning(self, idiom: str) -> str | None:
+        i = self.index.get(idiom)
+        return self.meanings[i] if i is not None else None
+
+    def sample(self, difficulty: int, used_words: Collection[str]) -> str | None:
+        """Pick a random unused idiom, preferring the tier for `difficulty` and then its neighbours.
+
+        Starts at a random position in the tier's shuffled index and skips used entries, so the
+        expected cost is O(1) while most of the tier is still unused.
+        """
+        difficulty = min(max(difficulty, 1), TIER_COUNT)
+        tiers = sorted(range(1, TIER_COUNT + 1), key=lambda tier: (abs(tier - difficulty), tier))
+
+        for tier in tiers:
+            order = self._tier_order[tier]
+            if not order:
+                continue
+            start = self._random.randrange(len(order))
+            for offset in range(len(order)):
+                idiom = self.idioms[order[(start + offset) % len(order)]]
+                if idiom not in used_words:
+                    return idiom
+        return None
+
+
+idiom_corpus = IdiomCorpus.load()
@@ -0,0 +1,107 @@
+from .database import storage_client
+
+
+class UsedWords(list):
+    """Append-only list of played words with an O(1) membership set alongside it"""
+
+    def __init__(self, words=()):
+        super().__init__(words)
+        self._seen = set(self)
+
+    def __contains__(self, word) -> bool:
+        return word in self._seen
+
+    def append(self, word: str):
+        super().append(word)
+        self._seen.add(word)
+
+    def extend(self, words):
+        for word in words:
+            self.append(word)
+
+
+class Lexicon:
+    """Maps words to the stable integer ids stored in the `words` table, caching both directions"""
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._ids: dict[str, int] = {}
+        self._words: dict[int, str] = {}
+
+    def _remember(self, word_id: int, word: str):
+        if len(self._ids) >= self.max_size:
+            self._ids.clear()
+            self._words.clear()
+        self._ids[word] = word_id
+        self._words[word_id] = word
+
+    async def resolve(self, conn, word_ids: list[int]) -> list[str]:
+        """Turn stored ids back into words; only ids not cached yet cost a query"""
+        words = {word_id: self._words[word_id] for word_id in word_ids if word_id in self._words}
+        missing = [word_id for word_id in set(word_ids) if word_id not in words]
+        if missing:
+            if storage_client.dialect == "sqlite":
+                query = "SELECT id, word FROM words WHERE id IN (SELECT value FROM json_each($1))"
+            else:
+                query = "SELECT id, word FROM words WHERE id = ANY($1::int[])"
+            rows = await conn.fetch(query, missing)
+            for row in rows:
+                words[row["id"]] = row["word"]
+                self._remember(row["id"], row["word"])
+
+        return [words[word_id] for word_id in word_ids if word_id in words]
+
+    async def intern(self, conn, words: list[str]) -> list[int]:
+        """Get ids for words, inserting the ones the table has not seen yet"""
+        ids = {word: self._ids[word] for word in words if word in self._ids}
+        missing = list({word for word in words if word not in ids})
+        if missing:
+            if storage_client.dialect == "sqlite":
+                rows = await self._insert_sqlite(conn, missing)
+            else:
+                rows = await self._insert_postgres(conn, missing)
+            for row in rows:
+                ids[row["word"]] = row["id"]
+                self._remember(row["id"], row["word"])
+
+        return [ids[word] for word in words]
+
+    @staticmethod
+    async def _insert_postgres(conn, words: list[str]):
+        rows = await conn.fetch(
+            """
+            WITH inserted AS (
+                INSERT INTO words (word)
+                SELECT unnest($1::text[])
+                ON CONFLICT (word) DO NOTHING
+                RETURNING id, word
+            )
+            SELECT id, word FROM inserted
+            UNION ALL
+            SELECT id, word FROM words WHERE word = ANY($1::text[])
+            """,
+            words,
+        )
+
+        # A word another transaction committed after this statement's snapshot is neither
+        # inserted nor visible to the SELECT above; a new statement sees it
+        found = {row["word"] for row in rows}
+        late = [word for word in words if word not in found]
+        if late:
+            rows += await conn.fetch("SELECT id, word FROM words WHERE word = ANY($1::text[])", late)
+        return rows
+
+    @staticmethod
+    async def _insert_sqlite(conn, words: list[str]):
+        # SQLite has no data-modifying CTEs: insert, then read every id back
+        await conn.execute(
+            "INSERT INTO words (word) SELECT value FROM json_each($1) WHERE TRUE ON CONFLICT (word) DO NOTHING",
+            words,
+        )
+        return await conn.fetch(
+            "SELECT id, word FROM words WHERE word IN (SELECT value FROM json_each($1))",
+            words,
+        )
+
+
+lexicon = Lexicon()
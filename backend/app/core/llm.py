@@ -0,0 +1,231 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import AsyncIterator
+from .config import LLM_HEDGING, MODEL_REGISTRY
+from .database import openai_client
+from .usage import usage_ledger
+from .utils import CandidateDecoder
+
+# Latency samples kept per call type, and how many are needed before the p95 is trusted
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+
+class MeteredStream:
+    """A streamed completion that records TTFT, duration and tokens once it ends or is closed.
+
+    Token counts come from the final usage chunk. A stream closed before it arrives has no
+    counts to report, so it is recorded with unknown (NULL) tokens rather than a guess.
+    """
+
+    def __init__(self, stream, call_type: str, model: str, started: float):
+        self._stream = stream
+        self.call_type = call_type
+        self.model = model
+        self._started = started
+        self._ttft: float | None = None
+        self._usage = None
+        self._ok = True
+        self._recorded = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            async for chunk in self._stream:
+                if getattr(chunk, "usage", None):
+                    self._usage = chunk.usage
+                if self._ttft is None and chunk.choices and chunk.choices[0].delta.content:
+                    self._ttft = time.monotonic() - self._started
+                yield chunk
+        except Exception:
+            self._ok = False
+            raise
+        finally:
+            self._record()
+
+    async def close(self):
+        try:
+            await self._stream.close()
+        finally:
+            self._record()
+
+    def _record(self):
+        if self._recorded:
+            return
+        self._recorded = True
+
+        usage = self._usage
+        usage_ledger.record(
+            self.call_type,
+            self.model,
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+            self._ttft,
+            time.monotonic() - self._started,
+            ok=self._ok,
+        )
+
+
+class LLMRouter:
+    """Sends chat completions with the model and limits registered for each call type.
+
+    Hedged call types start a duplicate request once the first one has taken longer than the
+    recent p95 for that type (the SLO until enough samples exist, and never more than the SLO);
+    the first answer wins and the other request is cancelled. A hedged call adds one latency
+    sample, timed from its first attempt whichever attempt answered. Cancelled requests are
+    recorded as failed calls, with the prompt tokens of the answer that won (same prompt).
+    """
+
+    def __init__(self, registry: dict[str, dict] = MODEL_REGISTRY, hedging: bool = LLM_HEDGING):
+        self.registry = registry
+        self.hedging = hedging
+        self._latencies = {call_type: deque(maxlen=LATENCY_WINDOW) for call_type in registry}
+        self._counters = {
+            call_type: {"calls": 0, "errors": 0, "hedged": 0, "hedge_wins": 0, "slo_misses": 0}
+            for call_type in registry
+        }
+
+    async def complete(self, call_type: str, messages: list[dict], **kwargs):
+        """chat.completions.create for `call_type`; kwargs override the registry (e.g. max_tokens)"""
+        route = self.registry[call_type]
+        params = {"model": route["model"], "max_tokens": route["max_tokens"], **kwargs}
+
+        if kwargs.get("stream"):
+            # 스트리밍은 hedge 대상이 아니며, 사용량은 스트림이 끝나거나 닫힐 때 기록한다
+            self._counters[call_type]["calls"] += 1
+            params.setdefault("stream_options", {"include_usage": True})
+            started = time.monotonic()
+            try:
+                stream = await openai_client.chat.completions.create(messages=messages, **params)
+            except Exception:
+                self._counters[call_type]["errors"] += 1
+                usage_ledger.record(call_type, params["model"], None, None, None, time.monotonic() - started, ok=False)
+                raise
+            return MeteredStream(stream, call_type, params["model"], started)
+
+        if not (self.hedging and route["hedge"]):
+            return await self._timed(call_type, messages, params)
+        return await self._hedged(call_type, messages, params)
+
+    async def stream_candidates(
+        self, call_type: str, decoder: CandidateDecoder, messages: list[dict], **kwargs
+    ) -> AsyncIterator[str]:
+        """Stream a candidate list and yield each candidate as soon as it is complete.
+
+        The upstream response is closed as soon as the caller stops iterating (use aclosing),
+        so the remaining tokens are never generated into a socket nobody reads.
+        """
+        stream = await self.complete(call_type, messages, stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                for candidate in decoder.feed(chunk.choices[0].delta.content or ""):
+                    yield candidate
+            for candidate in decoder.finish():
+                yield candidate
+        finally:
+            await stream.close()
+
+    def hedge_delay(self, call_type: str) -> float:
+        slo = self.registry[call_type]["slo"]
+        samples = self._latencies[call_type]
+        if len(samples) < MIN_SAMPLES:
+            return slo
+        return min(statistics.quantiles(samples, n=20)[18], slo)
+
+    async def _timed(
+        self, call_type: str, messages: list[dict], params: dict, shared: dict | None = None, observe: bool = True
+    ):
+        """One request; `shared` is filled with the answer's usage for the other hedged attempts.
+
+        With observe=False the latency is left to the caller (a hedged call records it once).
+        """
+        counters = self._counters[call_type]
+        counters["calls"] += 1
+        started = time.monotonic()
+        try:
+            response = await openai_client.chat.completions.create(messages=messages, **params)
+        except asyncio.CancelledError:
+            # 취소돼도 이미 보낸 프롬프트는 과금되므로 기록한다 (생성된 토큰 수는 알 수 없다)
+            prompt_tokens = shared.get("prompt_tokens") if shared else None
+            usage_ledger.record(call_type, params["model"], prompt_tokens, None, None, time.monotonic() - started, ok=False)
+            raise
+        except Exception:
+            counters["errors"] += 1
+            usage_ledger.record(call_type, params["model"], None, None, None, time.monotonic() - started, ok=False)
+            raise
+
+        elapsed = time.monotonic() - started
+        usage = response.usage
+        if shared is not None and usage:
+            shared["prompt_tokens"] = usage.prompt_tokens
+        usage_ledger.record(
+            call_type,
+            params["model"],
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+            elapsed,
+            elapsed,
+        )
+        if observe:
+            self._observe(call_type, elapsed)
+        return response
+
+    def _observe(self, call_type: str, elapsed: float):
+        self._latencies[call_type].append(elapsed)
+        if elapsed > self.registry[call_type]["slo"]:
+            self._counters[call_type]["slo_misses"] += 1
+
+    async def _hedged(self, call_type: str, messages: list[dict], params: dict):
+        started = time.monotonic()
+        shared = {}
+        primary = asyncio.create_task(self._timed(call_type, messages, params, shared, observe=False))
+        tasks = {primary}
+        failed = False
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(call_type))
+            if not done:
+                self._counters[call_type]["hedged"] += 1
+                tasks.add(asyncio.create_task(self._timed(call_type, messages, params, shared, observe=False)))
+
+            # 먼저 성공한 응답을 쓰고, 하나가 실패하면 나머지를 기다린다
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._counters[call_type]["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            failed = True
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            # 어느 시도가 이기든 호출당 한 번, 처음 시작부터 잰다: 취소된 시도는 적어도 이만큼
+            # 걸렸으므로, 이긴 hedge의 짧은 시간만 쌓여 p95가 계속 내려가는 일이 없다
+            if not failed:
+                self._observe(call_type, time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        stats = {}
+        for call_type, route in self.registry.items():
+            samples = sorted(self._latencies[call_type])
+            stats[call_type] = {
+                "model": route["model"],
+                "hedge": self.hedging and route["hedge"],
+                "slo_seconds": route["slo"],
+                "p50_seconds": round(samples[len(samples) // 2], 3) if samples else None,
+                "hedge_delay_seconds": round(self.hedge_delay(call_type), 3),
+                **self._counters[call_type],
+            }
+        return stats
+
+
+llm = LLMRouter()
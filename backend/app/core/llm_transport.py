@@ -0,0 +1,154 @@
+"""HTTP transport of the OpenAI client: connection pool limits, keep-alive, HTTP/2 and warm-up.
+
+httpx defaults keep idle connections for only 5 seconds, so after a short pause the next
+completion pays for a new TCP + TLS handshake before its first token. The pool here keeps
+connections for LLM_HTTP_KEEPALIVE_EXPIRY seconds, startup opens LLM_WARMUP_CONNECTIONS of them
+ahead of the first request, and LLM_WARMUP_INTERVAL optionally re-warms them while idle.
+"""
+import asyncio
+import importlib.util
+import time
+from collections import deque
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from .config import (
+    LLM_HTTP2,
+    LLM_HTTP_KEEPALIVE_CONNECTIONS,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_WARMUP_CONNECTIONS,
+    LLM_WARMUP_INTERVAL,
+)
+
+# Seconds a warm-up request may take before it is given up (startup must not hang on it)
+WARMUP_TIMEOUT = 5.0
+
+# Connect/TLS timings kept for the snapshot
+CONNECT_WINDOW = 100
+
+
+class ConnectionMetrics:
+    """Pool settings of an httpx client plus counts of its requests and the connections opened.
+
+    Installed as a request event hook that adds the httpcore trace extension to every request:
+    a request that opens no connection reused a pooled one.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool):
+        self.limits = limits
+        self.http2 = http2
+        self.counters = {"requests": 0, "connections_opened": 0, "tls_handshakes": 0, "connect_errors": 0, "warmups": 0}
+        self._connect_seconds: deque[float] = deque(maxlen=CONNECT_WINDOW)
+
+    def client(self) -> DefaultAsyncHttpxClient:
+        """SDK http client with these pool settings, reporting into this object.
+
+        Keeps the SDK's default timeouts and redirect handling.
+        """
+        return DefaultAsyncHttpxClient(
+            limits=self.limits,
+            http2=self.http2,
+            event_hooks={"request": [self._on_request]},
+        )
+
+    async def _on_request(self, request: httpx.Request):
+        self.counters["requests"] += 1
+        request.extensions["trace"] = self._tracer()
+
+    def _tracer(self):
+        connect_started: float | None = None
+
+        async def trace(event_name: str, info: dict):
+            nonlocal connect_started
+            if event_name == "connection.connect_tcp.started":
+                connect_started = time.monotonic()
+            elif event_name == "connection.connect_tcp.complete":
+                self.counters["connections_opened"] += 1
+            elif event_name == "connection.connect_tcp.failed":
+                self.counters["connect_errors"] += 1
+            elif event_name == "connection.start_tls.complete":
+                self.counters["tls_handshakes"] += 1
+
+            # TCP 연결부터 TLS까지 걸린 시간 (평문 연결이면 TCP까지만)
+            if connect_started is not None and event_name in (
+                "connection.start_tls.complete",
+                "http11.send_request_headers.started",
+                "http2.send_connection_init.started",
+            ):
+                self._connect_seconds.append(time.monotonic() - connect_started)
+                connect_started = None
+
+        return trace
+
+    def snapshot(self) -> dict:
+        requests = self.counters["requests"]
+        reused = max(requests - self.counters["connections_opened"], 0)
+        samples = sorted(self._connect_seconds)
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry_seconds": self.limits.keepalive_expiry,
+            **self.counters,
+            "reused": reused,
+            "reuse_ratio": round(reused / requests, 3) if requests else None,
+            "connect_p50_ms": round(samples[len(samples) // 2] * 1000, 1) if samples else None,
+        }
+
+
+def _http2_enabled() -> bool:
+    if LLM_HTTP2 and importlib.util.find_spec("h2") is None:
+        print("LLM_HTTP2 needs the h2 package (pip install 'httpx[http2]'); using HTTP/1.1")
+        return False
+    return LLM_HTTP2
+
+
+llm_connections = ConnectionMetrics(
+    limits=httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+    ),
+    http2=_http2_enabled(),
+)
+
+# Passed to AsyncOpenAI
+llm_http_client = llm_connections.client()
+
+
+async def warm_up(client: AsyncOpenAI, connections: int = LLM_WARMUP_CONNECTIONS) -> int:
+    """Open up to `connections` pooled connections with concurrent GET /models requests.
+
+    Idle pooled connections are reused rather than opened again, so calling this again only
+    refreshes their keep-alive. Returns the number of requests that succeeded.
+    """
+    if connections <= 0:
+        return 0
+    if llm_connections.http2:
+        # HTTP/2은 연결 하나에 요청을 다중화하므로 하나만 열면 된다
+        connections = 1
+
+    quick = client.with_options(max_retries=0, timeout=WARMUP_TIMEOUT)
+    results = await asyncio.gather(
+        *(quick.models.list() for _ in range(connections)),
+        return_exceptions=True,
+    )
+    llm_connections.counters["warmups"] += 1
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if len(errors) == len(results):
+        print(f"LLM connection warm-up failed: {errors[0]!r}")
+    return len(results) - len(errors)
+
+
+async def run_llm_warmer(client: AsyncOpenAI, interval: float = LLM_WARMUP_INTERVAL):
+    """Background loop started with the app: re-warm the pool every `interval` seconds"""
+    if interval <= 0:
+        return
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await warm_up(client)
+        except Exception as e:
+            print(f"LLM connection warm-up failed: {e}")
@@ -0,0 +1,125 @@
+"""Tables filled ahead of time by `python -m app.cli.precompute` and read on the live path.
+
+word_verdicts      (game, word) -> verify_word_exists result
+idiom_meanings     idiom -> meaning (also filled on demand by get_idiom_meaning)
+wordchain_moves    starting syllable -> ranked AI candidate words
+
+Bulk loads go through COPY into a temporary staging table and are then upserted.
+"""
+from .database import storage_client
+from .serialization import dumps
+
+# Move pools read on the live path, cached per process (only hits; misses may be filled later)
+_move_pools: dict[str, list[str]] = {}
+
+
+async def load_verdict(game: str, word: str) -> tuple[bool, str] | None:
+    pool = await storage_client.get_pool()
+
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT is_valid, reason FROM word_verdicts WHERE game = $1 AND word = $2",
+            game,
+            word,
+        )
+    return (row["is_valid"], row["reason"]) if row else None
+
+
+async def store_verdict(game: str, word: str, is_valid: bool, reason: str):
+    pool = await storage_client.get_pool()
+
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO word_verdicts (game, word, is_valid, reason)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (game, word) DO NOTHING
+            """,
+            game,
+            word,
+            is_valid,
+            reason,
+        )
+
+
+async def load_move_pool(syllable: str) -> list[str]:
+    cached = _move_pools.get(syllable)
+    if cached is not None:
+        return cached
+
+    pool = await storage_client.get_pool()
+
+    async with pool.acquire() as conn:
+        candidates = await conn.fetchval(
+            "SELECT candidates FROM wordchain_moves WHERE syllable = $1",
+            syllable,
+        )
+    if candidates:
+        _move_pools[syllable] = candidates
+    return candidates or []
+
+
+async def _copy_upsert(conn, table: str, columns: list[str], records: list[tuple], upsert_sql: str):
+    async with conn.transaction():
+        await conn.execute(
+            f"CREATE TEMP TABLE _stage_{table} ({', '.join(columns)}) ON COMMIT DROP"
+        )
+        await conn.copy_records_to_table(
+            f"_stage_{table}",
+            records=records,
+            columns=[column.split()[0] for column in columns],
+        )
+        await conn.execute(upsert_sql)
+
+
+async def copy_verdicts(conn, records: list[tuple[str, str, bool, str]]):
+    """Bulk-load (game, word, is_valid, reason) rows; existing verdicts are overwritten"""
+    await _copy_upsert(
+        conn,
+        "word_verdicts",
+        ["game TEXT", "word TEXT", "is_valid BOOLEAN", "reason TEXT"],
+        records,
+        """
+        INSERT INTO word_verdicts (game, word, is_valid, reason)
+        SELECT DISTINCT ON (game, word) game, word, is_valid, reason FROM _stage_word_verdicts
+        ON CONFLICT (game, word) DO UPDATE SET
+            is_valid = EXCLUDED.is_valid,
+            reason = EXCLUDED.reason,
+            created_at = NOW()
+        """,
+    )
+
+
+async def copy_meanings(conn, records: list[tuple[str, str]]):
+    """Bulk-load (idiom, meaning) rows; meanings already stored are kept"""
+    await _copy_upsert(
+        conn,
+        "idiom_meanings",
+        ["idiom TEXT", "meaning TEXT"],
+        records,
+        """
+        INSERT INTO idiom_meanings (idiom, meaning)
+        SELECT DISTINCT ON (idiom) idiom, meaning FROM _stage_idiom_meanings
+        ON CONFLICT (idiom) DO NOTHING
+        """,
+    )
+
+
+async def copy_move_pools(conn, records: list[tuple[str, list[str]]]):
+    """Bulk-load (syllable, candidates) rows; existing pools are replaced"""
+    # COPY는 binary 포맷이라 JSONB는 텍스트로 올린 뒤 캐스팅한다
+    await _copy_upsert(
+        conn,
+        "wordchain_moves",
+        ["syllable TEXT", "candidates TEXT"],
+        [(syllable, dumps(candidates)) for syllable, candidates in records],
+        """
+        INSERT INTO wordchain_moves (syllable, candidates)
+        SELECT DISTINCT ON (syllable) syllable, candidates::jsonb FROM _stage_wordchain_moves
+        ON CONFLICT (syllable) DO UPDATE SET
+            candidates = EXCLUDED.candidates,
+            created_at = NOW()
+        """,
+    )
+    for syllable, _ in records:
+        _move_pools.pop(syllable, None)
@@ -0,0 +1,48 @@
+"""Character bigrams for searching Korean text with a tsvector GIN index.
+
+Korean has no spaces inside compounds and particles attach to nouns (사과를, 사과가), so
+dictionary-based tokenizers miss most matches. Instead every word is indexed as its
+overlapping two-character pieces, and a query matches when the text contains all of the
+query's pieces; the exact substring is checked afterwards to drop false positives.
+"""
+import html
+import re
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def ngrams(text: str) -> list[str]:
+    """Distinct lowercase bigrams of every word (a one-character word is kept as is)"""
+    grams = []
+    seen = set()
+    for word in WORD_RE.findall(text.lower()):
+        pieces = [word] if len(word) == 1 else [word[i:i + 2] for i in range(len(word) - 1)]
+        for piece in pieces:
+            if piece not in seen:
+                seen.add(piece)
+                grams.append(piece)
+    return grams
+
+
+def ngram_tsquery(query: str) -> str | None:
+    """tsquery text requiring every bigram of `query`; None when it has none to look up.
+
+    One-character words are left out: in the text they may be the edge of a longer word,
+    which is indexed only as its bigrams (a search for 사 must still find 사과). A query made
+    of such words alone gets None, and the caller falls back to the substring scan.
+    """
+    grams = [gram for gram in ngrams(query) if len(gram) > 1]
+    if not grams:
+        return None
+    # 단어 문자만 남기므로 따옴표 이스케이프가 필요 없다
+    return " & ".join(f"'{gram}'" for gram in grams)
+
+
+def highlight(snippet: str, query: str, prefix: bool, suffix: bool) -> str:
+    """HTML-escape a snippet and wrap each occurrence of `query` in <mark>"""
+    parts = re.split(f"({re.escape(query)})", snippet, flags=re.IGNORECASE)
+    marked = "".join(
+        f"<mark>{html.escape(part)}</mark>" if i % 2 else html.escape(part)
+        for i, part in enumerate(parts)
+    )
+    return ("…" if prefix else "") + marked + ("…" if suffix else "")
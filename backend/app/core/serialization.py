@@ -0,0 +1,48 @@
+"""JSON encoding shared by the asyncpg JSONB codecs, HTTP responses and SSE/WebSocket frames.
+
+Uses orjson when it is installed and falls back to the stdlib json module otherwise.
+"""
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return dumps(obj).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class; renders with the same encoder as the JSONB codecs"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+
+async def register_json_codecs(conn):
+    """asyncpg pool `init` hook: JSON/JSONB values go in as Python objects and come back decoded"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=dumps,
+            decoder=loads,
+            schema="pg_catalog",
+        )
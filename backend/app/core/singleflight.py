@@ -0,0 +1,65 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight task.
+
+    Every caller awaits the shared task through a shield, so one caller being cancelled does not
+    cancel the others; the task itself is cancelled only when every caller has gone away.
+    Results and errors are handed to all callers and nothing is kept once the task finishes.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, tuple[asyncio.Task, list[int]]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            entry = (task, [0])
+            self._inflight[key] = entry
+            task.add_done_callback(functools.partial(self._forget, key))
+        task, waiters = entry
+
+        waiters[0] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and waiters[0] == 1:
+                task.cancel()
+            raise
+        finally:
+            waiters[0] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        # 모든 호출자가 취소된 뒤 실패한 경우 "exception was never retrieved" 경고를 막는다
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+def singleflight(key: Callable[..., Hashable] | None = None):
+    """Decorator for deterministic async calls: concurrent calls with equal keys share one call.
+
+    `key` maps the call arguments to a normalized key; by default the arguments themselves are used.
+    """
+
+    def decorator(fn):
+        flight = SingleFlight()
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            call_key = key(*args, **kwargs) if key is not None else (args, tuple(sorted(kwargs.items())))
+            return await flight.do(call_key, fn, *args, **kwargs)
+
+        wrapper.flight = flight
+        return wrapper
+
+    return decorator
@@ -0,0 +1,414 @@
+"""Embedded SQLite storage for single-box deployments, local benchmarks and runs without Postgres.
+
+sqlite3 calls are blocking, so every connection lives on its own worker thread and the pool hands
+out asyncpg-style wrappers around them. Queries written for Postgres run as they are when they
+stick to the common subset: $n parameters become ?n, `::type` casts are dropped and NOW(),
+GREATEST, LEAST, strpos and char_length are provided as functions. Lists and dicts are stored as
+JSON text and timestamps as UTC ISO strings; declared column types (JSON, TIMESTAMPTZ, BOOLEAN)
+decode them again on the way out, and an expression can name its type as `AS "col [JSON]"`.
+"""
+import asyncio
+import re
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import AsyncIterator
+from asyncpg import UniqueViolationError
+from .serialization import dumps, loads
+from .storage import StorageClient
+
+PARAM_RE = re.compile(r"\$(\d+)")
+CAST_RE = re.compile(r"::[a-z_]+(\[\])?")
+
+# Milliseconds a writer waits for another connection's write transaction before failing
+BUSY_TIMEOUT_MS = 5000
+
+# Same UTC ISO format as the timestamps written from Python, so they compare as text
+NOW_DEFAULT = "(strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"
+
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        messages JSON NOT NULL DEFAULT '[]',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT},
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT},
+        is_current BOOLEAN NOT NULL DEFAULT FALSE,
+        UNIQUE (username, session_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_chat_history_username_updated ON chat_history (username, updated_at DESC)",
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_chat_history_current_per_user
+    ON chat_history (username)
+    WHERE is_current = TRUE
+    """,
+    # No n-gram column: search scans the user's messages, which is fast enough in-process
+    f"""
+    CREATE TABLE IF NOT EXISTS chat_search (
+        username TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        author TEXT NOT NULL,
+        message TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT},
+        PRIMARY KEY (username, session_id, seq)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_chat_search_user_created ON chat_search (username, created_at DESC)",
+    f"""
+    CREATE TABLE IF NOT EXISTS chat_archive (
+        username TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        codec TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        preview TEXT NOT NULL DEFAULT '',
+        message_count INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMPTZ NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL,
+        archived_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT},
+        PRIMARY KEY (username, session_id)
+    )
+    """,
+    *(
+        f"""
+        CREATE TABLE IF NOT EXISTS {state_table} (
+            username TEXT PRIMARY KEY,
+            used_word_ids JSON NOT NULL DEFAULT '[]',
+            score INTEGER NOT NULL DEFAULT 0,
+            is_game_over BOOLEAN NOT NULL DEFAULT FALSE,
+            difficulty INTEGER NOT NULL DEFAULT 3,
+            current_idiom TEXT,
+            messages JSON NOT NULL DEFAULT '[]',
+            upcoming_idioms JSON NOT NULL DEFAULT '[]',
+            revision TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT},
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT}
+        )
+        """
+        for state_table in ("wordchain_state", "idiom_state")
+    ),
+    *(
+        f"""
+        CREATE TABLE IF NOT EXISTS {history_table} (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            score INTEGER NOT NULL DEFAULT 0,
+            difficulty INTEGER NOT NULL DEFAULT 3,
+            words_count INTEGER NOT NULL DEFAULT 0,
+            words JSON NOT NULL DEFAULT '[]',
+            result TEXT NOT NULL DEFAULT 'lose',
+            played_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT}
+        )
+        """
+        for history_table in ("wordchain_history", "idiom_history")
+    ),
+    "CREATE INDEX IF NOT EXISTS idx_wordchain_history_username_played ON wordchain_history (username, played_at DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_idiom_history_username_played ON idiom_history (username, played_at DESC, id DESC)",
+    """
+    CREATE TABLE IF NOT EXISTS words (
+        id INTEGER PRIMARY KEY,
+        word TEXT NOT NULL UNIQUE
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS idiom_meanings (
+        idiom TEXT PRIMARY KEY,
+        meaning TEXT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT}
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS word_verdicts (
+        game TEXT NOT NULL,
+        word TEXT NOT NULL,
+        is_valid BOOLEAN NOT NULL,
+        reason TEXT NOT NULL DEFAULT '',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT},
+        PRIMARY KEY (game, word)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS wordchain_moves (
+        syllable TEXT PRIMARY KEY,
+        candidates JSON NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT {NOW_DEFAULT}
+    )
+    """,
+    # Not partitioned; the usage ledger deletes expired rows instead of dropping partitions
+    """
+    CREATE TABLE IF NOT EXISTS llm_usage (
+        created_at TIMESTAMPTZ NOT NULL,
+        username TEXT NOT NULL,
+        call_type TEXT NOT NULL,
+        model TEXT NOT NULL,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        cost_usd REAL NOT NULL,
+        ttft_ms INTEGER,
+        duration_ms INTEGER NOT NULL,
+        ok BOOLEAN NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_llm_usage_user_created ON llm_usage (username, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage (created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS user_versions (
+        scope TEXT NOT NULL,
+        username TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        PRIMARY KEY (scope, username)
+    )
+    """,
+]
+
+# (table, column, definition) added to databases created before the column existed;
+# SQLite has no ADD COLUMN IF NOT EXISTS
+ADDED_COLUMNS = [
+    ("wordchain_state", "revision", "TEXT"),
+    ("idiom_state", "revision", "TEXT"),
+]
+
+
+def _timestamp(value: datetime) -> str:
+    # naive datetime은 서버 로컬 시간으로 보고 UTC로 바꾼다
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+sqlite3.register_adapter(list, dumps)
+sqlite3.register_adapter(dict, dumps)
+sqlite3.register_adapter(datetime, _timestamp)
+sqlite3.register_converter("JSON", loads)
+sqlite3.register_converter("TIMESTAMPTZ", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: bool(int(value)))
+
+
+@lru_cache(maxsize=1024)
+def translate(query: str) -> str:
+    """Postgres query text -> SQLite: ?n parameters, casts removed"""
+    return CAST_RE.sub("", PARAM_RE.sub(r"?\1", query))
+
+
+def _json_concat(left: str | None, right: str | None) -> str:
+    """jsonb `||` for arrays"""
+    return dumps(loads(left or "[]") + loads(right or "[]"))
+
+
+def _json_slice(value: str | None, start: int) -> str:
+    """Array elements after the first `start` (the WITH ORDINALITY ... WHERE seq > n pattern)"""
+    return dumps(loads(value or "[]")[start:])
+
+
+def _strpos(text: str | None, substring: str | None) -> int | None:
+    if text is None or substring is None:
+        return None
+    return text.find(substring) + 1
+
+
+class _P95:
+    """percentile_cont(0.95) as an aggregate; NULLs are skipped"""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        if not self.values:
+            return None
+        values = sorted(self.values)
+        position = 0.95 * (len(values) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _open(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(
+        path,
+        detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    db.create_function("NOW", 0, lambda: _timestamp(datetime.now(timezone.utc)))
+    db.create_function("GREATEST", -1, lambda *values: max(v for v in values if v is not None))
+    db.create_function("LEAST", -1, lambda *values: min(v for v in values if v is not None))
+    db.create_function("strpos", 2, _strpos, deterministic=True)
+    db.create_function("char_length", 1, lambda text: None if text is None else len(text), deterministic=True)
+    # 내장 lower()는 ASCII만 바꾸므로 Python 구현으로 덮어쓴다
+    db.create_function("lower", 1, lambda text: None if text is None else text.lower(), deterministic=True)
+    db.create_function("json_concat", 2, _json_concat, deterministic=True)
+    db.create_function("json_slice", 2, _json_slice, deterministic=True)
+    db.create_aggregate("p95", 1, _P95)
+    return db
+
+
+class SQLiteConnection:
+    """asyncpg.Connection subset over one sqlite3 connection and its worker thread"""
+
+    def __init__(self, path: str):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._path = path
+        self._db: sqlite3.Connection | None = None
+        self._depth = 0
+
+    async def _run(self, fn, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        except sqlite3.IntegrityError as e:
+            if "UNIQUE" in str(e):
+                raise UniqueViolationError(str(e)) from e
+            raise
+
+    async def open(self):
+        self._db = await self._run(_open, self._path)
+
+    async def close(self):
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=False)
+
+    def _fetch(self, query: str, args: tuple) -> list[dict]:
+        cursor = self._db.execute(translate(query), args)
+        if cursor.description is None:
+            return []
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    async def fetch(self, query: str, *args) -> list[dict]:
+        return await self._run(self._fetch, query, args)
+
+    async def fetchrow(self, query: str, *args) -> dict | None:
+        rows = await self.fetch(query, *args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, query: str, *args):
+        row = await self.fetchrow(query, *args)
+        return next(iter(row.values())) if row else None
+
+    async def execute(self, query: str, *args) -> str:
+        await self.fetch(query, *args)
+        return "OK"
+
+    async def executemany(self, query: str, args):
+        await self._run(self._db.executemany, translate(query), list(args))
+
+    async def copy_records_to_table(self, table_name: str, *, records, columns: list[str]):
+        placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+        await self.executemany(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", records)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """BEGIN IMMEDIATE (takes the write lock up front), or a savepoint when nested"""
+        savepoint = f"sp_{self._depth}"
+        await self.execute("BEGIN IMMEDIATE" if self._depth == 0 else f"SAVEPOINT {savepoint}")
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                await self.execute("ROLLBACK")
+            else:
+                await self.execute(f"ROLLBACK TO {savepoint}")
+                await self.execute(f"RELEASE {savepoint}")
+            raise
+        self._depth -= 1
+        await self.execute("COMMIT" if self._depth == 0 else f"RELEASE {savepoint}")
+
+
+class SQLitePool:
+    """Hands connections to waiters in arrival order (a released connection goes to the oldest
+    waiter, so a task running queries back to back cannot starve the others)"""
+
+    def __init__(self, connections: list[SQLiteConnection]):
+        self._connections = connections
+        self._idle: deque[SQLiteConnection] = deque(connections)
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def _get(self) -> SQLiteConnection:
+        if self._idle and not self._waiters:
+            return self._idle.popleft()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(waiter.result())
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release(self, conn: SQLiteConnection):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(conn)
+                return
+        self._idle.append(conn)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[SQLiteConnection]:
+        conn = await self._get()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+
+
+class SQLiteClient(StorageClient):
+    dialect = "sqlite"
+
+    def __init__(self, path: str, pool_size: int):
+        self.path = path
+        # :memory: 데이터베이스는 연결마다 따로 생기므로 연결을 하나만 쓴다
+        self.pool_size = 1 if path == ":memory:" else max(pool_size, 1)
+        self.pool: SQLitePool | None = None
+
+    async def connect(self):
+        if self.pool is not None:
+            return
+
+        connections = []
+        for _ in range(self.pool_size):
+            conn = SQLiteConnection(self.path)
+            await conn.open()
+            connections.append(conn)
+
+        async with connections[0].transaction():
+            for statement in SCHEMA:
+                await connections[0].execute(statement)
+            for table, column, definition in ADDED_COLUMNS:
+                columns = await connections[0].fetch(f"SELECT name FROM pragma_table_info('{table}')")
+                if column not in {row["name"] for row in columns}:
+                    await connections[0].execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+        self.pool = SQLitePool(connections)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def get_pool(self) -> SQLitePool:
+        if self.pool is None:
+            await self.connect()
+        return self.pool
@@ -0,0 +1,24 @@
+from abc import ABC, abstractmethod
+
+
+class StorageClient(ABC):
+    """Database behind the services, selected by STORAGE_BACKEND.
+
+    get_pool() returns an asyncpg-style pool: `async with pool.acquire() as conn` gives a
+    connection with fetch/fetchrow/fetchval/execute/executemany/transaction, and queries use
+    $1-style parameters. `dialect` lets the few queries that need engine-specific SQL pick it.
+    """
+
+    dialect: str
+
+    @abstractmethod
+    async def connect(self):
+        """Open the pool and create the schema (a no-op when already connected)"""
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+    @abstractmethod
+    async def get_pool(self):
+        """The connected pool, connecting first if needed"""
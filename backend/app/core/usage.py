@@ -0,0 +1,252 @@
+import asyncio
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta, timezone
+from .config import LLM_PRICES, LLM_USAGE_RETENTION_DAYS
+from .database import storage_client
+
+# User the current request's LLM calls are billed to (set by the routers; tasks inherit it)
+usage_user: ContextVar[str | None] = ContextVar("usage_user", default=None)
+
+FLUSH_INTERVAL = 2.0
+FLUSH_BATCH = 500
+# Records waiting for the flusher; the oldest are dropped beyond this (Postgres down for a long time)
+MAX_PENDING = 20_000
+# Users with an in-memory rollup; beyond this the cheapest are dropped (llm_usage keeps every row)
+MAX_TRACKED_USERS = 10_000
+
+COLUMNS = [
+    "created_at",
+    "username",
+    "call_type",
+    "model",
+    "prompt_tokens",
+    "completion_tokens",
+    "cost_usd",
+    "ttft_ms",
+    "duration_ms",
+    "ok",
+]
+
+
+def call_cost(model: str, prompt_tokens: int | None, completion_tokens: int | None) -> float:
+    prompt_price, completion_price = LLM_PRICES.get(model, (0.0, 0.0))
+    return ((prompt_tokens or 0) * prompt_price + (completion_tokens or 0) * completion_price) / 1_000_000
+
+
+class UsageLedger:
+    """Per-call LLM usage: in-memory rollups plus rows batch-inserted into llm_usage.
+
+    record() only appends to a buffer and updates counters, so it never waits on the database;
+    a background task COPYs the buffer into the daily partition of llm_usage every few seconds.
+    The per-user rollups cover at most MAX_TRACKED_USERS users, keeping the most expensive.
+    """
+
+    def __init__(self, retention_days: int = LLM_USAGE_RETENTION_DAYS):
+        self.retention_days = retention_days
+        self._pending: deque[tuple] = deque(maxlen=MAX_PENDING)
+        self._flusher: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._partitions: set[str] = set()
+        self._by_user: dict[str, dict] = defaultdict(_empty_rollup)
+        self._by_call_type: dict[str, dict] = defaultdict(_empty_rollup)
+        self.counters = {"recorded": 0, "flushed": 0, "dropped": 0, "flush_errors": 0}
+        self.started_at = datetime.now(timezone.utc)
+
+    def record(
+        self,
+        call_type: str,
+        model: str,
+        prompt_tokens: int | None,
+        completion_tokens: int | None,
+        ttft: float | None,
+        duration: float,
+        ok: bool = True,
+    ):
+        username = usage_user.get() or "(system)"
+        cost = call_cost(model, prompt_tokens, completion_tokens)
+        if username not in self._by_user and len(self._by_user) >= MAX_TRACKED_USERS:
+            self._prune_users()
+
+        for rollup in (self._by_user[username], self._by_call_type[call_type]):
+            rollup["calls"] += 1
+            rollup["errors"] += 0 if ok else 1
+            rollup["prompt_tokens"] += prompt_tokens or 0
+            rollup["completion_tokens"] += completion_tokens or 0
+            rollup["cost_usd"] += cost
+            rollup["duration_seconds"] += duration
+
+        if len(self._pending) == self._pending.maxlen:
+            self.counters["dropped"] += 1
+        self._pending.append((
+            datetime.now(timezone.utc),
+            username,
+            call_type,
+            model,
+            prompt_tokens,
+            completion_tokens,
+            cost,
+            round(ttft * 1000) if ttft is not None else None,
+            round(duration * 1000),
+            ok,
+        ))
+        self.counters["recorded"] += 1
+
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+        if len(self._pending) >= FLUSH_BATCH:
+            self._wakeup.set()
+
+    def _prune_users(self):
+        # 비용이 적은 사용자부터 지워 상위 사용자 집계는 유지한다 (전체 기록은 llm_usage에 있다)
+        keep = sorted(self._by_user.items(), key=lambda item: item[1]["cost_usd"], reverse=True)
+        self._by_user = defaultdict(_empty_rollup, keep[: MAX_TRACKED_USERS * 9 // 10])
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(FLUSH_BATCH, len(self._pending)))]
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                # 집계는 요청 처리에 영향을 주면 안 되므로 실패한 배치는 버린다
+                self.counters["flush_errors"] += 1
+                print(f"LLM usage flush failed ({len(batch)} records dropped): {e}")
+                return
+            self.counters["flushed"] += len(batch)
+
+    async def _insert(self, batch: list[tuple]):
+        pool = await storage_client.get_pool()
+
+        async with pool.acquire() as conn:
+            for day in sorted({row[0].date() for row in batch}):
+                await self._ensure_partition(conn, day)
+            await conn.copy_records_to_table("llm_usage", records=batch, columns=COLUMNS)
+
+    async def _ensure_partition(self, conn, day):
+        name = f"llm_usage_{day:%Y%m%d}"
+        if name in self._partitions:
+            return
+
+        if storage_client.dialect == "sqlite":
+            # SQLite 테이블은 파티션이 없으므로 하루에 한 번 보존 기간이 지난 행을 지운다
+            cutoff = datetime.combine(day - timedelta(days=self.retention_days), time(), timezone.utc)
+            await conn.execute("DELETE FROM llm_usage WHERE created_at < $1", cutoff)
+            self._partitions.add(name)
+            return
+
+        await conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF llm_usage
+            FOR VALUES FROM ('{day} 00:00:00+00') TO ('{day + timedelta(days=1)} 00:00:00+00')
+            """
+        )
+        self._partitions.add(name)
+
+        # 새 파티션을 만들 때 보존 기간이 지난 파티션을 지운다
+        cutoff = f"llm_usage_{day - timedelta(days=self.retention_days):%Y%m%d}"
+        expired = await conn.fetch(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'llm_usage' AND c.relname < $1
+            """,
+            cutoff,
+        )
+        for row in expired:
+            await conn.execute(f"DROP TABLE IF EXISTS {row['relname']}")
+            self._partitions.discard(row["relname"])
+
+    async def close(self):
+        """Stop the flusher and write what is still buffered"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    def snapshot(self, limit: int = 10) -> dict:
+        """Top users by cost and every call type, since this process started"""
+        top_users = sorted(self._by_user.items(), key=lambda item: item[1]["cost_usd"], reverse=True)[:limit]
+        return {
+            "since": self.started_at.isoformat(),
+            "pending": len(self._pending),
+            **self.counters,
+            "top_users": [{"username": username, **_rounded(rollup)} for username, rollup in top_users],
+            "call_types": {call_type: _rounded(rollup) for call_type, rollup in self._by_call_type.items()},
+        }
+
+
+def _empty_rollup() -> dict:
+    return {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "duration_seconds": 0.0}
+
+
+def _rounded(rollup: dict) -> dict:
+    return {**rollup, "cost_usd": round(rollup["cost_usd"], 6), "duration_seconds": round(rollup["duration_seconds"], 3)}
+
+
+def _p95(column: str) -> str:
+    if storage_client.dialect == "sqlite":
+        return f"p95({column})"
+    return f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {column})"
+
+
+async def usage_report(days: int, limit: int = 10) -> dict:
+    """Top users and call types over the last `days` days, from llm_usage (all workers)"""
+    pool = await storage_client.get_pool()
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+
+    async with pool.acquire() as conn:
+        users = await conn.fetch(
+            f"""
+            SELECT username, COUNT(*) AS calls,
+                   COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+                   COALESCE(SUM(completion_tokens), 0) AS completion_tokens,
+                   SUM(cost_usd) AS cost_usd,
+                   {_p95("duration_ms")} AS p95_ms
+            FROM llm_usage
+            WHERE created_at >= $1
+            GROUP BY username
+            ORDER BY cost_usd DESC
+            LIMIT $2
+            """,
+            since,
+            limit,
+        )
+        call_types = await conn.fetch(
+            f"""
+            SELECT call_type, COUNT(*) AS calls,
+                   COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+                   COALESCE(SUM(completion_tokens), 0) AS completion_tokens,
+                   SUM(cost_usd) AS cost_usd,
+                   {_p95("ttft_ms")} AS p95_ttft_ms,
+                   {_p95("duration_ms")} AS p95_ms
+            FROM llm_usage
+            WHERE created_at >= $1
+            GROUP BY call_type
+            ORDER BY cost_usd DESC
+            """,
+            since,
+        )
+
+    return {
+        "since": since.isoformat(),
+        "top_users": [dict(row) for row in users],
+        "call_types": [dict(row) for row in call_types],
+    }
+
+
+usage_ledger = UsageLedger()
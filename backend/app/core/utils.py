@@ -1,31 +1,91 @@
+from .config import AI_PICK_RANK
+from .hangul import apply_dueum
+
+
 def get_last_char(word: str) -> str:
     """Get the last character of a Korean word, handling 두음법칙"""
     if not word:
         return ""
+    return apply_dueum(word[-1])
+
+
+def clean_word(text: str) -> str:
+    """Strip whitespace and punctuation the model tends to add around a word"""
+    return text.strip().replace(".", "").replace(",", "").replace("!", "").replace("?", "").strip()
+
+
+def parse_candidates(text: str | None) -> list[str]:
+    """Split a model's candidate list (one per line or comma separated) into unique words, keeping its order"""
+    candidates = []
+    for line in (text or "").replace(",", "\n").splitlines():
+        # "1. 사과", "- 사과" 같은 번호/기호 제거
+        word = clean_word(line.strip().lstrip("-*•0123456789).").strip())
+        if word and word not in candidates:
+            candidates.append(word)
+    return candidates
+
+
+class CandidateDecoder:
+    """Incremental parse_candidates for a streamed candidate list.
+
+    feed() returns the candidates completed by each chunk: a candidate ends at a newline or
+    comma, at whitespace when `split_on_space` is set, or once it holds `syllables` Hangul
+    syllables (e.g. 4 for idioms) - anything after that up to the next boundary is dropped.
+    """
+
+    def __init__(self, syllables: int | None = None, split_on_space: bool = False):
+        self.syllables = syllables
+        self.split_on_space = split_on_space
+        self._current = ""
+        self._skipping = False
+        self._seen: set[str] = set()
+
+    def _is_boundary(self, char: str) -> bool:
+        return char in "\n," or (self.split_on_space and char.isspace())
+
+    def _emit(self, text: str) -> list[str]:
+        word = clean_word(text.strip().lstrip("-*•0123456789).").strip())
+        if not word or word in self._seen:
+            return []
+        self._seen.add(word)
+        return [word]
+
+    def feed(self, text: str) -> list[str]:
+        completed = []
+        for char in text:
+            if self._is_boundary(char):
+                if not self._skipping:
+                    completed += self._emit(self._current)
+                self._current = ""
+                self._skipping = False
+                continue
+            if self._skipping:
+                continue
+
+            self._current += char
+            if self.syllables and sum("가" <= c <= "힣" for c in self._current) == self.syllables:
+                completed += self._emit(self._current)
+                self._current = ""
+                self._skipping = True
+        return completed
+
+    def finish(self) -> list[str]:
+        """Candidates left in the buffer once the stream has ended"""
+        completed = [] if self._skipping else self._emit(self._current)
+        self._current = ""
+        return completed
+
+
+def pick_rank(difficulty: int) -> int:
+    """Index of the legal candidate this difficulty plays (see AI_PICK_RANK)"""
+    return AI_PICK_RANK.get(difficulty, AI_PICK_RANK[3])
+
 
-    last_char = word[-1]
-
-    # 두음법칙 처리: ㄴ->ㅇ, ㄹ->ㅇ/ㄴ
-    # 랴,려,례,료,류,리 -> 야,여,예,요,유,이
-    # 라,래,로,뢰,루,르 -> 나,내,노,뇌,누,느
-    # 녀,뇨,뉴,니 -> 여,요,유,이
-    # 나,너 등은 그대로
-
-    dueum_map = {
-        # ㄹ -> ㅇ (ㅣ,ㅑ,ㅕ,ㅛ,ㅠ 모음 앞)
-        '랴': '야', '려': '여', '례': '예', '료': '요', '류': '유', '리': '이',
-        '량': '양', '력': '역', '련': '연', '렬': '열', '렴': '염', '렵': '엽',
-        '령': '영', '륭': '융', '률': '율', '림': '임', '립': '입',
-        # ㄹ -> ㄴ (ㅏ,ㅐ,ㅗ,ㅚ,ㅜ,ㅡ 모음 앞)
-        '라': '나', '래': '내', '로': '노', '뢰': '뇌', '루': '누', '르': '느',
-        '락': '낙', '란': '난', '랄': '날', '람': '남', '랍': '납', '랑': '낭',
-        '론': '논', '롱': '농', '뇨': '요',
-        # ㄴ -> ㅇ (ㅣ,ㅑ,ㅕ,ㅛ,ㅠ 모음 앞)
-        '녀': '여', '뇨': '요', '뉴': '유', '니': '이',
-        '녁': '역', '년': '연', '념': '염', '녕': '영',
-    }
-
-    return dueum_map.get(last_char, last_char)
+def pick_candidate(candidates: list[str], difficulty: int) -> str | None:
+    """Pick the legal candidate this difficulty plays from a list ranked common -> rare"""
+    if not candidates:
+        return None
+    return candidates[min(pick_rank(difficulty), len(candidates) - 1)]
 
 
 def is_valid_korean_format(word: str) -> bool:
@@ -0,0 +1,97 @@
+import uuid
+from fastapi import Request, Response
+from .config import VERSIONS_BACKEND
+from .database import storage_client
+from .serialization import FastJSONResponse
+
+
+class UserVersions:
+    """Per-user write counters that back the ETags of the polled GET endpoints.
+
+    Every service write for a user bumps the counter of its scope, so a poll whose
+    If-None-Match still matches can be answered with 304 without reading the user's data.
+    With backend="memory" the counters live in this process (the epoch changes on restart so
+    old tags never match); run more than one worker with backend="database", which keeps them
+    in the user_versions table so a write on one worker invalidates the tags of all of them.
+    """
+
+    def __init__(self, backend: str = VERSIONS_BACKEND):
+        self.backend = backend
+        self._epoch = "db" if backend == "database" else uuid.uuid4().hex[:8]
+        self._versions: dict[tuple[str, str], int] = {}
+
+    async def current(self, scope: str, username: str) -> int:
+        if self.backend == "database":
+            pool = await storage_client.get_pool()
+            async with pool.acquire() as conn:
+                version = await conn.fetchval(
+                    "SELECT version FROM user_versions WHERE scope = $1 AND username = $2",
+                    scope,
+                    username,
+                )
+            return version or 0
+        return self._versions.get((scope, username), 0)
+
+    async def bump(self, scope: str, username: str, conn=None) -> int:
+        """Record a write; returns the new version.
+
+        Pass the connection of the write when it is still held (the pool may have only one).
+        """
+        if self.backend == "database":
+            if conn is None:
+                pool = await storage_client.get_pool()
+                async with pool.acquire() as conn:
+                    return await self._bump_stored(conn, scope, username)
+            return await self._bump_stored(conn, scope, username)
+
+        key = (scope, username)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        return self._versions[key]
+
+    @staticmethod
+    async def _bump_stored(conn, scope: str, username: str) -> int:
+        return await conn.fetchval(
+            """
+            INSERT INTO user_versions (scope, username, version)
+            VALUES ($1, $2, 1)
+            ON CONFLICT (scope, username)
+            DO UPDATE SET version = user_versions.version + 1
+            RETURNING version
+            """,
+            scope,
+            username,
+        )
+
+    def tag(self, scope: str, version: int, *variant) -> str:
+        """Strong ETag for a response built from `scope` at `version`"""
+        parts = [scope, self._epoch, str(version), *map(str, variant)]
+        return '"' + "-".join(parts) + '"'
+
+    async def etag(self, scope: str, username: str, *variant) -> str:
+        """ETag for a response built from `scope` at its current version.
+
+        Take it before reading the DB: a write that lands during the read then leaves the
+        tag behind the body, which costs one extra full response instead of a stale 304.
+        A request that writes first should tag with the version its own bump returned.
+        """
+        return self.tag(scope, await self.current(scope, username), *variant)
+
+
+user_versions = UserVersions()
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """304 response when the client already holds the representation tagged `etag`"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def tagged_response(content, etag: str) -> FastJSONResponse:
+    # no-cache: 브라우저가 저장은 하되 매번 ETag로 재검증하게 한다
+    return FastJSONResponse(content, headers={"ETag": etag, "Cache-Control": "no-cache"})
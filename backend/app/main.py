@@ -1,9 +1,84 @@
+import asyncio
+import signal
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import chat, wordchain, idiom
-from .core.database import storage_client
+from fastapi.middleware.gzip import GZipMiddleware
+from .routers import admin, chat, wordchain, idiom
+from .core.config import SHUTDOWN_GRACE_SECONDS
+from .core.database import openai_client, storage_client
+from .core.llm_transport import run_llm_warmer, warm_up
+from .core.serialization import FastJSONResponse
+from .core.usage import usage_ledger
+from .services.chat_service import run_chat_archiver
+from .services.idiom_service import warm_idiom_meaning_cache
 
-app = FastAPI(title="AI Playground API")
+
+async def prepare_storage():
+    # connect()가 스키마를 만들고 풀을 min_size까지 채운다; 그다음 해석 캐시를 채운다
+    await storage_client.connect()
+    await warm_idiom_meaning_cache()
+
+
+def drain_on_sigterm(app: FastAPI, grace: float = SHUTDOWN_GRACE_SECONDS):
+    """Report not ready on SIGTERM and pass the signal on to the server `grace` seconds later.
+
+    The server closes its listener as soon as it handles SIGTERM and runs the lifespan shutdown
+    only after that, so readiness has to flip here for the load balancer to drain the worker
+    while it still serves. A second SIGTERM skips the rest of the wait.
+    """
+    # 신호 처리기는 메인 스레드에서만 설치할 수 있다 (TestClient는 다른 스레드에서 실행한다)
+    if grace <= 0 or threading.current_thread() is not threading.main_thread():
+        return
+    server_handler = signal.getsignal(signal.SIGTERM)
+    if not callable(server_handler):
+        return
+
+    loop = asyncio.get_running_loop()
+    draining = False
+
+    def handle_sigterm(signum, frame):
+        nonlocal draining
+        if draining:
+            server_handler(signum, frame)
+            return
+        draining = True
+        app.state.ready = False
+        print(f"SIGTERM received: not ready, shutting down in {grace:g}s")
+        loop.call_soon_threadsafe(loop.call_later, grace, server_handler, signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm everything the first requests need, then report ready on /readyz until shutdown"""
+    app.state.ready = False
+    # 첫 요청이 TCP/TLS 연결을 기다리지 않도록 DB 준비와 함께 모델 서버 연결을 미리 연다
+    await asyncio.gather(prepare_storage(), warm_up(openai_client))
+
+    # Background jobs started with the app and cancelled on shutdown
+    background_tasks = [
+        asyncio.create_task(run_chat_archiver()),
+        asyncio.create_task(run_llm_warmer(openai_client)),
+    ]
+    app.state.ready = True
+    drain_on_sigterm(app)
+    try:
+        yield
+    finally:
+        # SIGTERM이면 drain_on_sigterm이 이미 바꿨다; 그 밖의 종료도 not ready로 끝낸다
+        app.state.ready = False
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await usage_ledger.close()
+        await storage_client.close()
+        await openai_client.close()
+
+
+app = FastAPI(title="AI Playground API", default_response_class=FastJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,23 +86,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-
-@app.on_event("startup")
-async def on_startup():
-    await storage_client.connect()
-
-
-@app.on_event("shutdown")
-async def on_shutdown():
-    await storage_client.close()
+# 긴 채팅 기록/게임 로그 응답 압축 (SSE 스트림은 GZipMiddleware가 제외한다)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
 # Include routers
 app.include_router(chat.router)
 app.include_router(wordchain.router)
 app.include_router(idiom.router)
+app.include_router(admin.router)
 
 
 @app.get("/")
@@ -35,6 +105,24 @@ async def root():
     return {"message": "AI Playground Server Running"}
 
 
+@app.get("/livez")
+async def livez():
+    """Liveness probe: the event loop answers; touches nothing else"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: 200 only between the end of warm-up and the start of shutdown.
+
+    Does not query the database: the pool may hold a single connection, and a probe waiting
+    behind a slow query would take a healthy worker out of rotation.
+    """
+    if not getattr(app.state, "ready", False):
+        return FastJSONResponse({"status": "not ready"}, status_code=503)
+    return {"status": "ready"}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
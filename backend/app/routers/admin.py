@@ -0,0 +1,41 @@
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
+from ..core.admission import admission
+from ..core.config import ADMIN_TOKEN
+from ..core.llm import llm
+from ..core.llm_transport import llm_connections
+from ..core.usage import usage_ledger, usage_report
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    """Allow the request only with the configured X-Admin-Token (open when ADMIN_TOKEN is unset)"""
+    if ADMIN_TOKEN and not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/api/admin/admission", dependencies=[Depends(require_admin)])
+async def get_admission_stats():
+    """Admission control counters: in-flight and queued requests, rate limits and shedding"""
+    return admission.snapshot()
+
+
+@router.get("/api/admin/llm", dependencies=[Depends(require_admin)])
+async def get_llm_stats():
+    """Per call type: model, latency, hedged requests and SLO misses"""
+    return llm.snapshot()
+
+
+@router.get("/api/admin/llm/transport", dependencies=[Depends(require_admin)])
+async def get_llm_transport_stats():
+    """OpenAI connection pool: limits, connections opened vs reused, connect time"""
+    return llm_connections.snapshot()
+
+
+@router.get("/api/admin/usage", dependencies=[Depends(require_admin)])
+async def get_usage(days: int | None = None, limit: int = 10):
+    """Top users and call types by LLM cost: this process since start, or all workers over `days` days"""
+    if days is not None:
+        return await usage_report(days, limit)
+    return usage_ledger.snapshot(limit)
@@ -1,20 +1,28 @@
 import asyncio
-import json
 from collections import defaultdict
 from datetime import datetime
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from ..core.admission import admission
+from ..core.idempotency import idempotency
+from ..core.locks import user_locks
+from ..core.serialization import dumps
+from ..core.usage import usage_user
+from ..core.versions import not_modified, tagged_response, user_versions
 from ..services.chat_service import (
+    CHAT_VERSION_SCOPE,
     create_new_session,
     get_current_session_id,
     get_session,
     save_session,
     switch_session,
     get_all_sessions,
+    get_conversation,
     get_ai_response_stream,
+    search_messages,
     delete_session
 )
 
@@ -47,11 +55,26 @@ async def new_chat(username: str):
 
 
 @router.get("/api/chat/sessions/{username}")
-async def get_chat_sessions(username: str):
+async def get_chat_sessions(username: str, request: Request):
     """Get all chat sessions for sidebar"""
-    sessions = await get_all_sessions(username)
+    etag = await user_versions.etag(CHAT_VERSION_SCOPE, username, "sessions")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    # get_current_session_id creates the first session when there is none: take the tag after
+    # that write and before reading the list, which then includes the new session
     current_id = await get_current_session_id(username)
-    return {"sessions": sessions, "current_id": current_id}
+    etag = await user_versions.etag(CHAT_VERSION_SCOPE, username, "sessions")
+    sessions = await get_all_sessions(username)
+    return tagged_response({"sessions": sessions, "current_id": current_id}, etag)
+
+
+@router.get("/api/chat/search/{username}")
+async def search_chat_messages(username: str, q: str, limit: int = 20, offset: int = 0):
+    """Search the user's chat messages (archived sessions included); page with limit/offset"""
+    limit = min(max(limit, 1), 50)
+    return await search_messages(username, q, limit, max(offset, 0))
 
 
 @router.post("/api/chat/switch/{username}/{session_id}")
@@ -71,9 +94,21 @@ async def delete_chat_session(username: str, session_id: str):
 
 
 @router.post("/api/chat/send/{username}")
-async def send_message(username: str, request: ChatRequest):
-    """Send a message and get AI response"""
-    message = request.message
+async def send_message(
+    username: str, request: ChatRequest, idempotency_key: str | None = Header(default=None)
+):
+    """Send a message and get AI response. A repeated Idempotency-Key replays the first response"""
+    usage_user.set(username)
+
+    async def send() -> dict:
+        # 같은 사용자의 요청이 겹쳐도 세션 읽기-수정-저장이 섞이지 않게 한다
+        async with admission.admit(username, user_locks.hold(f"chat:{username}")):
+            return await _send_message(username, request.message)
+
+    return await idempotency.run("chat", username, idempotency_key, {"message": request.message}, send)
+
+
+async def _send_message(username: str, message: str) -> dict:
     session_id = await get_current_session_id(username)
     if not session_id:
         return {"error": "No active session"}
@@ -95,8 +130,7 @@ async def send_message(username: str, request: ChatRequest):
     await broadcast_chat_event(username, user_msg)
     await broadcast_chat_event(username, {"type": "session_updated"})
 
-    conversation = session.get("conversation", [])
-    conversation.append({"role": "user", "content": message})
+    conversation = get_conversation(username, session_id, session_messages)
 
     await broadcast_chat_event(username, {"type": "ai_stream_start", "timestamp": datetime.now().isoformat()})
 
@@ -114,15 +148,12 @@ async def send_message(username: str, request: ChatRequest):
             "timestamp": datetime.now().isoformat()
         }
         session_messages.append(error_msg)
-        session["conversation"] = conversation
         await save_session(username, session_id, session)
         await broadcast_chat_event(username, error_msg)
         await broadcast_chat_event(username, {"type": "session_updated"})
         return {"success": False, "error": str(exc)}
 
     ai_response = "".join(ai_parts).strip()
-    conversation.append({"role": "assistant", "content": ai_response})
-    session["conversation"] = conversation
 
     ai_msg = {
         "type": "message",
@@ -149,7 +180,7 @@ async def stream_messages(username: str):
         listeners.append(queue)
 
         def format_payload(payload: dict) -> str:
-            return f"data: {json.dumps(payload)}\n\n"
+            return f"data: {dumps(payload)}\n\n"
 
         try:
             session_id = await get_current_session_id(username)
@@ -1,24 +1,29 @@
+import asyncio
 from datetime import datetime
-from fastapi import APIRouter
+from typing import AsyncIterator
+from fastapi import APIRouter, Header, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 import json
 from pydantic import BaseModel
 
+from ..core.admission import AdmissionRejected, admission
+from ..core.game_actor import GameActor
+from ..core.idempotency import idempotency
+from ..core.usage import usage_user
+from ..core.game_state import GameState
+from ..core.versions import not_modified, tagged_response
 from ..services.idiom_service import (
     clear_idiom,
     delete_idiom_history_item,
-    get_ai_word,
-    get_idiom_game,
     get_idiom_history,
     get_idiom_meaning,
-    get_idiom_messages,
     get_idiom_prefix,
     get_idiom_suffix,
-    is_valid_full_idiom,
+    idiom_games,
     is_valid_idiom_suffix,
-    save_game_to_history,
-    save_idiom_game,
-    save_idiom_messages,
+    pick_next_idiom,
+    schedule_idiom_prefetch,
+    settle_idiom_prefetch,
 )
 
 router = APIRouter()
@@ -31,14 +36,21 @@ DIFFICULTY_NAMES = {1: "아주 쉬움", 2: "쉬움", 3: "보통", 4: "어려움"
 
 @router.post("/api/idiom/restart/{username}")
 async def restart_idiom(username: str, difficulty: int = 3):
-    await clear_idiom(username)
+    # 진행 중인 턴(WebSocket 체크포인트 포함)이 끝난 뒤에 지운다
+    async with idiom_games.lock(username):
+        await clear_idiom(username)
     return {"success": True, "message": "게임이 재시작되었습니다."}
 
 
 @router.get("/api/idiom/history/{username}")
-async def get_game_history(username: str):
+async def get_game_history(username: str, request: Request):
+    etag = await idiom_games.etag(username, "history")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     history = await get_idiom_history(username)
-    return {"history": history}
+    return tagged_response({"history": history}, etag)
 
 
 @router.delete("/api/idiom/history/{username}/{index}")
@@ -49,222 +61,134 @@ async def delete_game_history(username: str, index: int):
     return {"success": False, "message": "기록을 찾을 수 없습니다."}
 
 
-async def _pick_next_idiom(used_words: list[str], difficulty: int) -> str | None:
-    for _ in range(6):
-        try:
-            candidate = await get_ai_word(used_words, None, difficulty)
-        except Exception as e:
-            print(f"AI word generation failed: {e}")
-            continue
-        if not is_valid_full_idiom(candidate):
-            continue
-        if candidate in used_words:
-            continue
-        return candidate
-    return None
-
+async def _lookup_meaning(idiom: str) -> str:
+    try:
+        return await get_idiom_meaning(idiom)
+    except Exception:
+        return "해석 정보를 가져오지 못했습니다."
 
-@router.post("/api/idiom/send/{username}/{difficulty}")
-async def send_idiom_message(username: str, difficulty: int, request: IdiomRequest):
-    if difficulty < 1 or difficulty > 5:
-        difficulty = 3
 
-    game_state = await get_idiom_game(username)
-    wc_messages = await get_idiom_messages(username)
+def _quiz_message(idiom: str) -> dict:
+    return {
+        "type": "message",
+        "username": "AI",
+        "message": f"{get_idiom_prefix(idiom)}??",
+        "timestamp": datetime.now().isoformat(),
+    }
 
-    used_words = game_state.get("used_words", [])
-    score = int(game_state.get("score", 0))
-    is_game_over = bool(game_state.get("is_game_over", False))
-    current_idiom = game_state.get("current_idiom")
 
-    game_state["difficulty"] = difficulty
-    await save_idiom_game(username, game_state)
+async def _play_turn(game: GameState, username: str, answer: str, difficulty: int) -> AsyncIterator[dict]:
+    """Check one answer against the current question, yielding each message as soon as it is decided"""
+    current_idiom = game.current_idiom
 
-    answer = request.answer.strip()
+    answer = answer.strip()
     timestamp = datetime.now().isoformat()
 
-    messages_to_send = []
-
-    if is_game_over:
-        messages_to_send.append({
+    if game.is_game_over:
+        yield {
             "type": "system",
             "message": "게임이 끝났습니다. 다시 시작하려면 버튼을 누르세요.",
             "timestamp": timestamp,
-        })
-    elif not current_idiom:
-        messages_to_send.append({
+        }
+        return
+
+    if not current_idiom:
+        yield {
             "type": "system",
             "message": "문제를 준비 중입니다. 잠시 후 다시 시도해주세요.",
             "timestamp": timestamp,
-        })
-    else:
-        expected_suffix = get_idiom_suffix(current_idiom)
+        }
+        return
 
-        if not is_valid_idiom_suffix(answer) or answer != expected_suffix:
-            try:
-                meaning = await get_idiom_meaning(current_idiom)
-            except Exception:
-                meaning = "해석 정보를 가져오지 못했습니다."
-
-            wrong_msg = {
-                "type": "message",
-                "username": "AI",
-                "message": "오답 ❌",
-                "timestamp": timestamp,
-            }
-            answer_msg = {
-                "type": "message",
-                "username": "AI",
-                "message": f"정답: {current_idiom} ({expected_suffix})",
-                "timestamp": timestamp,
-            }
-            meaning_msg = {
-                "type": "message",
-                "username": "AI",
-                "message": f"({meaning})",
-                "timestamp": timestamp,
-            }
-            game_over_msg = {
-                "type": "game_over",
-                "message": f"게임 종료! 최종 점수: {score}점",
-                "timestamp": timestamp,
-            }
+    expected_suffix = get_idiom_suffix(current_idiom)
 
-            wc_messages.extend([wrong_msg, answer_msg, meaning_msg, game_over_msg])
-            is_game_over = True
-
-            await save_idiom_game(
-                username,
-                {
-                    "used_words": used_words,
-                    "score": score,
-                    "is_game_over": True,
-                    "difficulty": difficulty,
-                    "current_idiom": current_idiom,
-                },
-            )
-            await save_idiom_messages(username, wc_messages)
-            await save_game_to_history(
-                username,
-                {
-                    "score": score,
-                    "difficulty": difficulty,
-                    "words_count": len(used_words),
-                    "words": used_words,
-                    "result": "lose",
-                    "timestamp": timestamp,
-                },
-            )
-
-            messages_to_send.extend([wrong_msg, answer_msg, meaning_msg, game_over_msg])
-        else:
-            user_msg = {
-                "type": "message",
-                "username": username,
-                "message": answer,
-                "timestamp": timestamp,
-            }
-            wc_messages.append(user_msg)
+    if not is_valid_idiom_suffix(answer) or answer != expected_suffix:
+        meaning = await _lookup_meaning(current_idiom)
 
-            # 정답 후 해석 추가
-            try:
-                meaning = await get_idiom_meaning(current_idiom)
-            except Exception:
-                meaning = "해석 정보를 가져오지 못했습니다."
-            meaning_msg = {
-                "type": "message",
-                "username": "AI",
-                "message": f"({meaning})",
-                "timestamp": timestamp,
-            }
-            wc_messages.append(meaning_msg)
-
-            used_words.append(current_idiom)
-            score += 1
-
-            messages_to_send.extend([user_msg, meaning_msg, {"type": "score", "score": score}])
-
-            next_idiom = await _pick_next_idiom(used_words, difficulty)
-            if next_idiom is None:
-                win_msg = {
-                    "type": "game_over",
-                    "message": f"🎉 승리! AI가 다음 문제를 만들지 못했어요. 최종 점수: {score}점",
-                    "timestamp": datetime.now().isoformat(),
-                }
-                wc_messages.append(win_msg)
-                is_game_over = True
-
-                await save_idiom_game(
-                    username,
-                    {
-                        "used_words": used_words,
-                        "score": score,
-                        "is_game_over": True,
-                        "difficulty": difficulty,
-                        "current_idiom": None,
-                    },
-                )
-                await save_idiom_messages(username, wc_messages)
-                await save_game_to_history(
-                    username,
-                    {
-                        "score": score,
-                        "difficulty": difficulty,
-                        "words_count": len(used_words),
-                        "words": used_words,
-                        "result": "win",
-                        "timestamp": win_msg["timestamp"],
-                    },
-                )
-                messages_to_send.append(win_msg)
-            else:
-                current_idiom = next_idiom
-                quiz_msg = {
-                    "type": "message",
-                    "username": "AI",
-                    "message": f"{get_idiom_prefix(current_idiom)}??",
-                    "timestamp": datetime.now().isoformat(),
-                }
-                wc_messages.append(quiz_msg)
-
-                await save_idiom_game(
-                    username,
-                    {
-                        "used_words": used_words,
-                        "score": score,
-                        "is_game_over": False,
-                        "difficulty": difficulty,
-                        "current_idiom": current_idiom,
-                    },
-                )
-                await save_idiom_messages(username, wc_messages)
-
-                messages_to_send.append(quiz_msg)
-
-    return {"messages": messages_to_send}
+        wrong_msg = {
+            "type": "message",
+            "username": "AI",
+            "message": "오답 ❌",
+            "timestamp": timestamp,
+        }
+        answer_msg = {
+            "type": "message",
+            "username": "AI",
+            "message": f"정답: {current_idiom} ({expected_suffix})",
+            "timestamp": timestamp,
+        }
+        meaning_msg = {
+            "type": "message",
+            "username": "AI",
+            "message": f"({meaning})",
+            "timestamp": timestamp,
+        }
+        game_over_msg = {
+            "type": "game_over",
+            "message": f"게임 종료! 최종 점수: {game.score}점",
+            "timestamp": timestamp,
+        }
 
+        game.messages.extend([wrong_msg, answer_msg, meaning_msg, game_over_msg])
+        game.finish("lose", timestamp)
 
-@router.get("/api/idiom/init/{username}/{difficulty}")
-async def init_idiom_game(username: str, difficulty: int):
-    if difficulty < 1 or difficulty > 5:
-        difficulty = 3
+        for message in (wrong_msg, answer_msg, meaning_msg, game_over_msg):
+            yield message
+        return
+
+    user_msg = {
+        "type": "message",
+        "username": username,
+        "message": answer,
+        "timestamp": timestamp,
+    }
+    game.messages.append(user_msg)
+    game.used_words.append(current_idiom)
+    game.score += 1
+
+    yield user_msg
+
+    async def next_question() -> str | None:
+        # 미리 준비된 문제가 있으면 바로 꺼내고, 없을 때만 새로 고른다
+        return game.pop_upcoming() or await pick_next_idiom(game.used_words, difficulty)
+
+    # 정답 후 해석 추가 (해석 조회와 다음 문제 준비를 동시에 진행).
+    # 해석은 문제 보충 때 미리 받아 두므로 보통 캐시에서 바로 나온다
+    meaning, next_idiom = await asyncio.gather(_lookup_meaning(current_idiom), next_question())
+    meaning_msg = {
+        "type": "message",
+        "username": "AI",
+        "message": f"({meaning})",
+        "timestamp": timestamp,
+    }
+    game.messages.append(meaning_msg)
 
-    game_state = await get_idiom_game(username)
-    wc_messages = await get_idiom_messages(username)
+    yield meaning_msg
+    yield {"type": "score", "score": game.score}
 
-    used_words = game_state.get("used_words", [])
-    score = int(game_state.get("score", 0))
-    is_game_over = bool(game_state.get("is_game_over", False))
-    current_idiom = game_state.get("current_idiom")
+    if next_idiom is None:
+        win_msg = {
+            "type": "game_over",
+            "message": f"🎉 승리! AI가 다음 문제를 만들지 못했어요. 최종 점수: {game.score}점",
+            "timestamp": datetime.now().isoformat(),
+        }
+        game.messages.append(win_msg)
+        game.current_idiom = None
+        game.finish("win", win_msg["timestamp"])
+        yield win_msg
+    else:
+        game.current_idiom = next_idiom
+        quiz_msg = _quiz_message(next_idiom)
+        game.messages.append(quiz_msg)
+        yield quiz_msg
 
-    game_state["difficulty"] = difficulty
-    await save_idiom_game(username, game_state)
 
-    messages_to_send = []
+async def _start_game(game: GameState, difficulty: int):
+    if game.difficulty != difficulty:
+        game.drop_upcoming()
+    game.difficulty = difficulty
 
-    if wc_messages:
-        messages_to_send = wc_messages
-    else:
+    if game.message_count == 0:
         welcome_msg = {
             "type": "system",
             "message": (
@@ -273,67 +197,155 @@ async def init_idiom_game(username: str, difficulty: int):
             ),
             "timestamp": datetime.now().isoformat(),
         }
-        wc_messages.append(welcome_msg)
-        messages_to_send.append(welcome_msg)
+        game.messages.append(welcome_msg)
 
-    if (not is_game_over) and (not current_idiom):
-        next_idiom = await _pick_next_idiom(used_words, difficulty)
+    if (not game.is_game_over) and (not game.current_idiom):
+        next_idiom = game.pop_upcoming() or await pick_next_idiom(game.used_words, difficulty)
         if next_idiom is None:
             fail_msg = {
                 "type": "game_over",
-                "message": f"🎉 승리! AI가 문제를 준비하지 못했어요. 최종 점수: {score}점",
+                "message": f"🎉 승리! AI가 문제를 준비하지 못했어요. 최종 점수: {game.score}점",
                 "timestamp": datetime.now().isoformat(),
             }
-            wc_messages.append(fail_msg)
-            is_game_over = True
-            await save_idiom_game(
-                username,
-                {
-                    "used_words": used_words,
-                    "score": score,
-                    "is_game_over": True,
-                    "difficulty": difficulty,
-                    "current_idiom": None,
-                },
-            )
-            await save_idiom_messages(username, wc_messages)
-            await save_game_to_history(
-                username,
-                {
-                    "score": score,
-                    "difficulty": difficulty,
-                    "words_count": len(used_words),
-                    "words": used_words,
-                    "result": "win",
-                    "timestamp": datetime.now().isoformat(),
-                },
-            )
-            messages_to_send.append(fail_msg)
+            game.messages.append(fail_msg)
+            game.finish("win", fail_msg["timestamp"])
         else:
-            current_idiom = next_idiom
-            quiz_msg = {
-                "type": "message",
-                "username": "AI",
-                "message": f"{get_idiom_prefix(current_idiom)}??",
-                "timestamp": datetime.now().isoformat(),
-            }
-            wc_messages.append(quiz_msg)
-            messages_to_send.append(quiz_msg)
-            await save_idiom_game(
-                username,
-                {
-                    "used_words": used_words,
-                    "score": score,
-                    "is_game_over": is_game_over,
-                    "difficulty": difficulty,
-                    "current_idiom": current_idiom,
-                },
-            )
-            await save_idiom_messages(username, wc_messages)
+            game.current_idiom = next_idiom
+            game.messages.append(_quiz_message(next_idiom))
 
+
+def _init_payload(game: GameState, difficulty: int) -> dict:
+    # 새 게임이면 환영 메시지와 첫 문제, 이어하기면 전체 기록을 돌려준다
     return {
-        "messages": messages_to_send,
-        "score": score,
-        "isGameOver": is_game_over,
+        "messages": game.messages,
+        "score": game.score,
+        "isGameOver": game.is_game_over,
         "difficulty": difficulty,
+        "seq": game.message_count,
     }
+
+
+@router.post("/api/idiom/send/{username}/{difficulty}")
+async def send_idiom_message(
+    username: str,
+    difficulty: int,
+    request: IdiomRequest,
+    since: int | None = None,
+    idempotency_key: str | None = Header(default=None),
+):
+    """Play one turn. Pass `since` to also get every logged message after that seq.
+
+    A repeated Idempotency-Key gets the first response back instead of playing the turn again.
+    """
+    usage_user.set(username)
+    if difficulty < 1 or difficulty > 5:
+        difficulty = 3
+
+    async def play() -> dict:
+        async with admission.admit(username, idiom_games.lock(username)):
+            async with idiom_games.session(username, since, held=True) as game:
+                if game.difficulty != difficulty:
+                    game.drop_upcoming()
+                game.difficulty = difficulty
+                messages_to_send = [message async for message in _play_turn(game, username, request.answer, difficulty)]
+
+        if game.current_idiom and not game.is_game_over:
+            schedule_idiom_prefetch(username, difficulty)
+
+        response = {"messages": messages_to_send, "seq": game.message_count}
+        if since is not None:
+            response["log"] = game.messages
+        return response
+
+    return await idempotency.run(
+        "idiom", username, idempotency_key, {"answer": request.answer, "difficulty": difficulty}, play
+    )
+
+
+@router.get("/api/idiom/init/{username}/{difficulty}")
+async def init_idiom_game(username: str, difficulty: int, request: Request, since: int = 0):
+    """Resume or start a game. `since` limits the returned log to messages after that seq"""
+    usage_user.set(username)
+    if difficulty < 1 or difficulty > 5:
+        difficulty = 3
+
+    etag = await idiom_games.etag(username, "init", difficulty, since)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    async with idiom_games.session(username, since) as game:
+        await _start_game(game, difficulty)
+    if game.etag_version is not None:
+        # 환영 메시지나 첫 문제를 방금 저장했으면 그 쓰기 뒤의 버전으로 태그한다
+        etag = idiom_games.tag(game.etag_version, "init", difficulty, since)
+
+    if game.current_idiom and not game.is_game_over:
+        schedule_idiom_prefetch(username, difficulty)
+
+    return tagged_response(_init_payload(game, difficulty), etag)
+
+
+@router.websocket("/ws/idiom/{username}")
+async def idiom_socket(websocket: WebSocket, username: str, difficulty: int = 3, since: int = 0):
+    """Play over one connection. Send {"answer": ...} per turn or {"type": "restart"}.
+
+    The game stays in memory for the whole connection and is checkpointed after each turn;
+    prepared questions are added to the live state so the next question never waits on the DB.
+
+    When the game was changed elsewhere (REST, another restart) since the last turn, the answer
+    is not played; a "resync" frame carries the whole current log instead (then "turn_end").
+    """
+    usage_user.set(username)
+    if difficulty < 1 or difficulty > 5:
+        difficulty = 3
+
+    await websocket.accept()
+    actor = GameActor(idiom_games, username, websocket)
+
+    try:
+        # REST 요청이 시작한 문제 보충이 끝난 뒤에 불러와야 그 저장을 외부 변경으로 보지 않는다
+        await settle_idiom_prefetch(username)
+        await actor.start(since)
+        async with actor.turn() as game:
+            await _start_game(game, difficulty)
+        await actor.send({"type": "init", **_init_payload(game, difficulty)})
+
+        while True:
+            if game.current_idiom and not game.is_game_over:
+                schedule_idiom_prefetch(username, difficulty, actor)
+
+            data = await actor.receive()
+            if data is None:
+                continue
+
+            if data.get("type") == "restart":
+                async with actor.turn():
+                    await clear_idiom(username)
+                    game = await actor.reload()
+                    await _start_game(game, difficulty)
+                await actor.send({"type": "init", **_init_payload(game, difficulty)})
+                continue
+
+            try:
+                async with admission.admit(username, actor.turn()):
+                    game = actor.game
+                    if actor.changed_elsewhere():
+                        # 다른 요청이 게임을 바꿨다: 이 답은 예전 화면 기준이므로 버리고 다시 맞춘다
+                        await _start_game(game, difficulty)
+                        await actor.send({"type": "resync", **_init_payload(game, difficulty)})
+                    else:
+                        async for message in _play_turn(game, username, str(data.get("answer", "")), difficulty):
+                            await actor.send(message)
+            except AdmissionRejected as e:
+                await actor.send({
+                    "type": "error",
+                    "status": e.status_code,
+                    "message": e.detail,
+                    "retryAfter": e.retry_after,
+                })
+            await actor.send({"type": "turn_end", "seq": game.message_count})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await actor.stop()
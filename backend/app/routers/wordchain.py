@@ -1,21 +1,24 @@
-from fastapi import APIRouter
+from typing import AsyncIterator
+from fastapi import APIRouter, Header, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from datetime import datetime
 from pydantic import BaseModel
 from ..services.wordchain_service import (
-    get_wordchain_game,
-    save_wordchain_game,
-    get_wordchain_messages,
-    save_wordchain_messages,
+    wordchain_games,
     clear_wordchain,
     get_wordchain_history,
-    save_game_to_history,
     delete_wordchain_history_item,
     get_ai_word,
-    validate_user_word_async,
+    judge_user_word,
     validate_ai_word
 )
+from ..core.admission import AdmissionRejected, admission
+from ..core.game_actor import GameActor
+from ..core.idempotency import idempotency
+from ..core.usage import usage_user
+from ..core.game_state import GameState
 from ..core.utils import get_last_char
+from ..core.versions import not_modified, tagged_response
 
 router = APIRouter()
 
@@ -27,15 +30,22 @@ DIFFICULTY_NAMES = {1: "아주 쉬움", 2: "쉬움", 3: "보통", 4: "어려움"
 
 @router.post("/api/wordchain/restart/{username}")
 async def restart_wordchain(username: str, difficulty: int = 3):
-    await clear_wordchain(username)
+    # 진행 중인 턴(WebSocket 체크포인트 포함)이 끝난 뒤에 지운다
+    async with wordchain_games.lock(username):
+        await clear_wordchain(username)
     return {"success": True, "message": "게임이 재시작되었습니다."}
 
 
 @router.get("/api/wordchain/history/{username}")
-async def get_game_history(username: str):
+async def get_game_history(username: str, request: Request):
     """Get past game history for sidebar"""
+    etag = await wordchain_games.etag(username, "history")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     history = await get_wordchain_history(username)
-    return {"history": history}
+    return tagged_response({"history": history}, etag)
 
 
 @router.delete("/api/wordchain/history/{username}/{index}")
@@ -47,182 +57,224 @@ async def delete_game_history(username: str, index: int):
     return {"success": False, "message": "기록을 찾을 수 없습니다."}
 
 
-@router.post("/api/wordchain/send/{username}/{difficulty}")
-async def send_wordchain_message(username: str, difficulty: int, request: WordRequest):
-    if difficulty < 1 or difficulty > 5:
-        difficulty = 3
-
-    game_state = await get_wordchain_game(username)
-    wc_messages = await get_wordchain_messages(username)
-
-    used_words = game_state.get("used_words", [])
-    score = game_state.get("score", 0)
-    is_game_over = game_state.get("is_game_over", False)
-
-    game_state["difficulty"] = difficulty
-    await save_wordchain_game(username, game_state)
+async def _play_turn(game: GameState, username: str, answer: str, difficulty: int) -> AsyncIterator[dict]:
+    """Play one user turn on `game`, yielding each message to send as soon as it is decided"""
+    used_words = game.used_words
 
-    word = request.answer.strip()
+    word = answer.strip()
     timestamp = datetime.now().isoformat()
 
-    messages_to_send = []
-
-    if is_game_over:
-        messages_to_send.append({
+    if game.is_game_over:
+        yield {
             "type": "system",
             "message": "게임이 끝났습니다. 다시 시작하려면 버튼을 누르세요.",
             "timestamp": timestamp
-        })
-    else:
-        last_word = used_words[-1] if used_words else None
-
-        # Validate user's word (with dictionary check)
-        is_valid, error_msg = await validate_user_word_async(word, used_words, last_word)
-        if not is_valid:
-            # 사용자가 잘못된 단어를 입력하면 패배
+        }
+        return
+
+    last_word = used_words[-1] if used_words else None
+
+    # Validate user's word (with dictionary check)
+    is_valid, error_msg, ai_word = await judge_user_word(word, used_words, last_word, difficulty)
+    if not is_valid:
+        # 사용자가 잘못된 단어를 입력하면 패배
+        game_over_msg = {
+            "type": "game_over",
+            "message": f"💔 패배! {error_msg} 최종 점수: {game.score}점",
+            "timestamp": timestamp
+        }
+        game.messages.append(game_over_msg)
+        game.finish("lose", timestamp)
+        yield game_over_msg
+        return
+
+    user_msg = {
+        "type": "message",
+        "username": username,
+        "message": word,
+        "timestamp": timestamp
+    }
+    game.messages.append(user_msg)
+    used_words.append(word)
+    game.score += 1
+
+    yield user_msg
+    yield {"type": "score", "score": game.score}
+
+    try:
+        last_char = get_last_char(word)
+        if ai_word is None:
+            ai_word = await get_ai_word(used_words, last_char, difficulty)
+
+        ai_timestamp = datetime.now().isoformat()
+
+        # Validate AI's word
+        ai_valid, win_message = validate_ai_word(ai_word, used_words, last_char)
+
+        if not ai_valid:
             game_over_msg = {
                 "type": "game_over",
-                "message": f"💔 패배! {error_msg} 최종 점수: {score}점",
-                "timestamp": timestamp
+                "message": f"{win_message} 최종 점수: {game.score}점",
+                "timestamp": ai_timestamp
             }
-            wc_messages.append(game_over_msg)
-            is_game_over = True
-            game_state = {"used_words": used_words, "score": score, "is_game_over": True, "difficulty": difficulty}
-            await save_wordchain_game(username, game_state)
-            await save_wordchain_messages(username, wc_messages)
-
-            # Save to history as loss
-            await save_game_to_history(username, {
-                "score": score,
-                "difficulty": difficulty,
-                "words_count": len(used_words),
-                "words": used_words,
-                "result": "lose",
-                "timestamp": timestamp
-            })
-            messages_to_send.append(game_over_msg)
+            game.messages.append(game_over_msg)
+            game.finish("win", ai_timestamp)
+            ai_result = game_over_msg
         else:
-            user_msg = {
+            ai_msg = {
                 "type": "message",
-                "username": username,
-                "message": word,
-                "timestamp": timestamp
+                "username": "AI",
+                "message": ai_word,
+                "timestamp": ai_timestamp
             }
-            wc_messages.append(user_msg)
-            used_words.append(word)
-            score += 1
+            game.messages.append(ai_msg)
+            used_words.append(ai_word)
+            ai_result = ai_msg
+
+    except Exception as e:
+        # AI 오류시 사용자 승리로 처리
+        error_timestamp = datetime.now().isoformat()
+        game_over_msg = {
+            "type": "game_over",
+            "message": f"🎉 AI 오류로 승리! 최종 점수: {game.score}점",
+            "timestamp": error_timestamp
+        }
+        game.messages.append(game_over_msg)
+        game.finish("win", error_timestamp)
+        ai_result = game_over_msg
 
-            messages_to_send.extend([user_msg, {"type": "score", "score": score}])
+    yield ai_result
 
-            game_state = {"used_words": used_words, "score": score, "is_game_over": False, "difficulty": difficulty}
-            await save_wordchain_game(username, game_state)
-            await save_wordchain_messages(username, wc_messages)
 
-            try:
-                last_char = get_last_char(word)
-                ai_word = await get_ai_word(used_words, last_char, difficulty)
-
-                ai_timestamp = datetime.now().isoformat()
-
-                # Validate AI's word
-                ai_valid, win_message = validate_ai_word(ai_word, used_words, last_char)
-
-                if not ai_valid:
-                    game_over_msg = {
-                        "type": "game_over",
-                        "message": f"{win_message} 최종 점수: {score}점",
-                        "timestamp": ai_timestamp
-                    }
-                    wc_messages.append(game_over_msg)
-                    is_game_over = True
-                    game_state = {"used_words": used_words, "score": score, "is_game_over": True, "difficulty": difficulty}
-                    await save_wordchain_game(username, game_state)
-                    await save_wordchain_messages(username, wc_messages)
-
-                    # Save to history
-                    await save_game_to_history(username, {
-                        "score": score,
-                        "difficulty": difficulty,
-                        "words_count": len(used_words),
-                        "words": used_words,
-                        "result": "win",
-                        "timestamp": ai_timestamp
-                    })
-                    messages_to_send.append(game_over_msg)
-                else:
-                    ai_msg = {
-                        "type": "message",
-                        "username": "AI",
-                        "message": ai_word,
-                        "timestamp": ai_timestamp
-                    }
-                    wc_messages.append(ai_msg)
-                    used_words.append(ai_word)
-
-                    messages_to_send.append(ai_msg)
-
-                    game_state = {"used_words": used_words, "score": score, "is_game_over": False, "difficulty": difficulty}
-                    await save_wordchain_game(username, game_state)
-                    await save_wordchain_messages(username, wc_messages)
-
-            except Exception as e:
-                # AI 오류시 사용자 승리로 처리
-                error_timestamp = datetime.now().isoformat()
-                game_over_msg = {
-                    "type": "game_over",
-                    "message": f"🎉 AI 오류로 승리! 최종 점수: {score}점",
-                    "timestamp": error_timestamp
-                }
-                wc_messages.append(game_over_msg)
-                is_game_over = True
-                game_state = {"used_words": used_words, "score": score, "is_game_over": True, "difficulty": difficulty}
-                await save_wordchain_game(username, game_state)
-                await save_wordchain_messages(username, wc_messages)
-                await save_game_to_history(username, {
-                    "score": score,
-                    "difficulty": difficulty,
-                    "words_count": len(used_words),
-                    "words": used_words,
-                    "result": "win",
-                    "timestamp": error_timestamp
-                })
-                messages_to_send.append(game_over_msg)
+def _start_game(game: GameState, difficulty: int):
+    game.difficulty = difficulty
+
+    if game.message_count == 0:
+        welcome_msg = {
+            "type": "system",
+            "message": f"난이도: {DIFFICULTY_NAMES[difficulty]} | 아무 단어나 입력해서 시작하세요!",
+            "timestamp": datetime.now().isoformat()
+        }
+        game.messages.append(welcome_msg)
 
-    return {"messages": messages_to_send}
+
+def _init_payload(game: GameState, difficulty: int) -> dict:
+    return {
+        "messages": game.messages,
+        "score": game.score,
+        "isGameOver": game.is_game_over,
+        "difficulty": difficulty,
+        "seq": game.message_count
+    }
+
+
+@router.post("/api/wordchain/send/{username}/{difficulty}")
+async def send_wordchain_message(
+    username: str,
+    difficulty: int,
+    request: WordRequest,
+    since: int | None = None,
+    idempotency_key: str | None = Header(default=None),
+):
+    """Play one turn. Pass `since` to also get every logged message after that seq.
+
+    A repeated Idempotency-Key gets the first response back instead of playing the turn again.
+    """
+    usage_user.set(username)
+    if difficulty < 1 or difficulty > 5:
+        difficulty = 3
+
+    async def play() -> dict:
+        async with admission.admit(username, wordchain_games.lock(username)):
+            async with wordchain_games.session(username, since, held=True) as game:
+                game.difficulty = difficulty
+                messages_to_send = [message async for message in _play_turn(game, username, request.answer, difficulty)]
+
+        response = {"messages": messages_to_send, "seq": game.message_count}
+        if since is not None:
+            response["log"] = game.messages
+        return response
+
+    return await idempotency.run(
+        "wordchain", username, idempotency_key, {"answer": request.answer, "difficulty": difficulty}, play
+    )
 
 
 @router.get("/api/wordchain/init/{username}/{difficulty}")
-async def init_wordchain_game(username: str, difficulty: int):
+async def init_wordchain_game(username: str, difficulty: int, request: Request, since: int = 0):
+    """Resume or start a game. `since` limits the returned log to messages after that seq"""
     if difficulty < 1 or difficulty > 5:
         difficulty = 3
 
-    game_state = await get_wordchain_game(username)
-    wc_messages = await get_wordchain_messages(username)
+    etag = await wordchain_games.etag(username, "init", difficulty, since)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
 
-    used_words = game_state.get("used_words", [])
-    score = game_state.get("score", 0)
-    is_game_over = game_state.get("is_game_over", False)
+    async with wordchain_games.session(username, since) as game:
+        _start_game(game, difficulty)
+    if game.etag_version is not None:
+        # 환영 메시지나 첫 문제를 방금 저장했으면 그 쓰기 뒤의 버전으로 태그한다
+        etag = wordchain_games.tag(game.etag_version, "init", difficulty, since)
 
-    game_state["difficulty"] = difficulty
-    await save_wordchain_game(username, game_state)
+    return tagged_response(_init_payload(game, difficulty), etag)
 
-    messages_to_send = []
 
-    if not wc_messages:
-        welcome_msg = {
-            "type": "system",
-            "message": f"난이도: {DIFFICULTY_NAMES[difficulty]} | 아무 단어나 입력해서 시작하세요!",
-            "timestamp": datetime.now().isoformat()
-        }
-        wc_messages.append(welcome_msg)
-        messages_to_send.append(welcome_msg)
-        await save_wordchain_messages(username, wc_messages)
-    else:
-        messages_to_send = wc_messages
+@router.websocket("/ws/wordchain/{username}")
+async def wordchain_socket(websocket: WebSocket, username: str, difficulty: int = 3, since: int = 0):
+    """Play over one connection. Send {"answer": ...} per turn or {"type": "restart"}.
 
-    return {
-        "messages": messages_to_send,
-        "score": score,
-        "isGameOver": is_game_over,
-        "difficulty": difficulty
-    }
+    The game stays in memory for the whole connection and is checkpointed after each turn;
+    messages are pushed as they are produced and every turn ends with a "turn_end" frame.
+
+    When the game was changed elsewhere (REST, another restart) since the last turn, the answer
+    is not played; a "resync" frame carries the whole current log instead (then "turn_end").
+    """
+    usage_user.set(username)
+    if difficulty < 1 or difficulty > 5:
+        difficulty = 3
+
+    await websocket.accept()
+    actor = GameActor(wordchain_games, username, websocket)
+
+    try:
+        await actor.start(since)
+        async with actor.turn() as game:
+            _start_game(game, difficulty)
+        await actor.send({"type": "init", **_init_payload(game, difficulty)})
+
+        while True:
+            data = await actor.receive()
+            if data is None:
+                continue
+
+            if data.get("type") == "restart":
+                async with actor.turn():
+                    await clear_wordchain(username)
+                    game = await actor.reload()
+                    _start_game(game, difficulty)
+                await actor.send({"type": "init", **_init_payload(game, difficulty)})
+                continue
+
+            try:
+                async with admission.admit(username, actor.turn()):
+                    game = actor.game
+                    if actor.changed_elsewhere():
+                        # 다른 요청이 게임을 바꿨다: 이 답은 예전 화면 기준이므로 버리고 다시 맞춘다
+                        _start_game(game, difficulty)
+                        await actor.send({"type": "resync", **_init_payload(game, difficulty)})
+                    else:
+                        async for message in _play_turn(game, username, str(data.get("answer", "")), difficulty):
+                            await actor.send(message)
+            except AdmissionRejected as e:
+                await actor.send({
+                    "type": "error",
+                    "status": e.status_code,
+                    "message": e.detail,
+                    "retryAfter": e.retry_after,
+                })
+            await actor.send({"type": "turn_end", "seq": game.message_count})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await actor.stop()
@@ -1,33 +1,48 @@
-import json
+import asyncio
 import uuid
+import zlib
+from collections import OrderedDict
 from typing import AsyncGenerator
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from asyncpg import UniqueViolationError
-from ..core.database import storage_client, openai_client
-from ..core.config import SYSTEM_PROMPT
+from ..core.database import storage_client
+from ..core.llm import llm
+from ..core.config import CHAT_ARCHIVE_AFTER_DAYS, CHAT_ARCHIVE_INTERVAL, SYSTEM_PROMPT
+from ..core.search import highlight, ngram_tsquery, ngrams
+from ..core.serialization import dumps_bytes, loads
+from ..core.versions import user_versions
 
 
 MAX_SESSIONS_PER_USER = 20
 
+# user_versions scope for everything under chat_history
+CHAT_VERSION_SCOPE = "chat"
+
+# Sessions moved to chat_archive per archiver transaction
+ARCHIVE_BATCH_SIZE = 100
+ARCHIVE_CODEC = "json+zlib"
+
+# Characters of context on each side of a search match
+SNIPPET_CONTEXT = 40
+
+# OpenAI-format conversations kept for recently used sessions
+CONVERSATION_CACHE_SIZE = 256
+
+# (username, session_id) -> (number of log entries already converted, conversation)
+_conversations: OrderedDict[tuple[str, str], tuple[int, list[dict]]] = OrderedDict()
+
 
 def _session_row_to_dict(row) -> dict:
     if not row:
         return None
 
-    conversation = row["conversation"]
     messages = row["messages"]
 
-    if isinstance(conversation, str):
-        conversation = json.loads(conversation)
-    if isinstance(messages, str):
-        messages = json.loads(messages)
-
     created_at = row["created_at"]
     updated_at = row["updated_at"]
 
     return {
         "id": row["session_id"],
-        "conversation": conversation or [],
         "messages": messages or [],
         "created_at": created_at.isoformat() if created_at else datetime.now().isoformat(),
         "updated_at": updated_at.isoformat() if updated_at else datetime.now().isoformat(),
@@ -35,27 +50,123 @@ def _session_row_to_dict(row) -> dict:
 
 
 async def _enforce_session_limit(conn, username: str):
+    # 보관된 세션도 개수 제한에 포함한다
+    if storage_client.dialect == "sqlite":
+        await _enforce_session_limit_sqlite(conn, username)
+        return
+
     await conn.execute(
         """
-        DELETE FROM chat_history
-        WHERE username = $1
-          AND session_id IN (
-            SELECT session_id
+        WITH ranked AS (
+            SELECT session_id,
+                   ROW_NUMBER() OVER (ORDER BY updated_at DESC) AS rn
             FROM (
-              SELECT session_id,
-                     ROW_NUMBER() OVER (
-                       PARTITION BY username
-                       ORDER BY updated_at DESC
-                     ) AS rn
-              FROM chat_history
-              WHERE username = $1
-            ) ranked
-            WHERE rn > $2
-          )
+                SELECT session_id, updated_at FROM chat_history WHERE username = $1
+                UNION ALL
+                SELECT session_id, updated_at FROM chat_archive WHERE username = $1
+            ) sessions
+        ),
+        dropped_hot AS (
+            DELETE FROM chat_history
+            WHERE username = $1
+              AND session_id IN (SELECT session_id FROM ranked WHERE rn > $2)
+        ),
+        dropped_search AS (
+            DELETE FROM chat_search
+            WHERE username = $1
+              AND session_id IN (SELECT session_id FROM ranked WHERE rn > $2)
+        )
+        DELETE FROM chat_archive
+        WHERE username = $1
+          AND session_id IN (SELECT session_id FROM ranked WHERE rn > $2)
+        """,
+        username,
+        MAX_SESSIONS_PER_USER,
+    )
+
+
+async def _enforce_session_limit_sqlite(conn, username: str):
+    # SQLite has no data-modifying CTEs: pick the sessions over the limit first
+    dropped = await conn.fetch(
+        """
+        SELECT session_id
+        FROM (
+            SELECT session_id, updated_at FROM chat_history WHERE username = $1
+            UNION ALL
+            SELECT session_id, updated_at FROM chat_archive WHERE username = $1
+        ) sessions
+        ORDER BY updated_at DESC
+        LIMIT -1 OFFSET $2
         """,
         username,
         MAX_SESSIONS_PER_USER,
     )
+    if not dropped:
+        return
+
+    session_ids = [row["session_id"] for row in dropped]
+    for table in ("chat_history", "chat_search", "chat_archive"):
+        await conn.execute(
+            f"DELETE FROM {table} WHERE username = $1 AND session_id IN (SELECT value FROM json_each($2))",
+            username,
+            session_ids,
+        )
+
+
+def _session_summary(messages: list[dict]) -> tuple[str, int]:
+    """Sidebar preview (first user message) and number of chat messages"""
+    user_messages = [
+        m for m in (messages or [])
+        if m.get("type") == "message" and m.get("username") != "AI"
+    ]
+
+    preview = ""
+    if user_messages:
+        preview = user_messages[0]["message"][:30]
+        if len(user_messages[0]["message"]) > 30:
+            preview += "..."
+
+    return preview, len([m for m in (messages or []) if m.get("type") == "message"])
+
+
+def _pack_session(messages: list[dict]) -> bytes:
+    return zlib.compress(dumps_bytes({"messages": messages}), 9)
+
+
+def _unpack_session(codec: str, payload: bytes) -> dict:
+    if codec != ARCHIVE_CODEC:
+        raise ValueError(f"Unknown chat archive codec: {codec}")
+    return loads(zlib.decompress(payload))
+
+
+async def _rehydrate_session(conn, username: str, session_id: str) -> bool:
+    """Move an archived session back into chat_history. Call inside a transaction"""
+    row = await conn.fetchrow(
+        """
+        DELETE FROM chat_archive
+        WHERE username = $1 AND session_id = $2
+        RETURNING codec, payload, created_at, updated_at
+        """,
+        username,
+        session_id,
+    )
+    if not row:
+        return False
+
+    data = _unpack_session(row["codec"], row["payload"])
+    await conn.execute(
+        """
+        INSERT INTO chat_history (username, session_id, messages, created_at, updated_at)
+        VALUES ($1, $2, $3::jsonb, $4, $5)
+        ON CONFLICT (username, session_id) DO NOTHING
+        """,
+        username,
+        session_id,
+        data["messages"],
+        row["created_at"],
+        row["updated_at"],
+    )
+    return True
 
 
 async def create_new_session(username: str) -> str:
@@ -64,7 +175,6 @@ async def create_new_session(username: str) -> str:
 
     for _ in range(5):
         session_id = str(uuid.uuid4())[:8]
-        conversation = [{"role": "system", "content": SYSTEM_PROMPT}]
         messages = []
 
         async with pool.acquire() as conn:
@@ -74,33 +184,40 @@ async def create_new_session(username: str) -> str:
                     username,
                 )
 
+                archived = await conn.fetchval(
+                    "SELECT 1 FROM chat_archive WHERE username = $1 AND session_id = $2",
+                    username,
+                    session_id,
+                )
+                if archived:
+                    continue
+
                 try:
                     await conn.execute(
                         """
                         INSERT INTO chat_history (
                             username,
                             session_id,
-                            conversation,
                             messages,
                             is_current
                         ) VALUES (
                             $1,
                             $2,
                             $3::jsonb,
-                            $4::jsonb,
                             TRUE
                         )
                         """,
                         username,
                         session_id,
-                        json.dumps(conversation),
-                        json.dumps(messages),
+                        messages,
                     )
                 except UniqueViolationError:
                     continue
 
                 await _enforce_session_limit(conn, username)
-                return session_id
+
+            await user_versions.bump(CHAT_VERSION_SCOPE, username, conn)
+            return session_id
 
     raise RuntimeError("Failed to create unique session id")
 
@@ -127,29 +244,69 @@ async def get_current_session_id(username: str) -> str:
 
 
 async def get_session(username: str, session_id: str) -> dict:
-    """Get session data by ID"""
+    """Get session data by ID (an archived session is moved back first)"""
     pool = await storage_client.get_pool()
 
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
+        for _ in range(2):
+            row = await conn.fetchrow(
+                """
+                SELECT session_id, messages, created_at, updated_at
+                FROM chat_history
+                WHERE username = $1 AND session_id = $2
+                LIMIT 1
+                """,
+                username,
+                session_id,
+            )
+            if row:
+                break
+
+            async with conn.transaction():
+                if not await _rehydrate_session(conn, username, session_id):
+                    break
+
+    return _session_row_to_dict(row)
+
+
+async def _index_messages(conn, username: str, session_id: str, messages: list[dict]):
+    """Add chat messages not yet in chat_search (the log is append-only, so only the tail is new)"""
+    indexed = await conn.fetchval(
+        "SELECT COALESCE(MAX(seq) + 1, 0) FROM chat_search WHERE username = $1 AND session_id = $2",
+        username,
+        session_id,
+    )
+
+    rows = [
+        (username, session_id, seq, m.get("username", ""), m.get("message", ""), ngrams(m.get("message", "")))
+        for seq, m in enumerate(messages)
+        if seq >= indexed and m.get("type") == "message"
+    ]
+    if rows and storage_client.dialect == "sqlite":
+        # SQLite의 chat_search에는 n-gram 컬럼이 없다 (검색 시 메시지를 직접 훑는다)
+        await conn.executemany(
             """
-            SELECT session_id, conversation, messages, created_at, updated_at
-            FROM chat_history
-            WHERE username = $1 AND session_id = $2
-            LIMIT 1
+            INSERT INTO chat_search (username, session_id, seq, author, message)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (username, session_id, seq) DO NOTHING
             """,
-            username,
-            session_id,
+            [row[:5] for row in rows],
+        )
+    elif rows:
+        await conn.executemany(
+            """
+            INSERT INTO chat_search (username, session_id, seq, author, message, ngrams)
+            VALUES ($1, $2, $3, $4, $5, array_to_tsvector($6::text[]))
+            ON CONFLICT (username, session_id, seq) DO NOTHING
+            """,
+            rows,
         )
-
-    return _session_row_to_dict(row)
 
 
 async def save_session(username: str, session_id: str, session_data: dict):
     """Save session data"""
     pool = await storage_client.get_pool()
 
-    conversation = session_data.get("conversation", [])
     messages = session_data.get("messages", [])
 
     async with pool.acquire() as conn:
@@ -162,20 +319,21 @@ async def save_session(username: str, session_id: str, session_data: dict):
             await conn.execute(
                 """
                 UPDATE chat_history
-                SET conversation = $3::jsonb,
-                    messages = $4::jsonb,
+                SET messages = $3::jsonb,
                     updated_at = NOW(),
                     is_current = TRUE
                 WHERE username = $1 AND session_id = $2
                 """,
                 username,
                 session_id,
-                json.dumps(conversation),
-                json.dumps(messages),
+                messages,
             )
 
+            await _index_messages(conn, username, session_id, messages)
             await _enforce_session_limit(conn, username)
 
+    await user_versions.bump(CHAT_VERSION_SCOPE, username)
+
 
 async def switch_session(username: str, session_id: str) -> dict:
     """Switch to a different session"""
@@ -193,7 +351,7 @@ async def switch_session(username: str, session_id: str) -> dict:
                 session_id,
             )
 
-            if not exists:
+            if not exists and not await _rehydrate_session(conn, username, session_id):
                 return None
 
             await conn.execute(
@@ -213,7 +371,7 @@ async def switch_session(username: str, session_id: str) -> dict:
 
         row = await conn.fetchrow(
             """
-            SELECT session_id, conversation, messages, created_at, updated_at
+            SELECT session_id, messages, created_at, updated_at
             FROM chat_history
             WHERE username = $1 AND session_id = $2
             LIMIT 1
@@ -222,11 +380,12 @@ async def switch_session(username: str, session_id: str) -> dict:
             session_id,
         )
 
+    await user_versions.bump(CHAT_VERSION_SCOPE, username)
     return _session_row_to_dict(row)
 
 
 async def get_all_sessions(username: str) -> list[dict]:
-    """Get all sessions for sidebar display"""
+    """Get all sessions for sidebar display (archived ones included, without decompressing them)"""
     pool = await storage_client.get_pool()
 
     async with pool.acquire() as conn:
@@ -241,34 +400,38 @@ async def get_all_sessions(username: str) -> list[dict]:
             username,
             MAX_SESSIONS_PER_USER,
         )
+        archived_rows = await conn.fetch(
+            """
+            SELECT session_id, preview, message_count, updated_at
+            FROM chat_archive
+            WHERE username = $1
+            ORDER BY updated_at DESC
+            LIMIT $2
+            """,
+            username,
+            MAX_SESSIONS_PER_USER,
+        )
 
     sessions = []
     for row in rows:
-        messages = row["messages"]
-        if isinstance(messages, str):
-            messages = json.loads(messages)
-
-        user_messages = [
-            m for m in (messages or [])
-            if m.get("type") == "message" and m.get("username") != "AI"
-        ]
-
-        preview = ""
-        if user_messages:
-            preview = user_messages[0]["message"][:30]
-            if len(user_messages[0]["message"]) > 30:
-                preview += "..."
-
+        preview, message_count = _session_summary(row["messages"])
         sessions.append({
             "id": row["session_id"],
             "preview": preview or "새 대화",
-            "message_count": len([
-                m for m in (messages or []) if m.get("type") == "message"
-            ]),
+            "message_count": message_count,
             "updated_at": (row["updated_at"] or row["created_at"]).isoformat(),
         })
 
-    return sessions
+    for row in archived_rows:
+        sessions.append({
+            "id": row["session_id"],
+            "preview": row["preview"] or "새 대화",
+            "message_count": row["message_count"],
+            "updated_at": row["updated_at"].isoformat(),
+        })
+
+    sessions.sort(key=lambda session: session["updated_at"], reverse=True)
+    return sessions[:MAX_SESSIONS_PER_USER]
 
 
 async def delete_session(username: str, session_id: str) -> bool:
@@ -287,9 +450,26 @@ async def delete_session(username: str, session_id: str) -> bool:
                 session_id,
             )
 
+            if not deleted_row:
+                deleted_row = await conn.fetchrow(
+                    """
+                    DELETE FROM chat_archive
+                    WHERE username = $1 AND session_id = $2
+                    RETURNING FALSE AS is_current
+                    """,
+                    username,
+                    session_id,
+                )
+
             if not deleted_row:
                 return False
 
+            await conn.execute(
+                "DELETE FROM chat_search WHERE username = $1 AND session_id = $2",
+                username,
+                session_id,
+            )
+
             if deleted_row["is_current"]:
                 next_row = await conn.fetchrow(
                     """
@@ -313,25 +493,208 @@ async def delete_session(username: str, session_id: str) -> bool:
                         next_row["session_id"],
                     )
 
+    _conversations.pop((username, session_id), None)
+    await user_versions.bump(CHAT_VERSION_SCOPE, username)
     return True
 
 
+async def search_messages(username: str, query: str, limit: int = 20, offset: int = 0) -> dict:
+    """Find the user's chat messages containing `query`, newest first, with highlighted snippets"""
+    query = query.strip()
+    if not ngrams(query):
+        return {"results": [], "has_more": False}
+    tsquery = ngram_tsquery(query)
+
+    pool = await storage_client.get_pool()
+
+    # SQLite에는 n-gram 인덱스가 없으므로 부분 문자열 검사만으로 찾는다.
+    # 한 글자 검색어는 bigram이 없어 tsquery가 NULL이고, 역시 부분 문자열 검사로 찾는다
+    ngram_filter = "" if storage_client.dialect == "sqlite" else "AND ($2::text IS NULL OR ngrams @@ $2::tsquery)"
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT session_id, seq, author, created_at, message_length, snippet_start,
+                   substr(message, snippet_start, $4 + 2 * $5) AS snippet
+            FROM (
+                SELECT session_id, seq, author, created_at, message,
+                       char_length(message) AS message_length,
+                       GREATEST(strpos(lower(message), lower($3)) - $5, 1) AS snippet_start
+                FROM chat_search
+                WHERE username = $1
+                  {ngram_filter}
+                  AND strpos(lower(message), lower($3)) > 0
+            ) hits
+            ORDER BY created_at DESC, seq DESC
+            LIMIT $6 OFFSET $7
+            """,
+            username,
+            tsquery,
+            query,
+            len(query),
+            SNIPPET_CONTEXT,
+            limit + 1,
+            offset,
+        )
+
+    results = []
+    for row in rows[:limit]:
+        snippet_end = row["snippet_start"] + len(row["snippet"]) - 1
+        results.append({
+            "session_id": row["session_id"],
+            "seq": row["seq"],
+            "author": row["author"],
+            "timestamp": row["created_at"].isoformat(),
+            "snippet": highlight(row["snippet"], query, row["snippet_start"] > 1, snippet_end < row["message_length"]),
+        })
+
+    return {"results": results, "has_more": len(rows) > limit}
+
+
+def _to_openai(entry: dict) -> dict | None:
+    # 채팅 메시지만 대화에 포함하고, 시스템 알림(오류 등)은 제외한다
+    if entry.get("type") != "message":
+        return None
+    role = "assistant" if entry.get("username") == "AI" else "user"
+    return {"role": role, "content": entry.get("message", "")}
+
+
+def get_conversation(username: str, session_id: str, messages: list[dict]) -> list[dict]:
+    """OpenAI view of a session's message log (system prompt + user/assistant turns).
+
+    The log is append-only, so a cached view is extended with just the new entries.
+    Returns a copy the caller may modify.
+    """
+    key = (username, session_id)
+    converted, conversation = _conversations.get(key, (0, None))
+    if conversation is None or converted > len(messages):
+        converted, conversation = 0, [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    for entry in messages[converted:]:
+        turn = _to_openai(entry)
+        if turn is not None:
+            conversation.append(turn)
+
+    _conversations[key] = (len(messages), conversation)
+    _conversations.move_to_end(key)
+    while len(_conversations) > CONVERSATION_CACHE_SIZE:
+        _conversations.popitem(last=False)
+
+    return list(conversation)
+
+
+async def _take_cold_sessions(conn, older_than_days: float):
+    """Delete one batch of cold sessions from chat_history and return them"""
+    return await conn.fetch(
+        """
+        WITH cold AS (
+            SELECT id
+            FROM chat_history
+            WHERE NOT is_current
+              AND updated_at < NOW() - make_interval(secs => $1)
+            ORDER BY updated_at
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        )
+        DELETE FROM chat_history h
+        USING cold
+        WHERE h.id = cold.id
+        RETURNING h.username, h.session_id, h.messages, h.created_at, h.updated_at
+        """,
+        older_than_days * 86400,
+        ARCHIVE_BATCH_SIZE,
+    )
+
+
+async def _take_cold_sessions_sqlite(conn, older_than_days: float):
+    # 트랜잭션이 쓰기 잠금을 잡고 있으므로 SKIP LOCKED가 필요 없다
+    return await conn.fetch(
+        """
+        DELETE FROM chat_history
+        WHERE id IN (
+            SELECT id
+            FROM chat_history
+            WHERE NOT is_current
+              AND updated_at < $1
+            ORDER BY updated_at
+            LIMIT $2
+        )
+        RETURNING username, session_id, messages, created_at, updated_at
+        """,
+        datetime.now(timezone.utc) - timedelta(days=older_than_days),
+        ARCHIVE_BATCH_SIZE,
+    )
+
+
+async def archive_cold_sessions(older_than_days: float = CHAT_ARCHIVE_AFTER_DAYS) -> int:
+    """Move sessions idle for `older_than_days` (never the current one) into chat_archive"""
+    pool = await storage_client.get_pool()
+    archived = 0
+
+    while True:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if storage_client.dialect == "sqlite":
+                    rows = await _take_cold_sessions_sqlite(conn, older_than_days)
+                else:
+                    rows = await _take_cold_sessions(conn, older_than_days)
+                if not rows:
+                    return archived
+
+                records = []
+                for row in rows:
+                    preview, message_count = _session_summary(row["messages"])
+                    records.append((
+                        row["username"],
+                        row["session_id"],
+                        ARCHIVE_CODEC,
+                        _pack_session(row["messages"]),
+                        preview,
+                        message_count,
+                        row["created_at"],
+                        row["updated_at"],
+                    ))
+
+                await conn.executemany(
+                    """
+                    INSERT INTO chat_archive (
+                        username, session_id, codec, payload, preview, message_count, created_at, updated_at
+                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                    ON CONFLICT (username, session_id) DO NOTHING
+                    """,
+                    records,
+                )
+
+        archived += len(rows)
+
+
+async def run_chat_archiver(interval: float = CHAT_ARCHIVE_INTERVAL):
+    """Background loop started with the app: archive cold sessions every `interval` seconds"""
+    if interval <= 0:
+        return
+
+    while True:
+        try:
+            await archive_cold_sessions()
+        except Exception as e:
+            print(f"Chat archiving failed: {e}")
+        await asyncio.sleep(interval)
+
+
 async def get_ai_response(conversation: list[dict]) -> str:
     """Get AI response from OpenAI"""
-    response = await openai_client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = await llm.complete(
+        "chat",
         messages=conversation,
-        max_tokens=1000,
     )
     return response.choices[0].message.content
 
 
 async def get_ai_response_stream(conversation: list[dict]) -> AsyncGenerator[str, None]:
     """Stream AI response chunks from OpenAI"""
-    stream = await openai_client.chat.completions.create(
-        model="gpt-4o-mini",
+    stream = await llm.complete(
+        "chat",
         messages=conversation,
-        max_tokens=1000,
         stream=True,
     )
 
@@ -1,127 +1,29 @@
-import json
-from datetime import datetime
-from ..core.database import storage_client, openai_client
-from ..core.utils import get_last_char
+import asyncio
+from collections import OrderedDict
+from contextlib import aclosing
+from ..core.database import storage_client
+from ..core.llm import llm
+from ..core.game_actor import GameActor
+from ..core.game_state import GameStateRepository
+from ..core.config import AI_CANDIDATE_COUNT, AI_STREAM_MOVES
+from ..core.hangul import allowed_starts
+from ..core.idiom_corpus import idiom_corpus
+from ..core.precomputed import load_verdict, store_verdict
+from ..core.singleflight import SingleFlight, singleflight
+from ..core.utils import CandidateDecoder, get_last_char, parse_candidates, pick_candidate, pick_rank
 
 
 MAX_IDIOM_HISTORY = 20
 
+IDIOM_MEANING_CACHE_SIZE = 1024
+IDIOM_PREFETCH_SIZE = 2
 
-def _as_list(value):
-    if isinstance(value, str):
-        return json.loads(value)
-    return value or []
+idiom_games = GameStateRepository("idiom_state", "idiom_history", MAX_IDIOM_HISTORY, has_upcoming=True)
 
-
-async def get_idiom_game(username: str) -> dict:
-    """Get idiom game state from PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT used_words, score, is_game_over, difficulty, current_idiom
-            FROM idiom_state
-            WHERE username = $1
-            """,
-            username,
-        )
-
-    if not row:
-        return {"used_words": [], "score": 0, "is_game_over": False, "difficulty": 3, "current_idiom": None}
-
-    return {
-        "used_words": _as_list(row["used_words"]),
-        "score": row["score"],
-        "is_game_over": row["is_game_over"],
-        "difficulty": row["difficulty"],
-        "current_idiom": row.get("current_idiom"),
-    }
-
-
-async def save_idiom_game(username: str, game_state: dict):
-    """Save idiom game state to PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    used_words = game_state.get("used_words", [])
-    score = int(game_state.get("score", 0))
-    is_game_over = bool(game_state.get("is_game_over", False))
-    difficulty = int(game_state.get("difficulty", 3))
-    current_idiom = game_state.get("current_idiom")
-
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
-            INSERT INTO idiom_state (
-                username,
-                used_words,
-                score,
-                is_game_over,
-                difficulty,
-                current_idiom
-            ) VALUES (
-                $1,
-                $2::jsonb,
-                $3,
-                $4,
-                $5,
-                $6
-            )
-            ON CONFLICT (username)
-            DO UPDATE SET
-                used_words = EXCLUDED.used_words,
-                score = EXCLUDED.score,
-                is_game_over = EXCLUDED.is_game_over,
-                difficulty = EXCLUDED.difficulty,
-                current_idiom = EXCLUDED.current_idiom,
-                updated_at = NOW()
-            """,
-            username,
-            json.dumps(used_words),
-            score,
-            is_game_over,
-            difficulty,
-            current_idiom,
-        )
-
-
-async def get_idiom_messages(username: str) -> list[dict]:
-    """Get idiom messages for current game from PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT messages
-            FROM idiom_state
-            WHERE username = $1
-            """,
-            username,
-        )
-
-    if not row:
-        return []
-
-    return _as_list(row["messages"])
-
-
-async def save_idiom_messages(username: str, messages: list[dict]):
-    """Save idiom messages to PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
-            INSERT INTO idiom_state (username, messages)
-            VALUES ($1, $2::jsonb)
-            ON CONFLICT (username)
-            DO UPDATE SET
-                messages = EXCLUDED.messages,
-                updated_at = NOW()
-            """,
-            username,
-            json.dumps(messages),
-        )
+_meaning_cache: OrderedDict[str, str] = OrderedDict()
+_meaning_flight = SingleFlight()
+_prefetch_tasks: dict[str, asyncio.Task] = {}
+_meaning_tasks: dict[str, asyncio.Task] = {}
 
 
 async def get_idiom_history(username: str) -> list[dict]:
@@ -147,7 +49,7 @@ async def get_idiom_history(username: str) -> list[dict]:
             "score": row["score"],
             "difficulty": row["difficulty"],
             "words_count": row["words_count"],
-            "words": _as_list(row["words"]),
+            "words": row["words"] or [],
             "result": row["result"],
             "timestamp": row["played_at"].isoformat(),
         })
@@ -155,100 +57,6 @@ async def get_idiom_history(username: str) -> list[dict]:
     return history
 
 
-async def save_game_to_history(username: str, game_result: dict):
-    """Save completed game to history"""
-    pool = await storage_client.get_pool()
-
-    score = int(game_result.get("score", 0))
-    difficulty = int(game_result.get("difficulty", 3))
-    words = game_result.get("words", [])
-    words_count = int(game_result.get("words_count", len(words)))
-    result = str(game_result.get("result", "lose"))
-    timestamp = game_result.get("timestamp")
-    if isinstance(timestamp, str):
-        timestamp = datetime.fromisoformat(timestamp)
-
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            if timestamp:
-                await conn.execute(
-                    """
-                    INSERT INTO idiom_history (
-                        username,
-                        score,
-                        difficulty,
-                        words_count,
-                        words,
-                        result,
-                        played_at
-                    ) VALUES (
-                        $1,
-                        $2,
-                        $3,
-                        $4,
-                        $5::jsonb,
-                        $6,
-                        $7::timestamptz
-                    )
-                    """,
-                    username,
-                    score,
-                    difficulty,
-                    words_count,
-                    json.dumps(words),
-                    result,
-                    timestamp,
-                )
-            else:
-                await conn.execute(
-                    """
-                    INSERT INTO idiom_history (
-                        username,
-                        score,
-                        difficulty,
-                        words_count,
-                        words,
-                        result
-                    ) VALUES (
-                        $1,
-                        $2,
-                        $3,
-                        $4,
-                        $5::jsonb,
-                        $6
-                    )
-                    """,
-                    username,
-                    score,
-                    difficulty,
-                    words_count,
-                    json.dumps(words),
-                    result,
-                )
-
-            await conn.execute(
-                """
-                DELETE FROM idiom_history
-                WHERE username = $1
-                  AND id IN (
-                      SELECT id
-                      FROM (
-                          SELECT id,
-                                 ROW_NUMBER() OVER (
-                                     PARTITION BY username
-                                     ORDER BY played_at DESC, id DESC
-                                 ) AS rn
-                          FROM idiom_history
-                          WHERE username = $1
-                      ) ranked
-                      WHERE rn > $2
-                  )
-                """,
-                username,
-                MAX_IDIOM_HISTORY,
-            )
-
-
 async def clear_idiom(username: str):
     """Clear current idiom game for a user"""
     pool = await storage_client.get_pool()
@@ -259,6 +67,8 @@ async def clear_idiom(username: str):
             username,
         )
 
+    await idiom_games.touch(username)
+
 
 async def delete_idiom_history_item(username: str, index: int) -> bool:
     """Delete a specific game from history by index"""
@@ -274,8 +84,8 @@ async def delete_idiom_history_item(username: str, index: int) -> bool:
             FROM idiom_history
             WHERE username = $1
             ORDER BY played_at DESC, id DESC
-            OFFSET $2
             LIMIT 1
+            OFFSET $2
             """,
             username,
             index,
@@ -289,11 +99,27 @@ async def delete_idiom_history_item(username: str, index: int) -> bool:
             row["id"],
         )
 
+    await idiom_games.touch(username)
     return True
 
 
+@singleflight(key=lambda word: word.strip())
 async def verify_word_exists(word: str) -> tuple[bool, str]:
-    """Verify if an idiom is a valid Korean four-character idiom using OpenAI"""
+    """Verify if an idiom is a valid Korean four-character idiom: bundled corpus, stored verdict, then OpenAI"""
+    if word in idiom_corpus:
+        return True, ""
+
+    verdict = await load_verdict("idiom", word)
+    if verdict is not None:
+        return verdict
+
+    verdict = await ask_idiom_verdict(word)
+    await store_verdict("idiom", word, *verdict)
+    return verdict
+
+
+async def ask_idiom_verdict(word: str) -> tuple[bool, str]:
+    """Ask the model whether an expression is a real four-character idiom"""
     prompt = f"""'{word}'이(가) 한국어 사자성어(4글자)로 실제로 널리 쓰이는 표현인지 확인해주세요.
 
 판정 기준:
@@ -303,8 +129,8 @@ async def verify_word_exists(word: str) -> tuple[bool, str]:
 
 답변 형식: YES 또는 NO"""
 
-    response = await openai_client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = await llm.complete(
+        "judge",
         messages=[
             {
                 "role": "system",
@@ -312,7 +138,6 @@ async def verify_word_exists(word: str) -> tuple[bool, str]:
             },
             {"role": "user", "content": prompt},
         ],
-        max_tokens=30,
         temperature=0,
     )
 
@@ -325,51 +150,173 @@ async def verify_word_exists(word: str) -> tuple[bool, str]:
     return False, reason if reason else "사자성어 이어말하기에 사용할 수 없는 표현입니다"
 
 
-async def get_ai_word(used_words: list[str], last_char: str | None, difficulty: int) -> str:
-    """Get AI idiom response"""
-    try:
-        difficulty_guide = {
-            1: "아주 쉬운, 잘 알려진 사자성어만 사용",
-            2: "쉬운 사자성어 중심으로 사용",
-            3: "보편적인 사자성어를 균형 있게 사용",
-            4: "상대적으로 어려운 사자성어를 섞어 사용",
-            5: "전문가처럼 어려운 사자성어도 적극 사용",
-        }
-
-        prompt = f"""사자성어 이어말하기 게임입니다.
+def _candidates_request(used_words: list[str], last_char: str | None, difficulty: int) -> dict:
+    """Messages and sampling parameters for a ranked candidate list (easy -> hard)"""
+    difficulty_guide = {
+        1: "아주 쉬운, 잘 알려진 사자성어만 사용",
+        2: "쉬운 사자성어 중심으로 사용",
+        3: "보편적인 사자성어를 균형 있게 사용",
+        4: "상대적으로 어려운 사자성어를 섞어 사용",
+        5: "전문가처럼 어려운 사자성어도 적극 사용",
+    }
+
+    prompt = f"""사자성어 이어말하기 게임입니다.
 사용된 사자성어: {', '.join(used_words) if used_words else '(없음)'}
-{f"'{last_char}'(으)로 시작하는 " if last_char else ''}한국어 사자성어(정확히 4글자)를 하나만 말하세요.
+{f"'{last_char}'(으)로 시작하는 " if last_char else ''}한국어 사자성어(정확히 4글자) 후보를 {AI_CANDIDATE_COUNT}개 말하세요.
 
 조건:
 - 정확히 4글자 한글 사자성어
 - 이미 사용한 표현은 금지
-- 모르면 정확히 '패배'라고 답변
-- 출력은 사자성어 한 개만"""
-
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"너는 사자성어 이어말하기 AI 플레이어다. 난이도 가이드: {difficulty_guide.get(difficulty, difficulty_guide[3])}",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=30,
-            temperature=0.4 + (difficulty * 0.1),
-        )
+- 쉬운 사자성어부터 어려운 사자성어 순서로, 한 줄에 하나씩만 출력
+- 모르면 정확히 '패배'라고 답변"""
+
+    return {
+        "messages": [
+            {
+                "role": "system",
+                "content": f"너는 사자성어 이어말하기 AI 플레이어다. 난이도 가이드: {difficulty_guide.get(difficulty, difficulty_guide[3])}",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": 15 * AI_CANDIDATE_COUNT,
+        "temperature": 0.4 + (difficulty * 0.1),
+    }
+
+
+async def get_ai_candidates(used_words: list[str], last_char: str | None, difficulty: int) -> list[str]:
+    """Ask for a ranked list of candidate idioms (easy -> hard) in a single completion"""
+    response = await llm.complete("idiom_move", **_candidates_request(used_words, last_char, difficulty))
+    return parse_candidates(response.choices[0].message.content)
+
+
+async def stream_ai_word(used_words: list[str], last_char: str | None, difficulty: int) -> str:
+    """Stream the candidate list and stop reading once the idiom this difficulty plays is known"""
+    legal = []
+    # 한글 4글자가 모이면 줄바꿈을 기다리지 않고 후보 하나로 본다
+    candidates = llm.stream_candidates(
+        "idiom_move",
+        CandidateDecoder(syllables=4),
+        **_candidates_request(used_words, last_char, difficulty),
+    )
+    async with aclosing(candidates):
+        async for candidate in candidates:
+            if validate_ai_word(candidate, used_words, last_char)[0]:
+                legal.append(candidate)
+                if len(legal) > pick_rank(difficulty):
+                    break
+
+    return pick_candidate(legal, difficulty) or "패배"
 
-        ai_word = response.choices[0].message.content.strip()
-        ai_word = ai_word.replace(".", "").replace(",", "").replace("!", "").replace("?", "").strip()
-        return ai_word
+
+async def get_ai_word(used_words: list[str], last_char: str | None, difficulty: int) -> str:
+    """Get AI idiom response"""
+    try:
+        if AI_STREAM_MOVES:
+            return await stream_ai_word(used_words, last_char, difficulty)
+
+        candidates = await get_ai_candidates(used_words, last_char, difficulty)
+        legal = [c for c in candidates if validate_ai_word(c, used_words, last_char)[0]]
+        return pick_candidate(legal, difficulty) or "패배"
     except Exception as e:
         print(f"AI idiom generation failed: {e}")
-        # Fallback idioms (4-letter Korean idioms)
-        fallbacks = ["사필귀정", "개과천선", "호기심", "용감한", "지혜로운"]
-        for fb in fallbacks:
-            if fb not in used_words and _is_valid_idiom_format(fb):
-                return fb
-        return "사필귀정"  # Last resort
+        # Fallback: 번들 사자성어 목록에서 고른다
+        if last_char is None:
+            return idiom_corpus.sample(difficulty, used_words) or "패배"
+        for idiom in idiom_corpus.idioms:
+            if idiom[0] == last_char and idiom not in used_words:
+                return idiom
+        return "패배"
+
+
+async def pick_next_idiom(used_words: list[str], difficulty: int) -> str | None:
+    """Pick the next question: bundled corpus first, the model only once the corpus is used up"""
+    next_idiom = idiom_corpus.sample(difficulty, set(used_words))
+    if next_idiom is not None:
+        return next_idiom
+
+    # get_ai_word asks for a ranked candidate list and filters it locally, so one call is enough
+    candidate = await get_ai_word(used_words, None, difficulty)
+    if not is_valid_full_idiom(candidate) or candidate in used_words:
+        return None
+    return candidate
+
+
+async def _refill_upcoming(username: str, difficulty: int, actor: GameActor | None = None) -> list[str]:
+    """Queue prepared questions; returns the idioms the next turns will ask the meaning of"""
+    # A live game (WebSocket session) is refilled through its actor so memory and the DB agree
+    game = actor.game if actor is not None else await idiom_games.load(username)
+    if game.is_game_over or not game.current_idiom:
+        return []
+
+    # 문제 고르기는 모델을 부를 수 있으므로 잠금 밖에서 하고, 결과만 잠금 안에서 합친다
+    needed = [game.current_idiom, *game.upcoming[game.popped_upcoming:]]
+    taken = game.used_words + [game.current_idiom] + game.upcoming
+    prepared = []
+    while len(game.upcoming) - game.popped_upcoming + len(prepared) < IDIOM_PREFETCH_SIZE:
+        next_idiom = await pick_next_idiom(taken + prepared, difficulty)
+        if next_idiom is None:
+            break
+        prepared.append(next_idiom)
+
+    if prepared:
+        async with (actor.turn() if actor is not None else idiom_games.session(username)) as game:
+            # The game may have moved on (or been restarted) while the questions were picked
+            if not (game.is_game_over or not game.current_idiom or game.difficulty != difficulty):
+                queued = game.upcoming[game.popped_upcoming:]
+                for idiom in prepared:
+                    if len(queued) >= IDIOM_PREFETCH_SIZE:
+                        break
+                    if idiom not in game.used_words and idiom != game.current_idiom and idiom not in queued:
+                        game.upcoming.append(idiom)
+                        queued.append(idiom)
+
+    return needed + prepared
+
+
+def schedule_idiom_prefetch(username: str, difficulty: int, actor: GameActor | None = None):
+    """Top up the user's queue of prepared questions in the background"""
+    running = _prefetch_tasks.get(username)
+    if running is not None and not running.done():
+        return
+
+    async def run():
+        try:
+            idioms = await _refill_upcoming(username, difficulty, actor)
+        except Exception as e:
+            print(f"Idiom prefetch failed: {e}")
+            return
+        finally:
+            _prefetch_tasks.pop(username, None)
+        _schedule_meaning_warmup(username, idioms)
+
+    _prefetch_tasks[username] = asyncio.create_task(run())
+
+
+def _schedule_meaning_warmup(username: str, idioms: list[str]):
+    """Fetch the meanings the next turns will show, so a correct answer never waits on the model.
+
+    Runs apart from the refill: it writes no game state, so nothing has to wait for it.
+    """
+    running = _meaning_tasks.get(username)
+    if not idioms or (running is not None and not running.done()):
+        return
+
+    async def run():
+        try:
+            # 캐시(메모리 LRU, idiom_meanings)에 채워 두면 정답 뒤 응답은 모델을 기다리지 않는다
+            await asyncio.gather(*(get_idiom_meaning(idiom) for idiom in idioms), return_exceptions=True)
+        finally:
+            _meaning_tasks.pop(username, None)
+
+    _meaning_tasks[username] = asyncio.create_task(run())
+
+
+async def settle_idiom_prefetch(username: str):
+    """Wait for the user's background refill, if any, so its write is not seen as someone else's"""
+    running = _prefetch_tasks.get(username)
+    if running is not None and not running.done():
+        # wait() does not cancel the refill if this caller is cancelled
+        await asyncio.wait({running})
 
 
 def _is_valid_idiom_format(word: str) -> bool:
@@ -390,7 +337,7 @@ async def validate_user_word_async(word: str, used_words: list[str], last_word:
 
     if last_word:
         expected_char = get_last_char(last_word)
-        if word[0] != expected_char:
+        if word[0] not in allowed_starts(last_word[-1]):
             return False, f"'{expected_char}'(으)로 시작하는 사자성어를 입력하세요!"
 
     is_real_word, reason = await verify_word_exists(word)
@@ -400,12 +347,12 @@ async def validate_user_word_async(word: str, used_words: list[str], last_word:
     return True, ""
 
 
-def validate_ai_word(ai_word: str, used_words: list[str], last_char: str) -> tuple[bool, str]:
+def validate_ai_word(ai_word: str, used_words: list[str], last_char: str | None) -> tuple[bool, str]:
     """Validate AI's idiom. Returns (is_valid, win_message)"""
     if "패배" in ai_word or not _is_valid_idiom_format(ai_word):
         return False, "축하합니다! AI가 사자성어를 찾지 못했습니다!"
 
-    if ai_word[0] != last_char:
+    if last_char and ai_word[0] != last_char:
         return False, "축하합니다! AI가 규칙을 어겼습니다!"
 
     if ai_word in used_words:
@@ -427,15 +374,115 @@ def get_idiom_suffix(idiom: str) -> str:
     return idiom[2:] if idiom else ""
 
 
-async def get_idiom_meaning(idiom: str) -> str:
-    response = await openai_client.chat.completions.create(
-        model="gpt-4o-mini",
+async def generate_idiom_meaning(idiom: str) -> str:
+    """Ask the model for an idiom's meaning. Returns an empty string when it gives none.
+
+    Not coalesced itself: get_idiom_meaning's flight already covers the lookup and this call.
+    """
+    response = await llm.complete(
+        "idiom_meaning",
         messages=[
             {"role": "system", "content": "너는 사자성어 해설가다. 해석을 한국어 한 문장으로 간결하게 설명한다."},
             {"role": "user", "content": f"{idiom}의 뜻을 한국어로 짧게 설명해줘."},
         ],
-        max_tokens=80,
-        temperature=0.2,
+        temperature=0,
     )
-    meaning = response.choices[0].message.content.strip()
-    return meaning or "해석 정보를 가져오지 못했습니다."
+    return (response.choices[0].message.content or "").strip()
+
+
+def _cache_meaning(idiom: str, meaning: str):
+    _meaning_cache[idiom] = meaning
+    _meaning_cache.move_to_end(idiom)
+    while len(_meaning_cache) > IDIOM_MEANING_CACHE_SIZE:
+        _meaning_cache.popitem(last=False)
+
+
+async def _load_or_generate_meaning(idiom: str) -> str:
+    pool = await storage_client.get_pool()
+
+    async with pool.acquire() as conn:
+        meaning = await conn.fetchval(
+            "SELECT meaning FROM idiom_meanings WHERE idiom = $1",
+            idiom,
+        )
+    if meaning:
+        return meaning
+
+    meaning = await generate_idiom_meaning(idiom)
+    if not meaning:
+        return ""
+
+    async with pool.acquire() as conn:
+        await conn.execute(
+            """
+            INSERT INTO idiom_meanings (idiom, meaning)
+            VALUES ($1, $2)
+            ON CONFLICT (idiom) DO NOTHING
+            """,
+            idiom,
+            meaning,
+        )
+    return meaning
+
+
+async def get_idiom_meaning(idiom: str) -> str:
+    """Get an idiom's meaning: bundled corpus, then in-memory LRU, then idiom_meanings, then the model"""
+    meaning = idiom_corpus.meaning(idiom) or _meaning_cache.get(idiom)
+    if meaning:
+        if idiom in _meaning_cache:
+            _meaning_cache.move_to_end(idiom)
+        return meaning
+
+    # 같은 사자성어를 동시에 조회하면 DB/모델 요청 하나를 함께 기다린다
+    meaning = await _meaning_flight.do(idiom, _load_or_generate_meaning, idiom)
+    if not meaning:
+        return "해석 정보를 가져오지 못했습니다."
+
+    _cache_meaning(idiom, meaning)
+    return meaning
+
+
+async def warm_idiom_meaning_cache():
+    """Load the most recent stored meanings into the in-memory LRU"""
+    pool = await storage_client.get_pool()
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT idiom, meaning
+            FROM idiom_meanings
+            ORDER BY created_at DESC
+            LIMIT $1
+            """,
+            IDIOM_MEANING_CACHE_SIZE,
+        )
+
+    for row in reversed(rows):
+        _cache_meaning(row["idiom"], row["meaning"])
+
+
+async def list_idioms_without_meaning() -> list[str]:
+    """Idioms seen in past or current games that have no stored meaning yet"""
+    pool = await storage_client.get_pool()
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT DISTINCT seen.idiom
+            FROM (
+                SELECT jsonb_array_elements_text(words) AS idiom FROM idiom_history
+                UNION
+                SELECT w.word
+                FROM idiom_state s
+                CROSS JOIN LATERAL unnest(s.used_word_ids) AS u(id)
+                JOIN words w ON w.id = u.id
+                UNION
+                SELECT current_idiom FROM idiom_state WHERE current_idiom IS NOT NULL
+            ) seen
+            WHERE NOT EXISTS (
+                SELECT 1 FROM idiom_meanings m WHERE m.idiom = seen.idiom
+            )
+            """
+        )
+
+    return [row["idiom"] for row in rows if row["idiom"] not in idiom_corpus]
@@ -1,122 +1,33 @@
 import json
-from datetime import datetime
-from ..core.database import storage_client, openai_client
-from ..core.config import get_difficulty_prompt
-from ..core.utils import get_last_char, is_valid_korean_word, is_valid_korean_format
+from contextlib import aclosing
+from ..core.database import storage_client
+from ..core.llm import llm
+from ..core.game_state import GameStateRepository
+from ..core.config import (
+    AI_CANDIDATE_COUNT,
+    AI_STREAM_MOVES,
+    WORDCHAIN_COMBINED_CALL,
+    get_candidates_prompt,
+    get_combined_turn_prompt,
+)
+from ..core.hangul import allowed_starts
+from ..core.precomputed import load_move_pool, load_verdict, store_verdict
+from ..core.singleflight import singleflight
+from ..core.utils import (
+    CandidateDecoder,
+    clean_word,
+    get_last_char,
+    is_valid_korean_word,
+    is_valid_korean_format,
+    parse_candidates,
+    pick_candidate,
+    pick_rank,
+)
 
 
 MAX_WORDCHAIN_HISTORY = 20
 
-
-def _as_list(value):
-    if isinstance(value, str):
-        return json.loads(value)
-    return value or []
-
-
-async def get_wordchain_game(username: str) -> dict:
-    """Get wordchain game state from PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT used_words, score, is_game_over, difficulty
-            FROM wordchain_state
-            WHERE username = $1
-            """,
-            username,
-        )
-
-    if not row:
-        return {"used_words": [], "score": 0, "is_game_over": False, "difficulty": 3}
-
-    return {
-        "used_words": _as_list(row["used_words"]),
-        "score": row["score"],
-        "is_game_over": row["is_game_over"],
-        "difficulty": row["difficulty"],
-    }
-
-
-async def save_wordchain_game(username: str, game_state: dict):
-    """Save wordchain game state to PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    used_words = game_state.get("used_words", [])
-    score = int(game_state.get("score", 0))
-    is_game_over = bool(game_state.get("is_game_over", False))
-    difficulty = int(game_state.get("difficulty", 3))
-
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
-            INSERT INTO wordchain_state (
-                username,
-                used_words,
-                score,
-                is_game_over,
-                difficulty
-            ) VALUES (
-                $1,
-                $2::jsonb,
-                $3,
-                $4,
-                $5
-            )
-            ON CONFLICT (username)
-            DO UPDATE SET
-                used_words = EXCLUDED.used_words,
-                score = EXCLUDED.score,
-                is_game_over = EXCLUDED.is_game_over,
-                difficulty = EXCLUDED.difficulty,
-                updated_at = NOW()
-            """,
-            username,
-            json.dumps(used_words),
-            score,
-            is_game_over,
-            difficulty,
-        )
-
-
-async def get_wordchain_messages(username: str) -> list[dict]:
-    """Get wordchain messages for current game from PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT messages
-            FROM wordchain_state
-            WHERE username = $1
-            """,
-            username,
-        )
-
-    if not row:
-        return []
-
-    return _as_list(row["messages"])
-
-
-async def save_wordchain_messages(username: str, messages: list[dict]):
-    """Save wordchain messages to PostgreSQL"""
-    pool = await storage_client.get_pool()
-
-    async with pool.acquire() as conn:
-        await conn.execute(
-            """
-            INSERT INTO wordchain_state (username, messages)
-            VALUES ($1, $2::jsonb)
-            ON CONFLICT (username)
-            DO UPDATE SET
-                messages = EXCLUDED.messages,
-                updated_at = NOW()
-            """,
-            username,
-            json.dumps(messages),
-        )
+wordchain_games = GameStateRepository("wordchain_state", "wordchain_history", MAX_WORDCHAIN_HISTORY)
 
 
 async def get_wordchain_history(username: str) -> list[dict]:
@@ -142,7 +53,7 @@ async def get_wordchain_history(username: str) -> list[dict]:
             "score": row["score"],
             "difficulty": row["difficulty"],
             "words_count": row["words_count"],
-            "words": _as_list(row["words"]),
+            "words": row["words"] or [],
             "result": row["result"],
             "timestamp": row["played_at"].isoformat(),
         })
@@ -150,100 +61,6 @@ async def get_wordchain_history(username: str) -> list[dict]:
     return history
 
 
-async def save_game_to_history(username: str, game_result: dict):
-    """Save completed game to history"""
-    pool = await storage_client.get_pool()
-
-    score = int(game_result.get("score", 0))
-    difficulty = int(game_result.get("difficulty", 3))
-    words = game_result.get("words", [])
-    words_count = int(game_result.get("words_count", len(words)))
-    result = str(game_result.get("result", "lose"))
-    timestamp = game_result.get("timestamp")
-    if isinstance(timestamp, str):
-        timestamp = datetime.fromisoformat(timestamp)
-
-    async with pool.acquire() as conn:
-        async with conn.transaction():
-            if timestamp:
-                await conn.execute(
-                    """
-                    INSERT INTO wordchain_history (
-                        username,
-                        score,
-                        difficulty,
-                        words_count,
-                        words,
-                        result,
-                        played_at
-                    ) VALUES (
-                        $1,
-                        $2,
-                        $3,
-                        $4,
-                        $5::jsonb,
-                        $6,
-                        $7::timestamptz
-                    )
-                    """,
-                    username,
-                    score,
-                    difficulty,
-                    words_count,
-                    json.dumps(words),
-                    result,
-                    timestamp,
-                )
-            else:
-                await conn.execute(
-                    """
-                    INSERT INTO wordchain_history (
-                        username,
-                        score,
-                        difficulty,
-                        words_count,
-                        words,
-                        result
-                    ) VALUES (
-                        $1,
-                        $2,
-                        $3,
-                        $4,
-                        $5::jsonb,
-                        $6
-                    )
-                    """,
-                    username,
-                    score,
-                    difficulty,
-                    words_count,
-                    json.dumps(words),
-                    result,
-                )
-
-            await conn.execute(
-                """
-                DELETE FROM wordchain_history
-                WHERE username = $1
-                  AND id IN (
-                      SELECT id
-                      FROM (
-                          SELECT id,
-                                 ROW_NUMBER() OVER (
-                                     PARTITION BY username
-                                     ORDER BY played_at DESC, id DESC
-                                 ) AS rn
-                          FROM wordchain_history
-                          WHERE username = $1
-                      ) ranked
-                      WHERE rn > $2
-                  )
-                """,
-                username,
-                MAX_WORDCHAIN_HISTORY,
-            )
-
-
 async def clear_wordchain(username: str):
     """Clear current wordchain game for a user"""
     pool = await storage_client.get_pool()
@@ -254,6 +71,8 @@ async def clear_wordchain(username: str):
             username,
         )
 
+    await wordchain_games.touch(username)
+
 
 async def delete_wordchain_history_item(username: str, index: int) -> bool:
     """Delete a specific game from history by index"""
@@ -269,8 +88,8 @@ async def delete_wordchain_history_item(username: str, index: int) -> bool:
             FROM wordchain_history
             WHERE username = $1
             ORDER BY played_at DESC, id DESC
-            OFFSET $2
             LIMIT 1
+            OFFSET $2
             """,
             username,
             index,
@@ -284,11 +103,24 @@ async def delete_wordchain_history_item(username: str, index: int) -> bool:
             row["id"],
         )
 
+    await wordchain_games.touch(username)
     return True
 
 
+@singleflight(key=lambda word: word.strip())
 async def verify_word_exists(word: str) -> tuple[bool, str]:
-    """Verify if a word is a real Korean word using OpenAI"""
+    """Verify if a word is a real Korean word: stored verdict first, then OpenAI (concurrent checks share one call)"""
+    verdict = await load_verdict("wordchain", word)
+    if verdict is not None:
+        return verdict
+
+    verdict = await ask_word_verdict(word)
+    await store_verdict("wordchain", word, *verdict)
+    return verdict
+
+
+async def ask_word_verdict(word: str) -> tuple[bool, str]:
+    """Ask the model whether a word can be used in the game"""
     prompt = f"""'{word}'가 끝말잇기에서 사용할 수 있는 단어인지 확인해주세요.
 
 허용되는 단어 (거의 다 허용!):
@@ -305,13 +137,12 @@ async def verify_word_exists(word: str) -> tuple[bool, str]:
 
 답변: YES 또는 NO"""
 
-    response = await openai_client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = await llm.complete(
+        "judge",
         messages=[
             {"role": "system", "content": "당신은 관대한 끝말잇기 심판입니다. 실제로 존재하거나 사람들이 아는 단어면 거의 다 허용합니다. 매우 관대하게 판단하세요."},
             {"role": "user", "content": prompt}
         ],
-        max_tokens=50,
         temperature=0
     )
 
@@ -327,35 +158,72 @@ async def verify_word_exists(word: str) -> tuple[bool, str]:
         return False, reason if reason else "끝말잇기에 사용할 수 없는 단어입니다"
 
 
-async def get_ai_word(used_words: list[str], last_char: str, difficulty: int) -> str:
-    """Get AI's word response"""
-    try:
-        prompt = f"""끝말잇기 게임입니다.
+def _candidates_request(used_words: list[str], last_char: str, difficulty: int, count: int) -> dict:
+    """Messages and sampling parameters for a ranked candidate list (common -> rare)"""
+    prompt = f"""끝말잇기 게임입니다.
 사용된 단어들: {', '.join(used_words)}
-'{last_char}'(으)로 시작하는 한국어 단어를 하나만 말하세요.
+'{last_char}'(으)로 시작하는 한국어 단어 후보를 {count}개 말하세요.
 
 조건:
 - 표준국어대사전에 등재된 명사만 가능
 - 고유명사(사람 이름, 지명, 브랜드명) 불가
 - 위에 나온 단어는 사용 불가
-- 단어만 출력하세요"""
+- 쉬운 단어부터 어려운 단어 순서로, 한 줄에 단어 하나씩만 출력하세요"""
+
+    return {
+        "messages": [
+            {"role": "system", "content": get_candidates_prompt(difficulty)},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 20 * count,
+        "temperature": 0.7 + (difficulty * 0.1),
+    }
 
-        system_prompt = get_difficulty_prompt(difficulty)
 
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=50,
-            temperature=0.7 + (difficulty * 0.1)
-        )
+async def get_ai_candidates(
+    used_words: list[str], last_char: str, difficulty: int, count: int = AI_CANDIDATE_COUNT
+) -> list[str]:
+    """Ask for a ranked list of candidate words (common -> rare) in a single completion"""
+    response = await llm.complete(
+        "wordchain_move",
+        **_candidates_request(used_words, last_char, difficulty, count),
+    )
+
+    return parse_candidates(response.choices[0].message.content)
+
+
+async def stream_ai_word(used_words: list[str], last_char: str, difficulty: int) -> str:
+    """Stream the candidate list and stop reading once the candidate this difficulty plays is known"""
+    legal = []
+    candidates = llm.stream_candidates(
+        "wordchain_move",
+        CandidateDecoder(split_on_space=True),
+        **_candidates_request(used_words, last_char, difficulty, AI_CANDIDATE_COUNT),
+    )
+    async with aclosing(candidates):
+        async for candidate in candidates:
+            if validate_ai_word(candidate, used_words, last_char)[0]:
+                legal.append(candidate)
+                if len(legal) > pick_rank(difficulty):
+                    break
+
+    return pick_candidate(legal, difficulty) or "패배"
 
-        ai_word = response.choices[0].message.content.strip()
-        # Clean up
-        ai_word = ai_word.replace(".", "").replace(",", "").replace("!", "").replace("?", "").strip()
-        return ai_word
+
+async def get_ai_word(used_words: list[str], last_char: str, difficulty: int) -> str:
+    """Get AI's word response: precomputed move pool first, then the model"""
+    try:
+        # 미리 계산해 둔 후보가 남아 있으면 모델을 부르지 않는다
+        legal = [c for c in await load_move_pool(last_char) if validate_ai_word(c, used_words, last_char)[0]]
+        if legal:
+            return pick_candidate(legal, difficulty)
+
+        if AI_STREAM_MOVES:
+            return await stream_ai_word(used_words, last_char, difficulty)
+
+        candidates = await get_ai_candidates(used_words, last_char, difficulty)
+        legal = [c for c in candidates if validate_ai_word(c, used_words, last_char)[0]]
+        return pick_candidate(legal, difficulty) or "패배"
     except Exception as e:
         print(f"AI word generation failed: {e}")
         # Fallback words starting with last_char
@@ -380,7 +248,7 @@ async def validate_user_word_async(word: str, used_words: list[str], last_word:
     if last_word:
         expected_char = get_last_char(last_word)
         # 두음법칙: 원래 글자와 변환된 글자 모두 허용
-        if word[0] != expected_char and word[0] != last_word[-1]:
+        if word[0] not in allowed_starts(last_word[-1]):
             return False, f"'{expected_char}'(으)로 시작하는 단어를 입력하세요!"
 
     # 사전 검증 (실제 단어인지 확인)
@@ -402,7 +270,7 @@ def validate_user_word(word: str, used_words: list[str], last_word: str | None)
 
     if last_word:
         expected_char = get_last_char(last_word)
-        if word[0] != expected_char and word[0] != last_word[-1]:
+        if word[0] not in allowed_starts(last_word[-1]):
             return False, f"'{expected_char}'(으)로 시작하는 단어를 입력하세요!"
 
     return True, ""
@@ -413,10 +281,112 @@ def validate_ai_word(ai_word: str, used_words: list[str], last_char: str) -> tup
     if "패배" in ai_word or not is_valid_korean_format(ai_word):
         return False, "🎉 축하합니다! AI가 단어를 찾지 못했습니다!"
 
-    if ai_word[0] != last_char and ai_word[0] != last_char:
+    if ai_word[0] != last_char:
         return False, "🎉 축하합니다! AI가 규칙을 어겼습니다!"
 
     if ai_word in used_words:
         return False, "🎉 축하합니다! AI가 중복 단어를 말했습니다!"
 
     return True, ""
+
+
+def _parse_turn_result(content: str | None) -> dict | None:
+    """Strictly parse the combined judge+move reply. Returns None when it does not match the schema"""
+    try:
+        data = json.loads(content or "")
+    except ValueError:
+        return None
+
+    if not isinstance(data, dict):
+        return None
+
+    user_word_valid = data.get("user_word_valid")
+    reason = data.get("reason")
+    ai_word = data.get("ai_word")
+    ai_candidates = data.get("ai_candidates")
+
+    if not isinstance(user_word_valid, bool):
+        return None
+    if not isinstance(reason, str) or not isinstance(ai_word, str):
+        return None
+    if not isinstance(ai_candidates, list) or not all(isinstance(c, str) for c in ai_candidates):
+        return None
+
+    return {
+        "user_word_valid": user_word_valid,
+        "reason": reason.strip(),
+        "ai_word": clean_word(ai_word),
+        "ai_candidates": [clean_word(c) for c in ai_candidates],
+    }
+
+
+async def get_combined_turn(word: str, used_words: list[str], difficulty: int) -> dict | None:
+    """Judge the user's word and pick the AI's reply in a single completion.
+
+    The verdict is sampled with the move, so unlike the two-call judge (temperature 0) it is not
+    fully deterministic: the completion runs at a low temperature instead, which keeps verdicts
+    stable at the cost of less varied AI words. ai_word is None when no candidate is legal.
+    """
+    last_char = get_last_char(word)
+    prompt = f"""끝말잇기 게임입니다.
+사용된 단어들: {', '.join(used_words) if used_words else '(없음)'}
+사용자 단어: {word}
+
+1. 사용자 단어가 끝말잇기에서 사용할 수 있는 단어인지 판정하세요.
+   (일반 명사, 외래어, 브랜드명, 지명, 유명인 이름 등 알려진 단어면 허용 / 지어낸 말, 1글자 단어는 불가)
+2. '{last_char}'(으)로 시작하는 한국어 단어로 응답하세요. 위에 나온 단어와 사용자 단어는 사용 불가."""
+
+    try:
+        response = await llm.complete(
+            "wordchain_move",
+            messages=[
+                {"role": "system", "content": get_combined_turn_prompt(difficulty)},
+                {"role": "user", "content": prompt}
+            ],
+            # 판정도 같은 응답에서 나오므로 낮은 온도로 고정한다 (같은 단어가 턴마다 다르게 판정되지 않게)
+            temperature=0.3,
+            response_format={"type": "json_object"},
+        )
+    except Exception as e:
+        print(f"Combined wordchain turn failed: {e}")
+        return None
+
+    turn = _parse_turn_result(response.choices[0].message.content)
+    if turn is None:
+        return None
+
+    # 모델이 고른 후보도 로컬 규칙으로 다시 검사해 첫 번째로 유효한 단어를 사용
+    next_used_words = used_words + [word]
+    for candidate in [turn["ai_word"], *turn["ai_candidates"]]:
+        if validate_ai_word(candidate, next_used_words, last_char)[0]:
+            turn["ai_word"] = candidate
+            break
+    else:
+        # 유효한 후보가 없으면 두 번 호출하는 경로처럼 get_ai_word로 다시 고르게 한다
+        turn["ai_word"] = None
+
+    return turn
+
+
+async def judge_user_word(
+    word: str, used_words: list[str], last_word: str | None, difficulty: int
+) -> tuple[bool, str, str | None]:
+    """Validate user's word and, in combined-call mode, pick the AI's reply too.
+
+    Returns (is_valid, error_message, ai_word). ai_word is None when the AI's reply
+    still has to be requested with get_ai_word.
+    """
+    if WORDCHAIN_COMBINED_CALL:
+        is_valid, error_msg = validate_user_word(word, used_words, last_word)
+        if not is_valid:
+            return False, error_msg, None
+
+        turn = await get_combined_turn(word, used_words, difficulty)
+        if turn is not None:
+            if not turn["user_word_valid"]:
+                reason = turn["reason"] or "끝말잇기에 사용할 수 없는 단어입니다"
+                return False, f"'{word}'은(는) {reason}", None
+            return True, "", turn["ai_word"]
+
+    is_valid, error_msg = await validate_user_word_async(word, used_words, last_word)
+    return is_valid, error_msg, None
@@ -0,0 +1,85 @@
+"""Latency of well-behaved users while a few others flood the send endpoints.
+
+Simulates an upstream model whose latency grows with the number of concurrent calls and
+compares no admission control with AdmissionController in front of it.
+
+Run from the backend directory:
+    python -m benchmarks.bench_admission
+"""
+import asyncio
+import random
+import statistics
+import time
+
+from app.core.admission import AdmissionController, AdmissionRejected
+
+BASE_LATENCY = 0.05      # seconds per call with an idle upstream
+LATENCY_PER_CALL = 0.01  # extra seconds per concurrent call
+DURATION = 3.0
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.inflight = 0
+
+    async def call(self):
+        self.inflight += 1
+        try:
+            await asyncio.sleep(BASE_LATENCY + LATENCY_PER_CALL * self.inflight)
+        finally:
+            self.inflight -= 1
+
+
+async def run(admission: AdmissionController | None) -> dict:
+    upstream = FakeUpstream()
+    polite_latencies: list[float] = []
+    rejected = {"polite": 0, "spammer": 0}
+    deadline = time.monotonic() + DURATION
+
+    async def request(username: str, kind: str):
+        started = time.monotonic()
+        try:
+            if admission is None:
+                await upstream.call()
+            else:
+                async with admission.admit(username):
+                    await upstream.call()
+        except AdmissionRejected:
+            rejected[kind] += 1
+            return
+        if kind == "polite":
+            polite_latencies.append(time.monotonic() - started)
+
+    async def polite_user(i: int):
+        rng = random.Random(i)
+        while time.monotonic() < deadline:
+            await request(f"polite-{i}", "polite")
+            await asyncio.sleep(rng.uniform(0.5, 1.5))
+
+    async def spammer(i: int):
+        tasks = []
+        while time.monotonic() < deadline:
+            tasks.append(asyncio.create_task(request(f"spammer-{i}", "spammer")))
+            await asyncio.sleep(0.002)
+        await asyncio.gather(*tasks)
+
+    await asyncio.gather(*(polite_user(i) for i in range(20)), *(spammer(i) for i in range(3)))
+
+    quantiles = statistics.quantiles(polite_latencies, n=100)
+    return {
+        "polite p50 ms": round(quantiles[49] * 1e3, 1),
+        "polite p99 ms": round(quantiles[98] * 1e3, 1),
+        "polite rejected": rejected["polite"],
+        "spammer rejected": rejected["spammer"],
+    }
+
+
+async def main():
+    print("no admission control:", await run(None))
+    controller = AdmissionController(user_rate=1.0, user_burst=5, max_inflight=16, max_queue=32, queue_timeout=10)
+    print("admission control:   ", await run(controller))
+    print("counters:", controller.snapshot())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""Microbenchmark for the 두음법칙 lookup on the wordchain hot path.
+
+Run from the backend directory:
+    python -m benchmarks.bench_hangul
+"""
+import random
+import timeit
+
+from app.core.hangul import SYLLABLE_BASE, SYLLABLE_COUNT, allowed_starts, apply_dueum
+from app.core.utils import get_last_char
+
+# The hand-written map get_last_char used before the table-driven engine
+LEGACY_DUEUM_MAP = {
+    '랴': '야', '려': '여', '례': '예', '료': '요', '류': '유', '리': '이',
+    '량': '양', '력': '역', '련': '연', '렬': '열', '렴': '염', '렵': '엽',
+    '령': '영', '륭': '융', '률': '율', '림': '임', '립': '입',
+    '라': '나', '래': '내', '로': '노', '뢰': '뇌', '루': '누', '르': '느',
+    '락': '낙', '란': '난', '랄': '날', '람': '남', '랍': '납', '랑': '낭',
+    '론': '논', '롱': '농',
+    '녀': '여', '뇨': '요', '뉴': '유', '니': '이',
+    '녁': '역', '년': '연', '념': '염', '녕': '영',
+}
+
+
+def legacy_get_last_char(word: str) -> str:
+    if not word:
+        return ""
+    dueum_map = dict(LEGACY_DUEUM_MAP)
+    return dueum_map.get(word[-1], word[-1])
+
+
+def main():
+    for char, expected in LEGACY_DUEUM_MAP.items():
+        assert apply_dueum(char) == expected, (char, apply_dueum(char), expected)
+
+    rng = random.Random(0)
+    words = [
+        "".join(chr(SYLLABLE_BASE + rng.randrange(SYLLABLE_COUNT)) for _ in range(rng.randint(2, 4)))
+        for _ in range(10_000)
+    ]
+
+    cases = {
+        "legacy get_last_char (dict rebuilt per call)": lambda: [legacy_get_last_char(w) for w in words],
+        "get_last_char (table index)": lambda: [get_last_char(w) for w in words],
+        "allowed_starts": lambda: [allowed_starts(w[-1]) for w in words],
+    }
+
+    changed = sum(1 for i in range(SYLLABLE_COUNT) if apply_dueum(chr(SYLLABLE_BASE + i)) != chr(SYLLABLE_BASE + i))
+    print(f"syllables with a 두음법칙 form: {changed} (legacy map: {len(LEGACY_DUEUM_MAP)})")
+
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=10, repeat=5)) / (10 * len(words))
+        print(f"{name:<48} {best * 1e9:8.1f} ns/word")
+
+
+if __name__ == "__main__":
+    main()
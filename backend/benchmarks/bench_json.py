@@ -0,0 +1,99 @@
+"""Encode/decode cost of large chat session and game history payloads.
+
+Compares the stdlib json path the services used before (json.dumps on write, json.loads on
+read, starlette's JSONResponse on the way out) with app.core.serialization, which backs the
+asyncpg JSONB codecs and the default response class.
+
+Run from the backend directory:
+    python -m benchmarks.bench_json
+"""
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+
+from app.core import serialization
+from app.core.serialization import FastJSONResponse
+
+SYLLABLES = [chr(0xAC00 + i) for i in range(0, 11172, 7)]
+
+
+def _text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(SYLLABLES) if rng.random() > 0.15 else " " for _ in range(length))
+
+
+def make_session(rng: random.Random, turns: int) -> dict:
+    """A long chat session row as _session_row_to_dict returns it"""
+    start = datetime(2026, 1, 1)
+    conversation, messages = [], []
+    for i in range(turns):
+        question, answer = _text(rng, 40), _text(rng, 400)
+        conversation += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        timestamp = (start + timedelta(minutes=i)).isoformat()
+        messages += [
+            {"type": "message", "username": "user", "message": question, "timestamp": timestamp},
+            {"type": "message", "username": "AI", "message": answer, "timestamp": timestamp},
+        ]
+    return {
+        "id": "abcd1234",
+        "conversation": conversation,
+        "messages": messages,
+        "created_at": start.isoformat(),
+        "updated_at": start.isoformat(),
+    }
+
+
+def make_history(rng: random.Random, games: int, words: int) -> dict:
+    """A /api/wordchain/history response"""
+    return {
+        "history": [
+            {
+                "score": words // 2,
+                "difficulty": rng.randint(1, 5),
+                "words_count": words,
+                "words": [_text(rng, rng.randint(2, 4)) for _ in range(words)],
+                "result": rng.choice(["win", "lose"]),
+                "timestamp": datetime(2026, 1, 1).isoformat(),
+            }
+            for _ in range(games)
+        ]
+    }
+
+
+def _best(fn, number: int = 20) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main():
+    rng = random.Random(0)
+    payloads = {
+        "chat session (500 turns)": make_session(rng, 500),
+        "game history (20 x 200 words)": make_history(rng, 20, 200),
+    }
+
+    encoder = "orjson" if serialization.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"encoder: {encoder}")
+
+    for name, payload in payloads.items():
+        stdlib_text = json.dumps(payload)
+        fast_text = serialization.dumps(payload)
+        assert json.loads(stdlib_text) == serialization.loads(fast_text) == payload
+
+        cases = {
+            "json.dumps (JSONB write)": lambda: json.dumps(payload),
+            "serialization.dumps": lambda: serialization.dumps(payload),
+            "json.loads (JSONB read)": lambda: json.loads(stdlib_text),
+            "serialization.loads": lambda: serialization.loads(fast_text),
+            "JSONResponse.render": lambda: JSONResponse(payload),
+            "FastJSONResponse.render": lambda: FastJSONResponse(payload),
+        }
+
+        print(f"\n{name}: {len(fast_text.encode('utf-8')) / 1024:.0f} KiB")
+        for case, fn in cases.items():
+            print(f"  {case:<28} {_best(fn) * 1e3:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Time to first token of the first completions after startup, with and without connection warm-up.
+
+Each scenario builds a fresh client (an empty connection pool, as after a restart) and sends a
+burst of concurrent streamed completions; "warm" calls warm_up() first. Connections opened during
+the burst are the handshakes the users had to wait for.
+
+Runs against an in-process stub on 127.0.0.1:8011 unless OPENAI_BASE_URL is set (point it at the
+real API to include TLS; that costs tokens). Run from the backend directory:
+    python -m benchmarks.bench_llm_warmup
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import (
+    LLM_DEFAULT_MODEL,
+    LLM_HTTP2,
+    LLM_HTTP_KEEPALIVE_CONNECTIONS,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP_MAX_CONNECTIONS,
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+)
+from app.core.llm_transport import ConnectionMetrics, warm_up
+
+BURST = 8
+ROUNDS = 5
+STUB_PORT = 8011
+
+
+def new_client(base_url: str) -> tuple[AsyncOpenAI, ConnectionMetrics]:
+    metrics = ConnectionMetrics(
+        limits=httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=LLM_HTTP2,
+    )
+    client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=base_url, http_client=metrics.client())
+    return client, metrics
+
+
+async def first_token(client: AsyncOpenAI) -> float:
+    started = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model=LLM_DEFAULT_MODEL,
+        messages=[{"role": "user", "content": "안녕"}],
+        max_tokens=5,
+        stream=True,
+    )
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return time.perf_counter() - started
+    finally:
+        await stream.close()
+    return time.perf_counter() - started
+
+
+async def scenario(base_url: str, warm: bool) -> tuple[list[float], int]:
+    client, metrics = new_client(base_url)
+    try:
+        if warm:
+            await warm_up(client, BURST)
+        opened = metrics.counters["connections_opened"]
+        ttfts = await asyncio.gather(*(first_token(client) for _ in range(BURST)))
+        return list(ttfts), metrics.counters["connections_opened"] - opened
+    finally:
+        await client.close()
+
+
+async def run(base_url: str):
+    for warm in (False, True):
+        ttfts, opened = [], 0
+        for _ in range(ROUNDS):
+            round_ttfts, round_opened = await scenario(base_url, warm)
+            ttfts += round_ttfts
+            opened += round_opened
+        print(
+            f"{'warm' if warm else 'cold'}: TTFT p50 {statistics.median(ttfts) * 1000:.1f} ms"
+            f"  max {max(ttfts) * 1000:.1f} ms"
+            f"  connections opened during the burst: {opened / ROUNDS:.1f} of {BURST}"
+        )
+
+
+async def main():
+    if OPENAI_BASE_URL:
+        await run(OPENAI_BASE_URL)
+        return
+
+    import uvicorn
+    from app.cli.stub_llm import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        await run(f"http://127.0.0.1:{STUB_PORT}/v1")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
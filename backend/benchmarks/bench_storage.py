@@ -0,0 +1,64 @@
+"""Round-trip latency of a game turn (load + flush of one state row) on the configured storage.
+
+Each simulated user plays turns that append a word and two messages, the same work a wordchain
+send does besides the model call. Compare the backends by switching STORAGE_BACKEND:
+
+Run from the backend directory:
+    STORAGE_BACKEND=sqlite SQLITE_PATH=:memory: python -m benchmarks.bench_storage
+    STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/bench.db python -m benchmarks.bench_storage
+    STORAGE_BACKEND=postgres python -m benchmarks.bench_storage
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from app.core.config import STORAGE_BACKEND, SQLITE_PATH
+from app.core.database import storage_client
+from app.core.game_state import GameStateRepository
+
+USERS = 20
+TURNS = 50
+
+games = GameStateRepository("wordchain_state", "wordchain_history", max_history=10)
+
+
+async def play(username: str, latencies: list[float]):
+    for turn in range(TURNS):
+        started = time.perf_counter()
+        async with games.session(username, since=turn * 2) as game:
+            game.used_words.append(f"{username}-{turn}")
+            game.messages.append({"type": "message", "username": username, "message": f"단어 {turn}"})
+            game.messages.append({"type": "score", "score": turn + 1})
+            game.score = turn + 1
+        latencies.append(time.perf_counter() - started)
+
+
+async def main():
+    await storage_client.connect()
+    try:
+        pool = await storage_client.get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM wordchain_state WHERE username LIKE 'bench-%'")
+
+        latencies: list[float] = []
+        started = time.perf_counter()
+        await asyncio.gather(*(play(f"bench-{i}", latencies) for i in range(USERS)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await storage_client.close()
+
+    latencies.sort()
+    target = SQLITE_PATH if STORAGE_BACKEND == "sqlite" else "postgres"
+    print(f"{STORAGE_BACKEND} ({target}): {len(latencies)} turns in {elapsed:.2f}s = {len(latencies) / elapsed:.0f} turns/s")
+    print(
+        f"  p50 {statistics.median(latencies) * 1000:.2f} ms"
+        f"  p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms"
+        f"  p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,27 @@
+"""Run the tests without services: an in-memory SQLite database and a placeholder OpenAI key.
+
+Set before anything imports app.core.config, which reads the environment once.
+"""
+import asyncio
+import os
+
+import pytest
+
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["SQLITE_PATH"] = ":memory:"
+os.environ["VERSIONS_BACKEND"] = "memory"
+os.environ["LLM_WARMUP_CONNECTIONS"] = "0"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+@pytest.fixture
+def storage():
+    """The app's storage client; its in-memory database is dropped after the test"""
+    from app.core.database import storage_client
+    from app.core.lexicon import lexicon
+
+    yield storage_client
+    asyncio.run(storage_client.close())
+    # 캐시된 단어 id는 지워진 데이터베이스의 것이다
+    lexicon._ids.clear()
+    lexicon._words.clear()
@@ -0,0 +1,126 @@
+"""GameActor resync: a WebSocket game reloads when its row was written elsewhere, and only then."""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.core.game_actor import GameActor
+from app.core.game_state import GameStateRepository
+from app.core.serialization import dumps, loads
+
+wordchain = GameStateRepository("wordchain_state", "wordchain_history", max_history=3)
+
+
+class FakeSocket:
+    """The part of starlette's WebSocket the actor uses"""
+
+    def __init__(self, frames=()):
+        self.frames = list(frames)
+        self.sent = []
+        self.closed = None
+
+    async def receive_text(self) -> str:
+        return self.frames.pop(0)
+
+    async def send_text(self, text: str):
+        self.sent.append(loads(text))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed = code
+
+
+def test_own_checkpoints_do_not_count_as_changes(storage):
+    async def scenario():
+        actor = GameActor(wordchain, "u", FakeSocket())
+        await actor.start()
+        changed = []
+        for score in (1, 2, 3):
+            async with actor.turn() as game:
+                changed.append(actor.changed_elsewhere())
+                game.score = score
+        await actor.stop()
+        return changed, await wordchain.load("u")
+
+    changed, stored = asyncio.run(scenario())
+    assert changed == [False, False, False]
+    assert stored.score == 3
+
+
+def test_write_elsewhere_reloads_the_next_turn_once(storage):
+    async def scenario():
+        actor = GameActor(wordchain, "u", FakeSocket())
+        await actor.start()
+        async with actor.turn() as game:
+            game.score = 1
+
+        # REST 요청이 같은 게임을 바꾼다 (액터의 체크포인트가 끝난 뒤에 잠금을 얻는다)
+        async with wordchain.session("u") as other:
+            other.score = 10
+
+        async with actor.turn() as game:
+            first = (actor.changed_elsewhere(), game.score)
+            game.score += 1
+        async with actor.turn() as game:
+            second = (actor.changed_elsewhere(), game.score)
+        await actor.stop()
+        return first, second, await wordchain.load("u")
+
+    first, second, stored = asyncio.run(scenario())
+    assert first == (True, 10)
+    assert second == (False, 11)
+    assert stored.score == 11
+
+
+def test_new_connection_takes_over_the_game(storage):
+    async def scenario():
+        old_socket = FakeSocket()
+        old = GameActor(wordchain, "u", old_socket)
+        await old.start()
+        async with old.turn() as game:
+            game.score = 5
+
+        new = GameActor(wordchain, "u", FakeSocket())
+        game = await new.start()
+        await new.stop()
+        return old_socket.closed, game.score
+
+    assert asyncio.run(scenario()) == (4000, 5)
+
+
+def test_malformed_frames_get_an_error_frame(storage):
+    async def scenario():
+        socket = FakeSocket(["not json", "[1, 2]", dumps({"answer": "사과"})])
+        actor = GameActor(wordchain, "u", socket)
+        received = [await actor.receive() for _ in range(3)]
+        return received, socket.sent
+
+    received, sent = asyncio.run(scenario())
+    assert received == [None, None, {"answer": "사과"}]
+    assert [frame["status"] for frame in sent] == [400, 400]
+
+
+def receive_turn(ws) -> list[str]:
+    """Frame types up to and including the one that ends the turn"""
+    types = []
+    while True:
+        frame = ws.receive_json()
+        types.append(frame["type"])
+        if frame["type"] in ("turn_end", "init"):
+            return types
+
+
+def test_idiom_socket_resyncs_after_a_rest_restart(storage):
+    from app.main import app
+
+    with TestClient(app) as client:
+        assert client.get("/api/idiom/init/u/1").status_code == 200
+        with client.websocket_connect("/ws/idiom/u?difficulty=1") as ws:
+            assert receive_turn(ws) == ["init"]
+
+            assert client.post("/api/idiom/restart/u").status_code == 200
+            ws.send_json({"answer": "아무"})
+            # 예전 화면 기준의 답은 버리고 현재 기록을 보낸 뒤에도 턴을 끝낸다
+            assert receive_turn(ws) == ["resync", "turn_end"]
+
+            ws.send_json({"answer": "아무"})
+            turn = receive_turn(ws)
+            assert "game_over" in turn and turn[-1] == "turn_end"
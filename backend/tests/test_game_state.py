@@ -0,0 +1,140 @@
+"""GameStateRepository on SQLite: one-query load, appending flush, log tails, history and the upcoming queue."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.game_state import GameStateRepository
+
+wordchain = GameStateRepository("wordchain_state", "wordchain_history", max_history=3)
+idiom = GameStateRepository("idiom_state", "idiom_history", max_history=3, has_upcoming=True)
+
+
+def message(text: str) -> dict:
+    return {"type": "message", "username": "u", "message": text, "timestamp": "2024-05-01T00:00:00"}
+
+
+def test_flush_then_load_round_trips(storage):
+    async def scenario():
+        async with wordchain.session("u") as game:
+            game.messages.append(message("사과"))
+            game.used_words.append("사과")
+            game.score = 1
+            game.difficulty = 4
+        return game, await wordchain.load("u", since=0)
+
+    written, loaded = asyncio.run(scenario())
+    assert loaded.messages == [message("사과")]
+    assert list(loaded.used_words) == ["사과"]
+    assert "사과" in loaded.used_words
+    assert (loaded.score, loaded.difficulty, loaded.is_game_over) == (1, 4, False)
+    assert loaded.message_count == 1
+    assert loaded.revision is not None and loaded.revision == written.revision
+    assert not loaded.is_dirty
+
+
+def test_flush_appends_to_the_stored_log(storage):
+    async def scenario():
+        async with wordchain.session("u") as game:
+            game.messages.extend([message("사과"), message("과자")])
+            game.used_words.extend(["사과", "과자"])
+
+        # since를 넘기면 그 뒤의 메시지만 불러오고, 저장할 때는 새 메시지만 덧붙인다
+        async with wordchain.session("u", since=2) as game:
+            assert game.messages == []
+            assert game.message_count == 2
+            game.messages.append(message("자석"))
+            game.used_words.append("자석")
+            assert game.message_count == 3
+
+        tail = await wordchain.load("u", since=1)
+        full = await wordchain.load("u", since=0)
+        none = await wordchain.load("u")
+        return tail, full, none
+
+    tail, full, none = asyncio.run(scenario())
+    assert tail.messages == [message("과자"), message("자석")]
+    assert full.messages == [message("사과"), message("과자"), message("자석")]
+    assert list(full.used_words) == ["사과", "과자", "자석"]
+    assert none.messages == [] and none.message_count == 3
+
+
+def test_clean_game_is_not_written(storage):
+    async def scenario():
+        async with wordchain.session("u") as game:
+            game.score = 2
+        revision = game.revision
+
+        async with wordchain.session("u") as game:
+            pass
+        return revision, game.etag_version, await wordchain.stored_revision("u")
+
+    revision, etag_version, stored = asyncio.run(scenario())
+    assert etag_version is None
+    assert stored == revision
+
+
+def test_stored_revision_changes_with_every_write(storage):
+    async def scenario():
+        revisions = [await wordchain.stored_revision("u")]
+        for score in (1, 2):
+            async with wordchain.session("u") as game:
+                game.score = score
+            revisions.append(await wordchain.stored_revision("u"))
+        return revisions
+
+    missing, first, second = asyncio.run(scenario())
+    assert missing is None
+    assert first and second and first != second
+
+
+def test_finished_games_go_to_history_trimmed_to_max(storage):
+    started = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    async def scenario():
+        for i in range(5):
+            async with wordchain.session("u") as game:
+                game.score = i
+                game.used_words.append(f"단어{i}")
+                game.finish("win", (started + timedelta(minutes=i)).isoformat())
+
+        pool = await storage.get_pool()
+        async with pool.acquire() as conn:
+            return await conn.fetch(
+                "SELECT score, words, result, played_at FROM wordchain_history WHERE username = $1 ORDER BY played_at DESC",
+                "u",
+            )
+
+    rows = asyncio.run(scenario())
+    assert [row["score"] for row in rows] == [4, 3, 2]
+    assert rows[0]["words"] == [f"단어{i}" for i in range(5)]
+    assert rows[0]["result"] == "win"
+    assert rows[0]["played_at"] == started + timedelta(minutes=4)
+
+
+def test_upcoming_queue_keeps_what_was_not_popped(storage):
+    async def scenario():
+        async with idiom.session("u") as game:
+            game.current_idiom = "사필귀정"
+            game.upcoming.extend(["개과천선", "일편단심", "죽마고우"])
+
+        async with idiom.session("u") as game:
+            # 그사이 쓰인 문제는 건너뛴다
+            game.used_words.append("개과천선")
+            popped = game.pop_upcoming()
+
+        return popped, await idiom.load("u")
+
+    popped, loaded = asyncio.run(scenario())
+    assert popped == "일편단심"
+    assert loaded.current_idiom == "사필귀정"
+    assert loaded.upcoming == ["죽마고우"]
+
+
+def test_dropped_queue_is_stored_empty(storage):
+    async def scenario():
+        async with idiom.session("u") as game:
+            game.upcoming.extend(["개과천선", "일편단심"])
+        async with idiom.session("u") as game:
+            game.drop_upcoming()
+        return await idiom.load("u")
+
+    assert asyncio.run(scenario()).upcoming == []
@@ -0,0 +1,77 @@
+"""두음법칙 table against a reference built from the rules (한글 맞춤법 제10항~제12항), spelled in jamo."""
+import pytest
+
+from app.core.hangul import SYLLABLE_BASE, SYLLABLE_COUNT, allowed_starts, apply_dueum, decompose
+
+INITIALS = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+MEDIALS = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+FINAL_COUNT = 28
+
+# 초성, 중성 -> 두음법칙을 적용한 초성
+RULES = {
+    # 제10항: 녀, 뇨, 뉴, 니 -> 여, 요, 유, 이
+    **{("ㄴ", medial): "ㅇ" for medial in "ㅕㅛㅠㅣ"},
+    # 제11항: 랴, 려, 례, 료, 류, 리 -> 야, 여, 예, 요, 유, 이
+    **{("ㄹ", medial): "ㅇ" for medial in "ㅑㅕㅖㅛㅠㅣ"},
+    # 제12항: 라, 래, 로, 뢰, 루, 르 -> 나, 내, 노, 뇌, 누, 느
+    **{("ㄹ", medial): "ㄴ" for medial in "ㅏㅐㅗㅚㅜㅡ"},
+}
+
+
+def syllable(initial: str, medial: str, final: int = 0) -> str:
+    return chr(SYLLABLE_BASE + (INITIALS.index(initial) * len(MEDIALS) + MEDIALS.index(medial)) * FINAL_COUNT + final)
+
+
+def reference(char: str) -> str:
+    initial, medial, final = decompose(char)
+    converted = RULES.get((INITIALS[initial], MEDIALS[medial]), INITIALS[initial])
+    return syllable(converted, MEDIALS[medial], final)
+
+
+NIEUN_RIEUL_SYLLABLES = [
+    syllable(initial, medial, final)
+    for initial in "ㄴㄹ"
+    for medial in MEDIALS
+    for final in range(FINAL_COUNT)
+]
+
+
+@pytest.mark.parametrize("char", NIEUN_RIEUL_SYLLABLES)
+def test_nieun_rieul_syllables(char):
+    expected = reference(char)
+    assert apply_dueum(char) == expected
+    assert allowed_starts(char) == {char, expected}
+
+
+@pytest.mark.parametrize(
+    "char, expected",
+    [
+        ("녀", "여"), ("뇨", "요"), ("뉴", "유"), ("니", "이"), ("녁", "역"), ("념", "염"),
+        ("랴", "야"), ("려", "여"), ("례", "예"), ("료", "요"), ("류", "유"), ("리", "이"), ("력", "역"), ("룡", "용"),
+        ("라", "나"), ("래", "내"), ("로", "노"), ("뢰", "뇌"), ("루", "누"), ("르", "느"), ("락", "낙"), ("릉", "능"),
+        ("나", "나"), ("냐", "냐"), ("네", "네"), ("럐", "럐"), ("뤼", "뤼"), ("릐", "릐"),
+    ],
+)
+def test_rule_examples(char, expected):
+    assert apply_dueum(char) == expected
+
+
+def test_rule_medial_sets_are_covered():
+    changed = {(char[0], apply_dueum(char)) for char in NIEUN_RIEUL_SYLLABLES if apply_dueum(char) != char}
+    # (ㄴ 4 + ㄹ 12) 중성 x 28 종성
+    assert len(changed) == 16 * FINAL_COUNT
+
+
+def test_other_syllables_are_unchanged():
+    for index in range(SYLLABLE_COUNT):
+        char = chr(SYLLABLE_BASE + index)
+        if INITIALS[decompose(char)[0]] in "ㄴㄹ":
+            continue
+        assert apply_dueum(char) == char
+        assert allowed_starts(char) == {char}
+
+
+@pytest.mark.parametrize("char", ["a", "1", "ㄹ", "ㅏ", " ", "", "라면"])
+def test_non_syllables(char):
+    assert apply_dueum(char) == char
+    assert allowed_starts(char) == {char}
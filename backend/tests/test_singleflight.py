@@ -0,0 +1,152 @@
+"""SingleFlight: shared calls, error propagation and cancellation of waiters and the upstream task."""
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+from app.services import wordchain_service
+
+
+class Upstream:
+    """Stand-in for a slow call: counts calls and finishes when `release` is set"""
+
+    def __init__(self, result="ok", error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self, *args):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        upstream = Upstream()
+        callers = [asyncio.create_task(flight.do("key", upstream)) for _ in range(10)]
+        await settle()
+        assert len(flight) == 1
+        upstream.release.set()
+        assert await asyncio.gather(*callers) == ["ok"] * 10
+        assert upstream.calls == 1
+        assert len(flight) == 0
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_do_not_share():
+    async def scenario():
+        flight = SingleFlight()
+        upstream = Upstream()
+        callers = [asyncio.create_task(flight.do(key, upstream)) for key in ("a", "b")]
+        await settle()
+        upstream.release.set()
+        await asyncio.gather(*callers)
+        assert upstream.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+        upstream = Upstream(error=RuntimeError("boom"))
+        callers = [asyncio.create_task(flight.do("key", upstream)) for _ in range(3)]
+        await settle()
+        upstream.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) and str(result) == "boom" for result in results)
+        assert upstream.calls == 1
+        assert len(flight) == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_shared_call_running():
+    async def scenario():
+        flight = SingleFlight()
+        upstream = Upstream()
+        leaving = asyncio.create_task(flight.do("key", upstream))
+        staying = asyncio.create_task(flight.do("key", upstream))
+        await settle()
+
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        assert not upstream.cancelled
+
+        upstream.release.set()
+        assert await staying == "ok"
+        assert upstream.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_last_waiter_cancelling_cancels_upstream():
+    async def scenario():
+        flight = SingleFlight()
+        upstream = Upstream()
+        callers = [asyncio.create_task(flight.do("key", upstream)) for _ in range(2)]
+        await settle()
+
+        for caller in callers:
+            caller.cancel()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        await settle()
+        assert upstream.cancelled
+        assert len(flight) == 0
+
+        # 다음 호출은 취소된 작업을 이어받지 않고 새로 시작한다
+        upstream.release.set()
+        assert await flight.do("key", upstream) == "ok"
+        assert upstream.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_verify_word_exists_normalises_its_key(monkeypatch):
+    calls = []
+    release = asyncio.Event()
+
+    async def no_verdict(game, word):
+        return None
+
+    async def ask(word):
+        calls.append(word)
+        await release.wait()
+        return True, ""
+
+    async def store(*args):
+        pass
+
+    monkeypatch.setattr(wordchain_service, "load_verdict", no_verdict)
+    monkeypatch.setattr(wordchain_service, "ask_word_verdict", ask)
+    monkeypatch.setattr(wordchain_service, "store_verdict", store)
+
+    async def scenario():
+        callers = [
+            asyncio.create_task(wordchain_service.verify_word_exists(word))
+            for word in (" 사과", "사과", "사과 ")
+        ]
+        await settle()
+        release.set()
+        return await asyncio.gather(*callers)
+
+    assert asyncio.run(scenario()) == [(True, "")] * 3
+    assert len(calls) == 1
@@ -0,0 +1,183 @@
+"""SQLiteClient's asyncpg emulation: query translation, JSON/timestamp columns, the Postgres stand-in
+functions (json_slice, json_concat, p95), copy_records_to_table, transactions and migrations."""
+import asyncio
+import sqlite3
+import statistics
+from datetime import datetime, timezone
+
+import pytest
+from asyncpg import UniqueViolationError
+
+from app.core.sqlite_storage import SQLiteClient, translate
+
+
+@pytest.fixture
+def client(tmp_path):
+    return SQLiteClient(str(tmp_path / "test.db"), pool_size=2)
+
+
+def run(client: SQLiteClient, scenario):
+    """Run scenario(conn) on a connection of a freshly connected client"""
+
+    async def main():
+        pool = await client.get_pool()
+        try:
+            async with pool.acquire() as conn:
+                return await scenario(conn)
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+def test_translate_rewrites_parameters_and_drops_casts():
+    assert translate("SELECT $1::int[], $2::jsonb WHERE a = $10::text") == "SELECT ?1, ?2 WHERE a = ?10"
+
+
+def test_json_and_timestamp_columns_round_trip(client):
+    played_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+    async def scenario(conn):
+        await conn.execute(
+            "INSERT INTO wordchain_history (username, words, played_at) VALUES ($1, $2::jsonb, $3::timestamptz)",
+            "u",
+            ["사과", "과자"],
+            played_at,
+        )
+        return await conn.fetchrow("SELECT words, played_at FROM wordchain_history WHERE username = $1", "u")
+
+    row = run(client, scenario)
+    assert row["words"] == ["사과", "과자"]
+    assert row["played_at"] == played_at
+
+
+def test_json_slice_matches_the_ordinality_tail(client):
+    async def scenario(conn):
+        log = [{"seq": i} for i in range(1, 6)]
+        return [
+            await conn.fetchval(f'SELECT json_slice($1, $2) AS "tail [JSON]"', log, since)
+            for since in (0, 3, 5, 9)
+        ]
+
+    assert run(client, scenario) == [
+        [{"seq": i} for i in range(1, 6)],
+        [{"seq": 4}, {"seq": 5}],
+        [],
+        [],
+    ]
+
+
+def test_json_concat_appends_to_the_stored_array(client):
+    async def scenario(conn):
+        await conn.execute("INSERT INTO wordchain_state (username, messages) VALUES ($1, $2::jsonb)", "u", [1, 2])
+        await conn.execute(
+            """
+            INSERT INTO wordchain_state (username, messages) VALUES ($1, $2::jsonb)
+            ON CONFLICT (username)
+            DO UPDATE SET messages = json_concat(wordchain_state.messages, EXCLUDED.messages)
+            """,
+            "u",
+            [3],
+        )
+        return await conn.fetchval("SELECT messages FROM wordchain_state WHERE username = $1", "u")
+
+    assert run(client, scenario) == [1, 2, 3]
+
+
+def test_copy_records_and_p95(client):
+    durations = list(range(1, 101))
+
+    async def scenario(conn):
+        now = datetime.now(timezone.utc)
+        await conn.copy_records_to_table(
+            "llm_usage",
+            records=[(now, "u", "chat", "m", None, None, 0.0, None, duration, True) for duration in durations],
+            columns=[
+                "created_at", "username", "call_type", "model", "prompt_tokens",
+                "completion_tokens", "cost_usd", "ttft_ms", "duration_ms", "ok",
+            ],
+        )
+        return await conn.fetchrow("SELECT COUNT(*) AS calls, p95(duration_ms) AS p95, p95(ttft_ms) AS ttft FROM llm_usage")
+
+    row = run(client, scenario)
+    assert row["calls"] == 100
+    # percentile_cont(0.95)와 같은 선형 보간
+    assert row["p95"] == pytest.approx(statistics.quantiles(durations, n=20, method="inclusive")[18])
+    assert row["ttft"] is None
+
+
+def test_postgres_functions(client):
+    async def scenario(conn):
+        return await conn.fetchrow(
+            """
+            SELECT strpos(lower($1), lower($2)) AS found,
+                   strpos($1, 'x') AS missing,
+                   char_length($1) AS length,
+                   GREATEST(1, NULL, 3) AS greatest,
+                   LEAST(2, 5) AS least
+            """,
+            "나는 Apple을",
+            "APPLE",
+        )
+
+    assert run(client, scenario) == {"found": 4, "missing": 0, "length": 9, "greatest": 3, "least": 2}
+
+
+def test_transaction_rolls_back_and_nests(client):
+    async def scenario(conn):
+        with pytest.raises(RuntimeError):
+            async with conn.transaction():
+                await conn.execute("INSERT INTO words (word) VALUES ($1)", "버려짐")
+                raise RuntimeError
+
+        async with conn.transaction():
+            await conn.execute("INSERT INTO words (word) VALUES ($1)", "바깥")
+            with pytest.raises(RuntimeError):
+                async with conn.transaction():
+                    await conn.execute("INSERT INTO words (word) VALUES ($1)", "안쪽")
+                    raise RuntimeError
+
+        return [row["word"] for row in await conn.fetch("SELECT word FROM words ORDER BY id")]
+
+    assert run(client, scenario) == ["바깥"]
+
+
+def test_unique_violation_is_raised_as_asyncpg_error(client):
+    async def scenario(conn):
+        await conn.execute("INSERT INTO words (word) VALUES ($1)", "사과")
+        with pytest.raises(UniqueViolationError):
+            await conn.execute("INSERT INTO words (word) VALUES ($1)", "사과")
+
+    run(client, scenario)
+
+
+def test_connect_adds_columns_missing_from_older_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE wordchain_state (username TEXT PRIMARY KEY, score INTEGER NOT NULL DEFAULT 0)")
+    db.commit()
+    db.close()
+
+    async def scenario(conn):
+        return {row["name"] for row in await conn.fetch("SELECT name FROM pragma_table_info('wordchain_state')")}
+
+    assert "revision" in run(SQLiteClient(path, pool_size=1), scenario)
+
+
+def test_pool_hands_connections_to_waiters_in_order(client):
+    async def main():
+        pool = await client.get_pool()
+        order = []
+
+        async def user(name: str):
+            async with pool.acquire():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        try:
+            await asyncio.gather(*(user(str(i)) for i in range(6)))
+        finally:
+            await client.close()
+        return order
+
+    assert asyncio.run(main()) == [str(i) for i in range(6)]